@@ -0,0 +1,318 @@
+#Description: This program contains a computer opponent for the Quoridor board game. It uses a class called
+#             AIPlayer that searches QuoridorGame positions with negamax and alpha-beta pruning.
+
+import time
+from QuoridorEndgame import SOLVE_SHARE, EndgameSolver
+
+#Score for a won position, large enough to dominate any evaluation
+WIN_SCORE = 100000
+
+#Evaluation weights
+DISTANCE_WEIGHT = 10
+FENCE_WEIGHT = 1
+
+#Transposition table entry types
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+#Most positions kept in the transposition table. A full table is cleared before the next store.
+TABLE_SIZE = 1 << 18
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when the time budget for the move has been used up.
+    """
+
+
+def path_fences(game, player):
+    """
+    Returns the fences that would block a step of a player's current shortest path. Only those
+    fences can slow the player down, so they are the fences worth searching against them.
+
+    Args:
+        game: QuoridorGame object of interest.
+        player: Integer representing the player whose path is blocked.
+
+    Returns:
+        A list of (fence_type, coords) tuples, ordered from the pawn outwards. The fences are
+        not checked for legality.
+    """
+    path = game.downhill_path(player)
+    if path is None:
+        return []
+
+    fences = []
+    for (x1,y1), (x2,y2) in zip(path, path[1:]):
+        if x1 == x2:
+            #Vertical step, blocked by a horizontal fence anchored on either column
+            row = max(y1,y2)
+            candidates = (('h',(x1,row)), ('h',(x1-1,row)))
+        else:
+            #Horizontal step, blocked by a vertical fence anchored on either row
+            col = max(x1,x2)
+            candidates = (('v',(col,y1)), ('v',(col,y1-1)))
+        for fence in candidates:
+            if fence not in fences:
+                fences.append(fence)
+    return fences
+
+
+class AIPlayer:
+    """
+    This class represents a computer player for a QuoridorGame. Moves are chosen with an
+    iterative deepening negamax search with alpha-beta pruning and a transposition table keyed
+    on the game's state hash. Each move is searched within a time budget in milliseconds.
+    Positions are scored on the difference in shortest path lengths and remaining fences. With
+    an opening book, positions in the book are played from it without a search, and once
+    neither player has a fence left the move is read from an EndgameSolver instead.
+    Main methods available to use are as follows:
+
+    choose_move: Returns the best move found for the player whose turn it is
+    evaluate: Scores a position for the player whose turn it is
+    get_last_search: Returns depth, node count and speed of the last search
+    """
+
+    def __init__(self, time_limit=1000, max_depth=32, book=None, endgame=None, table_size=TABLE_SIZE):
+        """
+        Initializes the AI player.
+
+        Args:
+            time_limit: Integer representing the time budget per move in milliseconds.
+            max_depth: Integer representing the deepest search iteration to run.
+            book: OpeningBook object consulted before searching, or None.
+            endgame: EndgameSolver object to share with other players, or None for a new one.
+            table_size: Integer representing the most positions kept in the transposition table.
+        """
+        self._time_limit = time_limit
+        self._max_depth = max_depth
+        self._book = book
+        self._endgame = endgame or EndgameSolver()
+        self._table = {}
+        self._table_size = table_size
+        self._nodes = 0
+        self._deadline = 0
+        self._last_search = None
+
+    def get_last_search(self):
+        """
+        Returns a dictionary describing the last search, with the completed depth, its score,
+        the number of nodes visited, the seconds taken, the nodes searched per second, and
+        whether the move came from the opening book or the endgame solver.
+        """
+        return self._last_search
+
+    def evaluate(self, game):
+        """
+        Scores a position for the player whose turn it is. Each step the player is closer to
+        their goal than the opponent is worth DISTANCE_WEIGHT and each extra fence in hand is
+        worth FENCE_WEIGHT.
+
+        Args:
+            game: QuoridorGame object of interest.
+
+        Returns:
+            Integer score, higher is better for the player whose turn it is.
+        """
+        player = game.get_player_turn()
+        opponent = 3 - player
+        distance_score = game.distance_to_goal(opponent) - game.distance_to_goal(player)
+        fence_score = game.get_pawn(player).get_remaining_fences() - game.get_pawn(opponent).get_remaining_fences()
+        return DISTANCE_WEIGHT*distance_score + FENCE_WEIGHT*fence_score
+
+    def ordered_moves(self, game, first_move=None):
+        """
+        Returns the moves to search from a position, best guesses first. Pawn moves are ordered
+        by the distance to goal they leave, and only fences on the opponent's shortest path are
+        included, starting with the ones closest to the opponent.
+
+        Args:
+            game: QuoridorGame object of interest.
+            first_move: Move to put first, usually the best move from an earlier search.
+
+        Returns:
+            A list of moves in the format used by QuoridorGame.push.
+        """
+        player = game.get_player_turn()
+        pawn = game.get_pawn(player)
+        size = len(game.get_board())-1
+        field = game.get_distance_field(player)
+
+        destinations = [coords for coords in game.possible_moves(pawn) if coords is not None]
+        destinations.sort(key=lambda coords: field[coords[1]*size + coords[0]])
+        moves = [('p',coords) for coords in destinations]
+
+        if pawn.get_remaining_fences() > 0:
+            moves += [fence for fence in path_fences(game, 3-player) if game.try_fence(*fence)]
+
+        if first_move in moves:
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+        return moves
+
+    def negamax(self, game, depth, alpha, beta, ply):
+        """
+        Searches a position to a fixed depth with alpha-beta pruning. Moves are made and undone
+        on the game itself with push and pop.
+
+        Args:
+            game: QuoridorGame object to search.
+            depth: Integer representing the remaining depth in plies.
+            alpha: Lowest score the player to move is already guaranteed.
+            beta: Highest score the opponent will allow.
+            ply: Integer representing the distance from the root in plies.
+
+        Returns:
+            Integer score of the position for the player whose turn it is.
+        """
+        self._nodes += 1
+        if time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+        #Previous move won the game
+        player = game.get_player_turn()
+        if game.is_winner(3-player):
+            return -WIN_SCORE + ply
+        if depth == 0:
+            return self.evaluate(game)
+
+        #Use stored result if it was searched deep enough. Win scores depend on ply so only
+        #their moves are reused.
+        key = game.state_hash()
+        entry = self._table.get(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_type, table_move = entry
+            if entry_depth >= depth and abs(entry_score) < WIN_SCORE - 1000:
+                if entry_type == EXACT:
+                    return entry_score
+                if entry_type == LOWER_BOUND:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        original_alpha = alpha
+        best_score = None
+        best_move = None
+        for move in self.ordered_moves(game, table_move):
+            if not game.push(move):
+                continue
+            try:
+                score = -self.negamax(game, depth-1, -beta, -alpha, ply+1)
+            finally:
+                game.pop()
+
+            if best_score is None or score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        #Pawn boxed in with no fence to place
+        if best_score is None:
+            return self.evaluate(game)
+
+        if best_score <= original_alpha:
+            entry_type = UPPER_BOUND
+        elif best_score >= beta:
+            entry_type = LOWER_BOUND
+        else:
+            entry_type = EXACT
+        #Start over once the table is full, so it cannot grow over a long session
+        if len(self._table) >= self._table_size and key not in self._table:
+            self._table.clear()
+        self._table[key] = (depth, best_score, entry_type, best_move)
+        return best_score
+
+    def search_root(self, game, depth, first_move):
+        """
+        Searches every root move to a fixed depth.
+
+        Args:
+            game: QuoridorGame object to search.
+            depth: Integer representing the depth in plies.
+            first_move: Move to search first.
+
+        Returns:
+            Tuple containing the best score and the best move.
+        """
+        alpha = -WIN_SCORE - 1
+        best_move = None
+        for move in self.ordered_moves(game, first_move):
+            if not game.push(move):
+                continue
+            try:
+                score = -self.negamax(game, depth-1, -WIN_SCORE - 1, -alpha, 1)
+            finally:
+                game.pop()
+            if best_move is None or score > alpha:
+                alpha = score
+                best_move = move
+        return alpha, best_move
+
+    def choose_move(self, game):
+        """
+        Returns the best move found for the player whose turn it is within the time budget.
+        Searches one ply deeper on every iteration and keeps the result of the last iteration
+        that finished. The game is returned in the state it was given.
+
+        Args:
+            game: QuoridorGame object of interest.
+
+        Returns:
+            A move in the format used by QuoridorGame.push, or None if there is no move.
+        """
+        start = time.perf_counter()
+        self._deadline = start + self._time_limit/1000
+        self._nodes = 0
+
+        #Play book moves without searching
+        if self._book is not None:
+            book_move = self._book.best_move(game)
+            if book_move is not None:
+                self._last_search = {'depth': 0, 'score': None, 'nodes': 0, 'seconds': time.perf_counter() - start,
+                                     'nodes_per_second': 0, 'book': True, 'endgame': False}
+                return book_move
+
+        #Read solved endgames off the table, scored like a search that saw the end. Solving a
+        #new layout may take part of the budget, and the search gets the rest.
+        solution = self._endgame.solve(game, SOLVE_SHARE*self._time_limit/1000)
+        if solution is not None and solution[1] is not None:
+            winner, move, plies = solution
+            score = 0
+            if winner:
+                score = WIN_SCORE - plies if winner == game.get_player_turn() else plies - WIN_SCORE
+            self._last_search = {'depth': plies, 'score': score, 'nodes': 0, 'seconds': time.perf_counter() - start,
+                                 'nodes_per_second': 0, 'book': False, 'endgame': True}
+            return move
+
+        #Fall back on the first ordered move if not even depth 1 finishes
+        moves = self.ordered_moves(game)
+        best_move = moves[0] if moves else None
+        best_score = None
+        completed_depth = 0
+        try:
+            for depth in range(1, self._max_depth+1):
+                best_score, best_move = self.search_root(game, depth, best_move)
+                completed_depth = depth
+                #Stop once the result is decided
+                if best_score is None or abs(best_score) >= WIN_SCORE - 1000:
+                    break
+        except SearchTimeout:
+            pass
+
+        seconds = time.perf_counter() - start
+        self._last_search = {
+            'depth': completed_depth,
+            'score': best_score,
+            'nodes': self._nodes,
+            'seconds': seconds,
+            'nodes_per_second': self._nodes/seconds if seconds > 0 else 0,
+            'book': False,
+            'endgame': False,
+        }
+        return best_move
@@ -0,0 +1,241 @@
+#Description: This program contains a batch version of the Quoridor rules for analysing many positions at
+#             once. It uses a class called BatchQuoridor that holds N games as NumPy arrays and
+#             computes pawn moves, distances to goal and winners for all of them with array operations.
+
+import numpy as np
+from QuoridorEngine import BOARD_SIZE
+
+#Step of each direction as (dx, dy), and the two directions at right angles to it
+DIRECTIONS = {'left': (-1,0), 'right': (1,0), 'up': (0,-1), 'down': (0,1)}
+SIDESTEPS = {'left': ('up','down'), 'right': ('up','down'), 'up': ('right','left'), 'down': ('right','left')}
+
+
+class BatchQuoridor:
+    """
+    This class represents N Quoridor positions stored as arrays. Fences are kept as bitplanes
+    indexed [game][row][col] by the square to the top left of the fence center, pawns as
+    [game][player-1] = (x, y) and fences in hand and the player to move as one entry per game.
+    The board size is taken from the fence planes. The rules follow QuoridorGame exactly,
+    including jumps and diagonal side steps.
+    Main methods available to use are as follows:
+
+    from_games: Builds a batch from QuoridorGame objects
+    from_positions: Builds a batch from rows exported by QuoridorDataset
+    legal_pawn_moves: Returns the squares each player to move can step to
+    distances: Returns the shortest path length of every pawn to its goal row
+    winners: Returns the player who has won each game
+    """
+
+    def __init__(self, h_fences, v_fences, pawns, fences, turn):
+        """
+        Initializes the batch from its arrays.
+
+        Args:
+            h_fences: Boolean array of shape (N, size-1, size-1) of horizontal fences.
+            v_fences: Boolean array of shape (N, size-1, size-1) of vertical fences.
+            pawns: Integer array of shape (N, 2, 2) of pawn coordinates (x, y) per player.
+            fences: Integer array of shape (N, 2) of fences left per player.
+            turn: Integer array of shape (N,) of the player to move.
+        """
+        self.h_fences = np.asarray(h_fences, dtype=bool)
+        self.v_fences = np.asarray(v_fences, dtype=bool)
+        self.pawns = np.asarray(pawns, dtype=np.int64)
+        self.fences = np.asarray(fences, dtype=np.int64)
+        self.turn = np.asarray(turn, dtype=np.int64)
+        self.size = self.h_fences.shape[-1] + 1
+        #Unreachable squares get the same distance as in QuoridorGame's distance fields
+        self.unreachable = self.size*self.size
+        self._top, self._left = self.walls()
+
+    @classmethod
+    def from_games(cls, games):
+        """
+        Returns a batch holding the positions of QuoridorGame objects.
+
+        Args:
+            games: Sequence of QuoridorGame objects, all on the same board size.
+        """
+        count = len(games)
+        size = games[0].get_board_size() if games else BOARD_SIZE
+        h_fences = np.zeros((count, size-1, size-1), dtype=bool)
+        v_fences = np.zeros((count, size-1, size-1), dtype=bool)
+        pawns = np.zeros((count, 2, 2), dtype=np.int64)
+        fences = np.zeros((count, 2), dtype=np.int64)
+        turn = np.zeros(count, dtype=np.int64)
+        for index, game in enumerate(games):
+            board = game.get_board()
+            #Fence anchors hold the number of the player who placed them
+            for row in range(1, size):
+                for col in range(size-1):
+                    h_fences[index, row-1, col] = type(board[row][col]['h']) is int
+            for row in range(size-1):
+                for col in range(1, size):
+                    v_fences[index, row, col-1] = type(board[row][col]['v']) is int
+            for player in (1, 2):
+                pawns[index, player-1] = game.get_pawn(player).get_location()
+                fences[index, player-1] = game.get_pawn(player).get_remaining_fences()
+            turn[index] = game.get_player_turn()
+        return cls(h_fences, v_fences, pawns, fences, turn)
+
+    @classmethod
+    def from_positions(cls, positions):
+        """
+        Returns a batch holding positions exported by QuoridorDataset.
+
+        Args:
+            positions: Structured array with QuoridorDataset.position_dtype.
+        """
+        #Pawn planes hold a single square per player
+        size = positions['pawns'].shape[-1]
+        flat = positions['pawns'].reshape(len(positions), 2, size*size).argmax(axis=2)
+        pawns = np.stack((flat % size, flat // size), axis=2)
+        return cls(positions['h_fences'], positions['v_fences'], pawns, positions['fences'], positions['turn'])
+
+    def __len__(self):
+        return len(self.turn)
+
+    def walls(self):
+        """
+        Returns the walls of every square as two boolean arrays of shape (N, size+1, size+1),
+        laid out like the 'h' and 'v' entries of QuoridorGame's board: top[n, y, x] is a wall
+        above square (x, y) and left[n, y, x] a wall to its left. Board edges count as walls.
+        """
+        count = len(self.turn)
+        size = self.size
+        top = np.zeros((count, size+1, size+1), dtype=bool)
+        left = np.zeros((count, size+1, size+1), dtype=bool)
+        top[:, 0, :size] = True
+        top[:, size, :size] = True
+        left[:, :size, 0] = True
+        left[:, :size, size] = True
+
+        #A fence covers the squares on both sides of its center
+        top[:, 1:size, 0:size-1] |= self.h_fences
+        top[:, 1:size, 1:size] |= self.h_fences
+        left[:, 0:size-1, 1:size] |= self.v_fences
+        left[:, 1:size, 1:size] |= self.v_fences
+        return top, left
+
+    def _wall(self, games, x, y, direction):
+        """
+        Returns whether a wall blocks a step in a direction from a square, for each game.
+
+        Args:
+            games: Integer array of game indices.
+            x: Integer array of square columns, clipped to the board.
+            y: Integer array of square rows, clipped to the board.
+            direction: String naming the direction: left, right, up or down.
+        """
+        if direction == 'left':
+            return self._left[games, y, x]
+        if direction == 'right':
+            return self._left[games, y, x+1]
+        if direction == 'up':
+            return self._top[games, y, x]
+        return self._top[games, y+1, x]
+
+    def legal_pawn_moves(self, player=None):
+        """
+        Returns the squares a pawn can move to in every game, following can_move_left,
+        can_move_right, can_move_up and can_move_down. A pawn steps to a free neighbouring
+        square, jumps an adjacent pawn if no wall is behind it, and otherwise steps diagonally
+        past it where no wall is in the way.
+
+        Args:
+            player: Integer representing the player whose moves are wanted, or None for the
+                    player to move in each game.
+
+        Returns:
+            Boolean array of shape (N, size, size) indexed [game, y, x].
+        """
+        count = len(self.turn)
+        games = np.arange(count)
+        mover = self.turn if player is None else np.full(count, player)
+        x, y = self.pawns[games, mover-1].T
+        other_x, other_y = self.pawns[games, 2-mover].T
+        size = self.size
+        moves = np.zeros((count, size, size), dtype=bool)
+
+        def mark(mask, to_x, to_y):
+            moves[games[mask], to_y[mask], to_x[mask]] = True
+
+        for direction, (dx, dy) in DIRECTIONS.items():
+            open_step = ~self._wall(games, x, y, direction)
+            #Neighbouring square, clipped so blocked steps still index inside the board
+            near_x = np.clip(x+dx, 0, size-1)
+            near_y = np.clip(y+dy, 0, size-1)
+            occupied = open_step & (near_x == other_x) & (near_y == other_y)
+            mark(open_step & ~occupied, near_x, near_y)
+
+            behind = self._wall(games, near_x, near_y, direction)
+            mark(occupied & ~behind, np.clip(x+2*dx, 0, size-1), np.clip(y+2*dy, 0, size-1))
+
+            for sidestep in SIDESTEPS[direction]:
+                side_dx, side_dy = DIRECTIONS[sidestep]
+                side_open = ~self._wall(games, near_x, near_y, sidestep)
+                mark(occupied & behind & side_open, np.clip(near_x+side_dx, 0, size-1), np.clip(near_y+side_dy, 0, size-1))
+        return moves
+
+    def distance_fields(self, player):
+        """
+        Returns the number of steps from every square to a player's goal row, ignoring pawns, by
+        expanding a breadth first wavefront from the goal row in all games at once.
+
+        Args:
+            player: Integer representing the player whose goal row is used.
+
+        Returns:
+            Integer array of shape (N, size, size) indexed [game, y, x], self.unreachable where
+            the goal row cannot be reached.
+        """
+        count = len(self.turn)
+        size = self.size
+        open_up = ~self._top[:, :size, :size]
+        open_down = ~self._top[:, 1:, :size]
+        open_left = ~self._left[:, :size, :size]
+        open_right = ~self._left[:, :size, 1:]
+
+        field = np.full((count, size, size), self.unreachable, dtype=np.int64)
+        frontier = np.zeros((count, size, size), dtype=bool)
+        frontier[:, size-1 if player == 1 else 0, :] = True
+        reached = frontier.copy()
+        distance = 0
+        while frontier.any():
+            field[frontier] = distance
+            step = np.zeros_like(frontier)
+            #A square joins the wavefront if a neighbour in the wavefront is open towards it
+            step[:, :-1, :] |= frontier[:, 1:, :] & open_down[:, :-1, :]
+            step[:, 1:, :] |= frontier[:, :-1, :] & open_up[:, 1:, :]
+            step[:, :, :-1] |= frontier[:, :, 1:] & open_right[:, :, :-1]
+            step[:, :, 1:] |= frontier[:, :, :-1] & open_left[:, :, 1:]
+            frontier = step & ~reached
+            reached |= frontier
+            distance += 1
+        return field
+
+    def distances(self):
+        """
+        Returns the shortest path length of every pawn to its goal row, ignoring pawns.
+
+        Returns:
+            Integer array of shape (N, 2) indexed [game, player-1], self.unreachable where a pawn is
+            cut off.
+        """
+        games = np.arange(len(self.turn))
+        result = np.empty((len(self.turn), 2), dtype=np.int64)
+        for player in (1, 2):
+            x, y = self.pawns[:, player-1].T
+            result[:, player-1] = self.distance_fields(player)[games, y, x]
+        return result
+
+    def winners(self):
+        """
+        Returns the player who has won each game, following QuoridorGame.is_winner.
+
+        Returns:
+            Integer array of shape (N,) holding 1 or 2 for a won game and 0 otherwise.
+        """
+        result = np.zeros(len(self.turn), dtype=np.int64)
+        result[self.pawns[:, 1, 1] == 0] = 2
+        result[self.pawns[:, 0, 1] == self.size-1] = 1
+        return result
@@ -0,0 +1,436 @@
+#Description: This program contains benchmarks for the Quoridor engine. Run it with the name of a
+#             benchmark, for example "python QuoridorBenchmark.py fence_allocations".
+
+import argparse
+import copy
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from QuoridorEngine import QuoridorGame
+
+
+def sample_game():
+    """
+    Returns a QuoridorGame in a mid game position with a few fences on the board, used as a
+    fixed starting point by the benchmarks.
+    """
+    game = QuoridorGame()
+    moves = [('p',(4,1)), ('p',(4,7)), ('h',(3,2)), ('v',(5,6)), ('p',(4,2)), ('h',(4,7)),
+             ('v',(2,3)), ('p',(3,7)), ('p',(5,2)), ('h',(0,5))]
+    for move_type, coords in moves:
+        player = game.get_player_turn()
+        if move_type == 'p':
+            game.move_pawn(player, coords)
+        else:
+            game.place_fence(player, move_type, coords)
+    return game
+
+
+def fence_slots(game):
+    """
+    Returns a list of every (type, coords) fence slot on the board of a game.
+
+    Args:
+        game: QuoridorGame object of interest.
+    """
+    size = len(game.get_board())-1
+    slots = [('h',(col,row)) for row in range(1,size) for col in range(size-1)]
+    slots += [('v',(col,row)) for row in range(size-1) for col in range(1,size)]
+    return slots
+
+
+def copy_fair_play_check(game, fence_type, coords):
+    """
+    Fair play check that places the fence on a deep copy of the board, the way fair_play_check
+    worked before try_fence. Used as the baseline for fence_allocations.
+
+    Args:
+        game: QuoridorGame object of interest.
+        fence_type: String character containing the type of the fence (either 'h' or 'v').
+        coords: Tuple containing the coordinates where a fence is to be placed.
+    """
+    board_copy = copy.deepcopy(game.get_board())
+    first, second, edge = game.fence_squares(fence_type, coords)
+    board_copy[first[1]][first[0]][edge] = True
+    board_copy[second[1]][second[0]][edge] = True
+    last_row = len(board_copy)-2
+    return (game.goal_reachable(board_copy, game.get_p1_location(), last_row)
+            and game.goal_reachable(board_copy, game.get_p2_location(), 0))
+
+
+def measure(function, repeat):
+    """
+    Runs a function several times and measures its peak memory use and run time.
+
+    Args:
+        function: Function without arguments to run.
+        repeat: Integer representing the number of runs.
+
+    Returns:
+        Tuple containing the peak memory allocated during one traced run in bytes and the
+        seconds per untraced run.
+    """
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return peak, (time.perf_counter()-start)/repeat
+
+
+def fence_allocations(repeat=20):
+    """
+    Compares the board copy based fair play check with try_fence over every fence slot of a
+    sample position and prints the memory allocated by a single check and the time per sweep.
+
+    Args:
+        repeat: Integer representing the number of timed sweeps.
+    """
+    game = sample_game()
+    slots = [slot for slot in fence_slots(game) if game.fence_fits(*slot)]
+
+    def copy_sweep():
+        for fence_type, coords in slots:
+            copy_fair_play_check(game, fence_type, coords)
+
+    def try_fence_sweep():
+        for fence_type, coords in slots:
+            game.try_fence(fence_type, coords)
+
+    fence_type, coords = slots[0]
+    single_checks = {"deepcopy": lambda: copy_fair_play_check(game, fence_type, coords),
+                     "try_fence": lambda: game.try_fence(fence_type, coords)}
+
+    print(f"{len(slots)} candidate fences per sweep")
+    for name, sweep in (("deepcopy", copy_sweep), ("try_fence", try_fence_sweep)):
+        check_peak = measure(single_checks[name], 1)[0]
+        sweep_peak, seconds = measure(sweep, repeat)
+        print(f"{name:>10}: {check_peak:7d} bytes per check, {sweep_peak:7d} bytes peak per sweep, {seconds*1000:7.2f} ms per sweep")
+
+
+def legal_fences(repeat=20):
+    """
+    Compares legal_fences with a try_fence call on every fence slot of a sample position and
+    prints the time per full enumeration.
+
+    Args:
+        repeat: Integer representing the number of timed enumerations.
+    """
+    game = sample_game()
+    player = game.get_player_turn()
+    slots = fence_slots(game)
+
+    def slot_by_slot():
+        return {slot for slot in slots if game.try_fence(*slot)}
+
+    def batch():
+        return game.legal_fences(player)
+
+    print(f"{len(batch())} legal fences out of {len(slots)} slots")
+    for name, enumerate_fences in (("try_fence", slot_by_slot), ("legal_fences", batch)):
+        seconds = measure(enumerate_fences, repeat)[1]
+        print(f"{name:>12}: {seconds*1000:7.2f} ms per enumeration")
+
+
+def random_positions(count, seed=0, size=9, fences=None, players=2):
+    """
+    Returns a list of QuoridorGame objects in varied positions, reached by random legal moves
+    with pawn moves favoured so that games spread over the board.
+
+    Args:
+        count: Integer representing the number of positions.
+        seed: Integer seed for the moves.
+        size: Integer representing the number of squares per side of the board.
+        fences: Integer representing the number of fences each player starts with, or None for
+                the default.
+        players: Integer representing the number of players.
+    """
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = QuoridorGame(size, fences, players)
+        for _ in range(rng.randrange(60*size//9)):
+            if game.get_winner():
+                break
+            player = game.get_player_turn()
+            moves = [('p',coords) for coords in game.possible_moves(game.get_pawn(player)) if coords is not None]
+            if rng.random() < 0.3 and game.get_pawn(player).get_remaining_fences() > 0:
+                moves = [(fence_type, coords) for fence_type, coords in game.legal_fences(player)]
+            game.push(rng.choice(sorted(moves)))
+        games.append(game)
+    return games
+
+
+def batch_positions(count=2000):
+    """
+    Compares BatchQuoridor with a loop over QuoridorGame objects on the same positions. Both
+    compute the pawn moves of the player to move, the distance to goal of both pawns with a
+    fresh breadth first search and the winner, and the positions per second are printed.
+    Requires NumPy.
+
+    Args:
+        count: Integer representing the number of positions.
+    """
+    from QuoridorBatch import BatchQuoridor
+
+    games = random_positions(count)
+
+    def scalar():
+        for game in games:
+            game.possible_moves(game.get_pawn(game.get_player_turn()))
+            for player in (1, 2):
+                x, y = game.get_pawn(player).get_location()
+                game.compute_distance_field(game.get_goal_row(player))[y*(len(game.get_board())-1) + x]
+            game.is_winner(1) or game.is_winner(2)
+
+    batch = BatchQuoridor.from_games(games)
+
+    def vectorized():
+        batch.legal_pawn_moves()
+        batch.distances()
+        batch.winners()
+
+    conversion = measure(lambda: BatchQuoridor.from_games(games), 1)[1]
+    print(f"{count} positions, {conversion*1000:.1f} ms to build the batch")
+    for name, analyse in (("scalar", scalar), ("batch", vectorized)):
+        seconds = measure(analyse, 3)[1]
+        print(f"{name:>8}: {seconds*1000:8.2f} ms, {count/seconds:10.0f} positions per second")
+
+
+def board_sizes(count=20, repeat=3):
+    """
+    Measures move generation, making and taking back moves, and shortest path searches on
+    boards of 5x5 to 13x13 squares. Fences per player grow with the board as in the standard
+    game. Costs are printed per position and per square, so a per square cost that stays flat
+    across sizes means the work grows linearly with the board.
+
+    Args:
+        count: Integer representing the number of positions per board size.
+        repeat: Integer representing the number of timed runs.
+    """
+    print(f"{'size':>5} {'legal_moves':>12} {'push/pop':>10} {'distance':>10}   (microseconds per position, then per square)")
+    for size in (5, 7, 9, 11, 13):
+        games = random_positions(count, seed=size, size=size, fences=(size*size+4)//8)
+        move_lists = [game.legal_moves() for game in games]
+        squares = size*size
+
+        def generate():
+            for game in games:
+                game.legal_moves()
+
+        def push_pop():
+            for game, moves in zip(games, move_lists):
+                for move in moves:
+                    game.push(move)
+                    game.pop()
+
+        def distance():
+            for game in games:
+                game.compute_distance_field(game.get_goal_row(1))
+
+        generate_time = measure(generate, repeat)[1]/count
+        moves_made = sum(len(moves) for moves in move_lists)
+        push_pop_time = measure(push_pop, repeat)[1]/moves_made
+        distance_time = measure(distance, repeat)[1]/count
+        costs = [seconds*1e6 for seconds in (generate_time, push_pop_time, distance_time)]
+        print(f"{size:>5} {costs[0]:12.1f} {costs[1]:10.2f} {costs[2]:10.1f}   "
+              f"/ square: {costs[0]/squares:6.2f} {costs[1]/squares:6.3f} {costs[2]/squares:6.2f}")
+
+
+def four_players(count=30, repeat=3):
+    """
+    Compares the fair play check of four player games with the check it replaced, which updated
+    the distance field of every player for the tentative fence, on every fence that fits in a
+    set of positions. The time per check is printed.
+
+    Args:
+        count: Integer representing the number of positions.
+        repeat: Integer representing the number of timed runs.
+    """
+    games = random_positions(count, seed=4, fences=10, players=4)
+    slots = [(game, slot) for game in games for slot in fence_slots(game) if game.fence_fits(*slot)]
+
+    def per_player():
+        for game, (fence_type, coords) in slots:
+            unreachable = game.get_board_size()**2
+            all(distance < unreachable for distance in game.tentative_distances(fence_type, coords))
+
+    def combined():
+        for game, (fence_type, coords) in slots:
+            game.fair_play_check(fence_type, coords)
+
+    print(f"{len(slots)} fences in {count} four player positions")
+    for name, check in (("per player", per_player), ("combined", combined)):
+        seconds = measure(check, repeat)[1]
+        print(f"{name:>10}: {seconds/len(slots)*1e6:7.2f} microseconds per check")
+
+
+def book_lookup(count=200, repeat=3):
+    """
+    Measures opening book lookups in books of a thousand to a million entries. Each book holds
+    the positions looked up plus random keys, so lookups binary search the whole file. The time
+    to open each book and the time per lookup are printed, then the time the alpha-beta player
+    takes for its first move with and without a book.
+
+    Args:
+        count: Integer representing the number of positions looked up.
+        repeat: Integer representing the number of timed runs.
+    """
+    from QuoridorAI import AIPlayer
+    from QuoridorBook import OpeningBook, write_book
+    from QuoridorRecord import encode_move
+    from QuoridorSymmetry import canonical_move, canonical_transforms
+
+    games = [game for game in random_positions(count, seed=23) if not game.get_winner()] + [QuoridorGame()]
+    book_moves = {}
+    for game in games:
+        key, transforms = canonical_transforms(game)
+        book_moves[key] = encode_move(canonical_move(game.legal_moves()[0], transforms, 9))
+    rng = random.Random(23)
+    with tempfile.TemporaryDirectory() as directory:
+        for entries in (10**3, 10**5, 10**6):
+            counts = {(key, code): [1, 0] for key, code in book_moves.items()}
+            while len(counts) < entries:
+                counts[(rng.getrandbits(64), rng.randrange(81))] = [1, 0]
+            path = os.path.join(directory, f"{entries}.qbk")
+            write_book(path, counts)
+
+            opened = measure(lambda: OpeningBook(path).close(), repeat)[1]
+            with OpeningBook(path) as book:
+                seconds = measure(lambda: [book.lookup(game) for game in games], repeat)[1]
+            print(f"{entries:>8} entries, {os.path.getsize(path)/2**20:6.1f} MiB: open {opened*1e6:6.1f} microseconds, "
+                  f"{seconds/len(games)*1e6:6.2f} microseconds per lookup")
+
+        with OpeningBook(path) as book:
+            for name, player in (("search", AIPlayer(200)), ("book", AIPlayer(200, book=book))):
+                seconds = measure(lambda: player.choose_move(QuoridorGame()), 1)[1]
+                print(f"{name:>8}: first move in {seconds*1000:7.2f} ms")
+
+
+def endgames(count=20, repeat=1):
+    """
+    Measures the endgame solver on positions where neither player has a fence left: the time to
+    solve the first position of a fence layout, which solves the whole layout, and the time to
+    solve further positions on a cached layout. The time the alpha-beta player takes to search
+    the same positions until the result is proven is printed for comparison.
+
+    Args:
+        count: Integer representing the number of positions.
+        repeat: Integer representing the number of timed runs.
+    """
+    from QuoridorAI import AIPlayer
+    from QuoridorEndgame import EndgameSolver, is_endgame
+
+    class SearchOnly:
+        """
+        Stands in for the solver so the player searches every position.
+        """
+        def solve(self, game, time_limit=None):
+            return None
+
+    games = []
+    seed = 0
+    while len(games) < count:
+        game = random_positions(1, seed=seed, fences=3)[0]
+        seed += 1
+        if is_endgame(game) and not game.get_winner():
+            games.append(game)
+
+    def first_solve():
+        solver = EndgameSolver()
+        for game in games:
+            solver.solve(game)
+
+    #Solve every layout before timing, so the cached row only measures lookups
+    solver = EndgameSolver(max_layouts=count)
+    for game in games:
+        solver.solve(game)
+    player = AIPlayer(10000, endgame=SearchOnly())
+    timings = (("new layout", first_solve), ("cached layout", lambda: [solver.solve(game) for game in games]),
+               ("alpha-beta", lambda: [player.choose_move(game) for game in games]))
+    print(f"{count} endgame positions")
+    for name, solve in timings:
+        seconds = measure(solve, repeat)[1]/count
+        print(f"{name:>14}: {seconds*1000:8.3f} ms per position")
+
+
+#Script run in a fresh interpreter by the startup benchmark. It prints the seconds taken by each
+#startup step as JSON.
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import QuoridorEngine
+engine_import = time.perf_counter()
+import QuoridorGUI
+gui_import = time.perf_counter()
+game = QuoridorEngine.QuoridorGame()
+game.legal_moves()
+legal_moves = time.perf_counter()
+renderer = QuoridorGUI.BoardRenderer(QuoridorGUI.window())
+renderer.render(QuoridorGUI.frame_shapes(game, None))
+first_frame = time.perf_counter()
+print(json.dumps({'engine import': engine_import - start, 'gui import': gui_import - engine_import,
+                  'first legal moves': legal_moves - gui_import, 'first frame': first_frame - legal_moves}))
+"""
+
+
+def startup(repeat=5):
+    """
+    Measures how long a new process takes to import the engine and the GUI, answer its first
+    legal move query and draw its first frame. Each run uses a fresh interpreter so nothing is
+    cached between runs, and the window is opened on SDL's dummy video driver.
+
+    Args:
+        repeat: Integer representing the number of runs.
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=directory, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+
+    #Best of the runs, as the least disturbed by other processes
+    for step in runs[0]:
+        print(f"{step:>18}: {min(run[step] for run in runs)*1000:7.2f} ms")
+    print(f"{'total':>18}: {min(sum(run.values()) for run in runs)*1000:7.2f} ms")
+
+
+BENCHMARKS = {
+    'batch_positions': batch_positions,
+    'board_sizes': board_sizes,
+    'book_lookup': book_lookup,
+    'endgames': endgames,
+    'fence_allocations': fence_allocations,
+    'four_players': four_players,
+    'legal_fences': legal_fences,
+    'startup': startup,
+}
+
+
+def main():
+    """
+    Runs the benchmarks named on the command line, or all of them.
+    """
+    parser = argparse.ArgumentParser(description="Quoridor engine benchmarks")
+    parser.add_argument('names', nargs='*', help="benchmarks to run: " + ", ".join(sorted(BENCHMARKS)))
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+    for name in args.names or sorted(BENCHMARKS):
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
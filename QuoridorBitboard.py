@@ -0,0 +1,452 @@
+#Description: This program contains a compact bitboard implementation of the Quoridor board game. It
+#             uses a class called BitboardQuoridorGame that exposes the same main methods as QuoridorGame,
+#             but stores the whole game state in a handful of integers.
+
+from QuoridorEngine import BOARD_SIZE, FENCES
+
+#Masks of each board size, created on first use
+BOARD_MASKS = {}
+
+
+def board_masks(size):
+    """
+    Returns the bit masks of a board size: the whole board, the first row, the last row and the
+    first column.
+
+    Args:
+        size: Integer representing the number of squares per side.
+    """
+    masks = BOARD_MASKS.get(size)
+    if masks is None:
+        first_row = (1 << size) - 1
+        masks = BOARD_MASKS[size] = ((1 << size*size) - 1, first_row, first_row << (size*(size-1)),
+                                     sum(1 << (row*size) for row in range(size)))
+    return masks
+
+
+class BitboardQuoridorGame:
+    """
+    This class represents a Quoridor game using bitboards. Every square has one bit, numbered
+    row*size + column. Two masks hold the edges that are blocked, one for the top edge and one for
+    the left edge of each square (board borders included), and two more masks hold the squares
+    where horizontal and vertical fences are anchored. Pawn locations and remaining fences are
+    kept in two small lists.
+    Main methods available to use are as follows:
+
+    move_pawn: Moves pawn to desired location.
+    place_fence: Places a fence at a desired location
+    possible_moves: Returns the moves available to a player
+    is_winner: Tells the user if a player has won the game
+    get_player_turn: Tells the user whose turn it is
+    """
+
+    __slots__ = ('_size', '_full', '_first_row', '_last_row', '_top_walls', '_left_walls', '_h_fences', '_v_fences', '_pawns', '_fences', '_player_turn')
+
+    def __init__(self, size=BOARD_SIZE, fences=FENCES):
+        """
+        Initializes the game with the board edges fenced and both pawns on their starting squares.
+
+        Args:
+            size: Integer representing the number of squares per side, odd like QuoridorGame.
+            fences: Integer representing the number of fences each player starts with.
+        """
+        if size < 3 or size % 2 == 0:
+            raise ValueError(f"board size must be odd and at least 3, not {size}")
+        self._size = size
+        self._full, self._first_row, self._last_row, first_column = board_masks(size)
+        self._top_walls = self._first_row
+        self._left_walls = first_column
+        self._h_fences = 0
+        self._v_fences = 0
+        #Index 0 is player 1 and index 1 is player 2
+        self._pawns = [size//2, size//2 + size*(size-1)]
+        self._fences = [fences, fences]
+        self._player_turn = 1
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Builds a bitboard game from a two player QuoridorGame object.
+
+        Args:
+            game: QuoridorGame object to convert.
+
+        Returns:
+            BitboardQuoridorGame object holding the same position.
+        """
+        if game.get_player_count() != 2:
+            raise ValueError("the bitboard only holds two player games")
+        size = game.get_board_size()
+        bitboard = cls(size, game.get_starting_fences())
+        board = game.get_board()
+        for row in range(size):
+            for col in range(size):
+                bit = 1 << (row*size + col)
+                h = board[row][col]['h']
+                v = board[row][col]['v']
+                if h:
+                    bitboard._top_walls |= bit
+                if v:
+                    bitboard._left_walls |= bit
+                #Fence anchors hold the player number, borders hold True
+                if h and h is not True and h != "Fence Continued":
+                    bitboard._h_fences |= bit
+                if v and v is not True and v != "Fence Continued":
+                    bitboard._v_fences |= bit
+
+        for player in (1, 2):
+            location = game.get_pawn(player).get_location()
+            bitboard._pawns[player-1] = location[1]*size + location[0]
+            bitboard._fences[player-1] = game.get_pawn(player).get_remaining_fences()
+        bitboard._player_turn = game.get_player_turn()
+        return bitboard
+
+    def get_p1_location(self):
+        """
+        Returns coordinates of player 1 location.
+        """
+        return divmod(self._pawns[0], self._size)[::-1]
+
+    def get_p2_location(self):
+        """
+        Returns coordinates of player 2 location.
+        """
+        return divmod(self._pawns[1], self._size)[::-1]
+
+    def get_board_size(self):
+        """
+        Returns the number of squares per side of the board.
+        """
+        return self._size
+
+    def get_remaining_fences(self, player):
+        """
+        Returns the remaining fences available to a player.
+
+        Args:
+            player: Integer representing the player of interest.
+        """
+        return self._fences[player-1]
+
+    def get_player_turn(self):
+        """
+        Returns the integer representing the player whose turn it is.
+        """
+        return self._player_turn
+
+    def set_player_turn(self, player):
+        """
+        Change player turn.
+
+        Args:
+            player: Integer representing the player who's turn it will be.
+        """
+        self._player_turn = player
+
+    def _move_left(self, square, other):
+        """
+        Returns the set of left moves from a square, mirroring QuoridorGame.can_move_left.
+
+        Args:
+            square: Bit index of the moving pawn.
+            other: Bit index of the other pawn.
+        """
+        size = self._size
+        left_walls = self._left_walls
+        if left_walls >> square & 1:
+            return {None}
+
+        left = square - 1
+        if left != other:
+            return {(left % size, left // size)}
+
+        #Jump over the pawn
+        if not left_walls >> left & 1:
+            return {((left-1) % size, left // size)}
+
+        #Pawn backed by a fence, try diagonals
+        column, row = left % size, left // size
+        diagonal_moves = set()
+        if not self._top_walls >> left & 1:
+            diagonal_moves.add((column, row-1))
+        if row != size-1 and not self._top_walls >> (left+size) & 1:
+            diagonal_moves.add((column, row+1))
+        return diagonal_moves
+
+    def _move_right(self, square, other):
+        """
+        Returns the set of right moves from a square, mirroring QuoridorGame.can_move_right.
+
+        Args:
+            square: Bit index of the moving pawn.
+            other: Bit index of the other pawn.
+        """
+        size = self._size
+        left_walls = self._left_walls
+        if square % size == size-1 or left_walls >> (square+1) & 1:
+            return {None}
+
+        right = square + 1
+        if right != other:
+            return {(right % size, right // size)}
+
+        #Jump over the pawn
+        if right % size != size-1 and not left_walls >> (right+1) & 1:
+            return {((right+1) % size, right // size)}
+
+        #Pawn backed by a fence or board edge, try diagonals
+        column, row = right % size, right // size
+        diagonal_moves = set()
+        if not self._top_walls >> right & 1:
+            diagonal_moves.add((column, row-1))
+        if row != size-1 and not self._top_walls >> (right+size) & 1:
+            diagonal_moves.add((column, row+1))
+        return diagonal_moves
+
+    def _move_up(self, square, other):
+        """
+        Returns the set of up moves from a square, mirroring QuoridorGame.can_move_up.
+
+        Args:
+            square: Bit index of the moving pawn.
+            other: Bit index of the other pawn.
+        """
+        size = self._size
+        top_walls = self._top_walls
+        if top_walls >> square & 1:
+            return {None}
+
+        up = square - size
+        if up != other:
+            return {(up % size, up // size)}
+
+        #Jump over the pawn
+        if not top_walls >> up & 1:
+            return {(up % size, up // size - 1)}
+
+        #Pawn backed by a fence, try diagonals
+        column, row = up % size, up // size
+        diagonal_moves = set()
+        if column != size-1 and not self._left_walls >> (up+1) & 1:
+            diagonal_moves.add((column+1, row))
+        if not self._left_walls >> up & 1:
+            diagonal_moves.add((column-1, row))
+        return diagonal_moves
+
+    def _move_down(self, square, other):
+        """
+        Returns the set of down moves from a square, mirroring QuoridorGame.can_move_down.
+
+        Args:
+            square: Bit index of the moving pawn.
+            other: Bit index of the other pawn.
+        """
+        size = self._size
+        top_walls = self._top_walls
+        if square // size == size-1 or top_walls >> (square+size) & 1:
+            return {None}
+
+        down = square + size
+        if down != other:
+            return {(down % size, down // size)}
+
+        #Jump over the pawn
+        if down // size != size-1 and not top_walls >> (down+size) & 1:
+            return {(down % size, down // size + 1)}
+
+        #Pawn backed by a fence or board edge, try diagonals
+        column, row = down % size, down // size
+        diagonal_moves = set()
+        if column != size-1 and not self._left_walls >> (down+1) & 1:
+            diagonal_moves.add((column+1, row))
+        if not self._left_walls >> down & 1:
+            diagonal_moves.add((column-1, row))
+        return diagonal_moves
+
+    def possible_moves(self, pawn):
+        """
+        Returns a set of tuples containing the coordinates of all possible moves for a pawn. Like
+        QuoridorGame.possible_moves the set contains None if a direction is blocked.
+
+        Args:
+            pawn: Integer representing the player of interest. The bitboard has no Pawn objects.
+
+        Returns:
+            A set of one or more tuples containing coordinates of all possible moves for a pawn.
+        """
+        square = self._pawns[pawn-1]
+        other = self._pawns[2-pawn]
+        right = self._move_right(square, other)
+        left = self._move_left(square, other)
+        up = self._move_up(square, other)
+        down = self._move_down(square, other)
+        return right.union(left, up, down)
+
+    def is_winner(self, player):
+        """
+        This method checks if a player has won the game.
+
+        Args:
+            player: Integer representing the player of interest.
+
+        Returns:
+            True if the player has won and False if the player has not won.
+        """
+        if player == 1:
+            return bool(self._last_row >> self._pawns[0] & 1)
+        if player == 2:
+            return bool(self._first_row >> self._pawns[1] & 1)
+        return False
+
+    def move_pawn(self, player, coords):
+        """
+        This method is used to move a pawn. The method checks if the move is valid and then makes
+        the move if so.
+
+        Args:
+            player: Integer represting the player making the move.
+            coords: Tuple containing the coordinates the pawn will move to.
+
+        Returns:
+            True if the move was successful or causes a win, and False if the move is invalid or
+            the game has already been won.
+        """
+        if self.is_winner(1) or self.is_winner(2) or player != self._player_turn:
+            return False
+
+        #possible_moves holds None for a blocked direction, which is not a move
+        if coords is None or coords not in self.possible_moves(player):
+            return False
+
+        self._pawns[player-1] = coords[1]*self._size + coords[0]
+        self._player_turn = 3 - player
+        return True
+
+    def _goal_reachable(self, square, goal_mask, top_walls, left_walls):
+        """
+        Flood fills the board from a square one step at a time, using shifts of the whole
+        reachable set, until the goal mask is touched or the set stops growing.
+
+        Args:
+            square: Bit index of the starting square.
+            goal_mask: Mask of the goal squares.
+            top_walls: Mask of blocked top edges to use.
+            left_walls: Mask of blocked left edges to use.
+
+        Returns:
+            True if any goal square can be reached and False otherwise.
+        """
+        size = self._size
+        full = self._full
+        reach = 1 << square
+        while not reach & goal_mask:
+            grown = (reach
+                     | (reach & ~top_walls) >> size
+                     | (reach << size) & ~top_walls
+                     | (reach & ~left_walls) >> 1
+                     | (reach << 1) & ~left_walls) & full
+            if grown == reach:
+                return False
+            reach = grown
+        return True
+
+    def _fence_edges(self, fence_type, coords):
+        """
+        Returns the masks of blocked top and left edges a fence would add, or None if the fence
+        is out of bounds, overlaps another fence or crosses one.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates where a fence is to be placed.
+        """
+        size = self._size
+        column, row = coords
+        anchor = row*size + column
+        if fence_type == 'h' and 0 <= column < size-1 and 0 <= row < size:
+            edges = 3 << anchor
+            #Crossing vertical fence is anchored on the square above-right
+            if self._top_walls & edges or (row > 0 and self._v_fences >> (anchor-size+1) & 1):
+                return None
+            return edges, 0
+
+        if fence_type == 'v' and 0 <= column < size and 0 <= row < size-1:
+            edges = (1 | 1 << size) << anchor
+            #Crossing horizontal fence is anchored on the square below-left
+            if self._left_walls & edges or (column > 0 and self._h_fences >> (anchor+size-1) & 1):
+                return None
+            return 0, edges
+
+        return None
+
+    def _blocked_edges(self, fence_type, coords):
+        """
+        Returns the masks of top and left edges a fence would block, leaving out squares off the
+        board. Whether the fence fits is not checked.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates where a fence is to be placed.
+        """
+        size = self._size
+        column, row = coords
+        squares = ((column, row), (column+1, row)) if fence_type == 'h' else ((column, row), (column, row+1))
+        edges = 0
+        for x, y in squares:
+            if 0 <= x < size and 0 <= y < size:
+                edges |= 1 << (y*size + x)
+        return (edges, 0) if fence_type == 'h' else (0, edges)
+
+    def fair_play_check(self, fence_type, coords):
+        """
+        This method checks if placing a fence will break the fair play rule. The fence only
+        exists in the local masks, so the game itself is never modified. Like
+        QuoridorGame.fair_play_check it does not check that the fence fits, which place_fence
+        does.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates where a fence is to be placed.
+
+        Returns:
+            True if there remains a path for both players after the fence is placed and False if
+            it breaks the fair play rule.
+        """
+        edges = self._blocked_edges(fence_type, coords)
+        top_walls = self._top_walls | edges[0]
+        left_walls = self._left_walls | edges[1]
+        return (self._goal_reachable(self._pawns[0], self._last_row, top_walls, left_walls)
+                and self._goal_reachable(self._pawns[1], self._first_row, top_walls, left_walls))
+
+    def place_fence(self, player, fence_type, coords):
+        """
+        Places a fence for a player. This method checks that the fence placement is valid and if
+        so places the fence specified.
+
+        Args:
+            player: Integer representing the player making the move.
+            fence_type: String character representing the type of fence to be placed (either 'h' or v').
+            coords: Tuple containing the coordinates where the fence will be placed.
+
+        Returns:
+            True if the fence placement is valid and move is made, False if the move is invalid or the game
+            has already been won.
+        """
+        if self.is_winner(1) or self.is_winner(2) or player != self._player_turn:
+            return False
+
+        edges = self._fence_edges(fence_type, coords)
+        if self._fences[player-1] <= 0 or edges is None or not self.fair_play_check(fence_type, coords):
+            return False
+
+        top_edges, left_edges = edges
+        self._top_walls |= top_edges
+        self._left_walls |= left_edges
+        anchor = 1 << (coords[1]*self._size + coords[0])
+        if fence_type == 'h':
+            self._h_fences |= anchor
+        else:
+            self._v_fences |= anchor
+
+        self._fences[player-1] -= 1
+        self._player_turn = 3 - player
+        return True
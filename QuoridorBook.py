@@ -0,0 +1,261 @@
+#Description: This program builds and reads Quoridor opening books. A book is made offline from game records
+#             or self-play results and saved as a binary file of entries sorted by position hash, which
+#             is memory mapped and searched in O(log n) without being loaded. A position and its
+#             symmetric images share one entry under their canonical key (see QuoridorSymmetry.py).
+#             Example: python QuoridorBook.py book.qbk games.qrec tournament.jsonl --plies 10
+
+import argparse
+import json
+import mmap
+import struct
+from QuoridorEngine import BOARD_SIZE, FENCES, QuoridorGame
+from QuoridorRecord import decode_move, encode_move, read_games, record_settings
+from QuoridorSymmetry import canonical_key, canonical_move, canonical_transforms, transform_move
+
+#File header: magic and version, board size, fences per player and number of entries. Version 1
+#books were keyed on the left-right mirror only.
+MAGIC = b"QBOOK\x02"
+HEADER = struct.Struct("<6sBBQ")
+
+#One entry per position and move: canonical key, move code in the canonical form, games the
+#move was played in and games the player who made it went on to win
+ENTRY = struct.Struct("<QHHHxx")
+
+#Plies of each game stored by default
+BOOK_PLIES = 10
+
+#Largest count an entry can hold
+MAX_COUNT = 0xFFFF
+
+
+def games_from_file(path, size=BOARD_SIZE, fences=FENCES):
+    """
+    Generator over the games of a binary record file or a JSONL file of tournament results.
+    Games on another board are skipped.
+
+    Args:
+        path: Path of a .qrec record file or a .jsonl file written by QuoridorTournament.
+        size: Integer representing the number of squares per side of the book's board.
+        fences: Integer representing the fences per player of the book's games.
+
+    Yields:
+        A list of moves per game, in the format used by QuoridorGame.push.
+    """
+    if path.endswith(".jsonl"):
+        with open(path) as results:
+            for line in results:
+                result = json.loads(line)
+                if (result.get('size', BOARD_SIZE), result.get('fences', FENCES)) != (size, fences):
+                    continue
+                yield [(move_type, tuple(coords)) for move_type, coords in result['moves']]
+        return
+    if record_settings(path) != (size, fences):
+        return
+    yield from read_games(path)
+
+
+def count_moves(games, size=BOARD_SIZE, fences=FENCES, plies=BOOK_PLIES):
+    """
+    Counts how often each move was played in each of the first positions of some games, and
+    how often the player who made it won.
+
+    Args:
+        games: Iterable of move lists.
+        size: Integer representing the number of squares per side.
+        fences: Integer representing the number of fences each player starts with.
+        plies: Integer representing the number of moves of each game counted.
+
+    Returns:
+        Dictionary mapping (key, move code) to [games, wins].
+    """
+    counts = {}
+    for number, moves in enumerate(games):
+        game = QuoridorGame(size, fences)
+        played = []
+        for move in moves:
+            if len(played) < plies:
+                key, transforms = canonical_transforms(game)
+                played.append((key, encode_move(canonical_move(move, transforms, size), size), game.get_player_turn()))
+            if not game.push(move):
+                raise ValueError(f"illegal move {move} in game {number}")
+
+        winner = game.get_winner()
+        for key, code, player in played:
+            count = counts.setdefault((key, code), [0, 0])
+            count[0] += 1
+            count[1] += player == winner
+    return counts
+
+
+def write_book(path, counts, size=BOARD_SIZE, fences=FENCES, min_games=1):
+    """
+    Writes a book file with its entries sorted by key, and for each key by games and wins.
+
+    Args:
+        path: Path of the book file to create.
+        counts: Dictionary from count_moves.
+        size: Integer representing the number of squares per side.
+        fences: Integer representing the number of fences each player starts with.
+        min_games: Integer representing the fewest games a move needs to be kept.
+
+    Returns:
+        Integer representing the number of entries written.
+    """
+    entries = sorted(((key, code, min(games, MAX_COUNT), min(wins, MAX_COUNT))
+                      for (key, code), (games, wins) in counts.items() if games >= min_games),
+                     key=lambda entry: (entry[0], -entry[2], -entry[3], entry[1]))
+    with open(path, 'wb') as book_file:
+        book_file.write(HEADER.pack(MAGIC, size, fences, len(entries)))
+        for entry in entries:
+            book_file.write(ENTRY.pack(*entry))
+    return len(entries)
+
+
+def build_book(paths, output, size=BOARD_SIZE, fences=FENCES, plies=BOOK_PLIES, min_games=1):
+    """
+    Builds a book from record and tournament result files.
+
+    Args:
+        paths: List of paths of .qrec and .jsonl files.
+        output: Path of the book file to create.
+        size: Integer representing the number of squares per side.
+        fences: Integer representing the number of fences each player starts with.
+        plies: Integer representing the number of moves of each game stored.
+        min_games: Integer representing the fewest games a move needs to be kept.
+
+    Returns:
+        Integer representing the number of entries written.
+    """
+    games = (moves for path in paths for moves in games_from_file(path, size, fences))
+    return write_book(output, count_moves(games, size, fences, plies), size, fences, min_games)
+
+
+class OpeningBook:
+    """
+    This class reads a book file through a read only memory map, so only the pages a lookup
+    touches are read from disk. Lookups binary search the sorted entries.
+    Main methods available to use are as follows:
+
+    lookup: Returns the book moves of a position with their statistics
+    best_move: Returns the most played legal book move of a position, or None
+    close: Closes the file
+    """
+
+    def __init__(self, path):
+        """
+        Opens a book file.
+
+        Args:
+            path: Path of the book file.
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self._size, self._fences, self._count = HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"{path} is not a Quoridor opening book")
+        if magic != MAGIC or len(self._map) < HEADER.size + self._count*ENTRY.size:
+            self.close()
+            raise ValueError(f"{path} is not a Quoridor opening book")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def get_settings(self):
+        """
+        Returns a tuple of the board size and fences per player the book was built for.
+        """
+        return self._size, self._fences
+
+    def _key_at(self, index):
+        """
+        Returns the key of an entry.
+        """
+        return struct.unpack_from("<Q", self._map, HEADER.size + index*ENTRY.size)[0]
+
+    def lookup(self, game):
+        """
+        Returns the book moves of a position, most played first. Games of another board or with
+        more than two players have no book moves.
+
+        Args:
+            game: QuoridorGame object of interest.
+
+        Returns:
+            A list of (move, games, wins) tuples with moves in the format used by push.
+        """
+        if (game.get_board_size(), game.get_starting_fences(), game.get_player_count()) != (self._size, self._fences, 2):
+            return []
+        key, transform = canonical_key(game)
+
+        #First entry with a key not less than the position's
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high)//2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        index = low
+        while index < self._count:
+            entry_key, code, games, wins = ENTRY.unpack_from(self._map, HEADER.size + index*ENTRY.size)
+            if entry_key != key:
+                break
+            move = decode_move(code, self._size)
+            moves.append((transform_move(move, transform, self._size), games, wins))
+            index += 1
+        return moves
+
+    def best_move(self, game):
+        """
+        Returns the most played book move of a position that is legal, or None if the position
+        is not in the book.
+
+        Args:
+            game: QuoridorGame object of interest.
+        """
+        pawn = game.get_pawn(game.get_player_turn())
+        for move, games, wins in self.lookup(game):
+            move_type, coords = move
+            #Guard against hash collisions with positions from other games
+            if move_type == 'p' and coords in game.possible_moves(pawn):
+                return move
+            if move_type != 'p' and pawn.get_remaining_fences() > 0 and game.try_fence(move_type, coords):
+                return move
+        return None
+
+    def close(self):
+        """
+        Closes the memory map and the file.
+        """
+        self._map.close()
+        self._file.close()
+
+
+def main():
+    """
+    Parses the command line and builds a book.
+    """
+    parser = argparse.ArgumentParser(description="Build a Quoridor opening book")
+    parser.add_argument('output', help="book file to create")
+    parser.add_argument('games', nargs='+', help=".qrec record files and .jsonl tournament results")
+    parser.add_argument('--plies', type=int, default=BOOK_PLIES, help="moves of each game to store")
+    parser.add_argument('--min-games', type=int, default=1, help="fewest games a move needs to be stored")
+    parser.add_argument('--size', type=int, default=BOARD_SIZE, help="squares per side of the board")
+    parser.add_argument('--fences', type=int, default=FENCES, help="fences per player")
+    args = parser.parse_args()
+    entries = build_book(args.games, args.output, args.size, args.fences, args.plies, args.min_games)
+    print(f"{entries} book entries written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
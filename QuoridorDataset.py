@@ -0,0 +1,177 @@
+#Description: This program exports positions from Quoridor game records into a memory mapped NumPy file
+#             for training evaluation models, and reads them back in batches without copying.
+#             Example: python QuoridorDataset.py games.qrec positions.npy
+
+import argparse
+import numpy as np
+from numpy.lib.format import open_memmap
+from QuoridorEngine import BOARD_SIZE, QuoridorGame
+from QuoridorRecord import code_width, encode_move, read_games, record_settings
+
+
+def position_dtype(size=BOARD_SIZE):
+    """
+    Returns the layout of one position on a board size. Fence planes are indexed [row][col] by
+    the square to the top left of the fence center, pawn planes [player-1][y][x]. Distances are
+    the shortest path lengths of players 1 and 2, move is the binary record code of the move
+    played and outcome is 1 if the side to move went on to win, -1 if it lost and 0 if the game
+    was unfinished.
+
+    Args:
+        size: Integer representing the number of squares per side.
+    """
+    return np.dtype([
+        ('h_fences', np.uint8, (size-1, size-1)),
+        ('v_fences', np.uint8, (size-1, size-1)),
+        ('pawns', np.uint8, (2, size, size)),
+        ('fences', np.uint8, (2,)),
+        ('turn', np.uint8),
+        ('distances', np.uint8 if size*size < 256 else np.uint16, (2,)),
+        ('move', np.uint8 if code_width(size) == 1 else np.uint16),
+        ('outcome', np.int8),
+    ])
+
+
+#Layout of one position on the standard board
+POSITION_DTYPE = position_dtype()
+
+
+def count_positions(record_path):
+    """
+    Returns the number of positions export_positions writes for a record file: one per move.
+
+    Args:
+        record_path: Path of a binary record file written by QuoridorRecord.
+    """
+    return sum(len(moves) for moves in read_games(record_path))
+
+
+def write_game_positions(positions, start, moves, size=BOARD_SIZE, fences=None):
+    """
+    Plays a game and writes the position before every move into consecutive rows. Fence and
+    pawn planes are kept up to date from the moves, so the board is never scanned.
+
+    Args:
+        positions: Structured array with position_dtype(size) to write to.
+        start: Integer representing the first row to write.
+        moves: List of moves of the game in the format used by QuoridorGame.push.
+        size: Integer representing the number of squares per side.
+        fences: Integer representing the number of fences each player starts with, or None for
+                the default.
+
+    Returns:
+        Integer representing the row after the last one written.
+    """
+    game = QuoridorGame(size) if fences is None else QuoridorGame(size, fences)
+    h_fences = np.zeros((size-1, size-1), np.uint8)
+    v_fences = np.zeros((size-1, size-1), np.uint8)
+    pawns = np.zeros((2, size, size), np.uint8)
+    for player in (1, 2):
+        x, y = game.get_pawn(player).get_location()
+        pawns[player-1, y, x] = 1
+
+    row = start
+    for move in moves:
+        player = game.get_player_turn()
+        position = positions[row]
+        position['h_fences'] = h_fences
+        position['v_fences'] = v_fences
+        position['pawns'] = pawns
+        position['fences'] = (game.get_pawn(1).get_remaining_fences(), game.get_pawn(2).get_remaining_fences())
+        position['turn'] = player
+        position['distances'] = (game.distance_to_goal(1), game.distance_to_goal(2))
+        position['move'] = encode_move(move, size)
+
+        previous = game.get_pawn(player).get_location()
+        if not game.push(move):
+            raise ValueError(f"illegal move {move} in game at row {start}")
+        move_type, (x, y) = move
+        if move_type == 'p':
+            pawns[player-1, previous[1], previous[0]] = 0
+            pawns[player-1, y, x] = 1
+        elif move_type == 'h':
+            h_fences[y-1, x] = 1
+        else:
+            v_fences[y, x-1] = 1
+        row += 1
+
+    #Label every position of the game with the result for its side to move
+    winner = 1 if game.is_winner(1) else 2 if game.is_winner(2) else 0
+    if winner:
+        turns = positions['turn'][start:row]
+        positions['outcome'][start:row] = np.where(turns == winner, 1, -1)
+    else:
+        positions['outcome'][start:row] = 0
+    return row
+
+
+def export_positions(record_path, output_path):
+    """
+    Exports every position of a record file to a .npy file with the position_dtype of the
+    record's board size. The records are read twice, first to size the file and then to fill it
+    through a memory map, so neither the games nor the positions have to fit in memory.
+
+    Args:
+        record_path: Path of a binary record file written by QuoridorRecord.
+        output_path: Path of the .npy file to create.
+
+    Returns:
+        Integer representing the number of positions written.
+    """
+    size, fences = record_settings(record_path)
+    count = count_positions(record_path)
+    positions = open_memmap(output_path, mode='w+', dtype=position_dtype(size), shape=(count,))
+    row = 0
+    for moves in read_games(record_path):
+        row = write_game_positions(positions, row, moves, size, fences)
+    positions.flush()
+    del positions
+    return count
+
+
+def load_positions(path):
+    """
+    Returns the positions of a .npy file written by export_positions as a read only memory map.
+
+    Args:
+        path: Path of the .npy file.
+    """
+    return np.load(path, mmap_mode='r')
+
+
+def batches(positions, batch_size, shuffle=False, seed=None):
+    """
+    Generator over batches of positions. Each batch is a slice of the array, so batches of a
+    memory map are views of the file and nothing is copied until the fields are used. Shuffling
+    changes the order of the batches, not the positions within them.
+
+    Args:
+        positions: Structured array with position_dtype, usually from load_positions.
+        batch_size: Integer representing the number of positions per batch.
+        shuffle: True to return the batches in random order.
+        seed: Integer seed for the shuffle.
+
+    Yields:
+        Structured arrays of up to batch_size positions.
+    """
+    starts = np.arange(0, len(positions), batch_size)
+    if shuffle:
+        np.random.default_rng(seed).shuffle(starts)
+    for start in starts:
+        yield positions[start:start+batch_size]
+
+
+def main():
+    """
+    Parses the command line and exports a record file.
+    """
+    parser = argparse.ArgumentParser(description="Export Quoridor game records to a NumPy position file")
+    parser.add_argument('records', help="binary record file written by QuoridorRecord")
+    parser.add_argument('output', help=".npy file to create")
+    args = parser.parse_args()
+    count = export_positions(args.records, args.output)
+    print(f"{count} positions written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#Description: This program solves two player Quoridor endgames in which neither player has a fence left.
+#             The fences on the board can then no longer change, so the game is a race on a fixed
+#             layout. Every position of a layout is solved at once by retrograde analysis over the
+#             pawn squares and the player to move, using the same step, jump and diagonal rules as
+#             QuoridorGame.can_move_*. Solved layouts are kept in a least recently used cache, so an
+#             endgame position costs one table lookup once its layout has been solved.
+
+import time
+from array import array
+from collections import OrderedDict, deque
+
+#Results for the player to move. Positions that are neither won nor lost are draws, where both
+#players can keep the other from ever reaching its goal.
+DRAW = 0
+WIN = 1
+LOSS = 2
+
+#Step directions: up, down, left and right, and the two directions beside each
+DIRECTIONS = ((0,-1), (0,1), (-1,0), (1,0))
+SIDEWAYS = ((3,2), (3,2), (0,1), (0,1))
+
+#Layouts kept by an EndgameSolver
+CACHE_SIZE = 16
+
+#Positions solved between checks of the deadline
+DEADLINE_CHECK = 4096
+
+#Share of a bot's time budget for a move that solving a new layout may use. A layout that takes
+#longer is left to the search.
+SOLVE_SHARE = 0.5
+
+
+class SolveTimeout(Exception):
+    """
+    Raised while solving a layout when its deadline has passed.
+    """
+
+
+def fence_layout(game):
+    """
+    Returns the key of the fences on the board of a game: its size and the sorted fence moves.
+    Every fence on the board was placed by a move in the game's history.
+
+    Args:
+        game: QuoridorGame object of interest.
+    """
+    fences = sorted(move for move in game.get_move_history() if move[0] != 'p')
+    return game.get_board_size(), tuple(fences)
+
+
+def is_endgame(game):
+    """
+    Checks if a game is a two player game in which neither player has a fence left.
+
+    Args:
+        game: QuoridorGame object of interest.
+    """
+    pawns = game.get_pawns()
+    return len(pawns) == 2 and all(pawn.get_remaining_fences() == 0 for pawn in pawns)
+
+
+class EndgameTable:
+    """
+    This class holds the solution of every position on one fence layout. A position is the
+    square of each pawn and the player to move, and for each one the table stores whether the
+    player to move wins, loses or draws, and in how many plies the game ends with best play. The
+    winner plays for the fastest win and the loser for the slowest loss.
+    Main methods available to use are as follows:
+
+    pawn_moves: Returns the squares a pawn can move to
+    result: Returns the result and plies left of a position
+    best_move: Returns the move that keeps the best result
+    """
+
+    def __init__(self, game, deadline=None):
+        """
+        Solves every position on the fence layout of a game.
+
+        Args:
+            game: QuoridorGame object whose fences make the layout.
+            deadline: Float, time.monotonic() value to give up at, or None.
+
+        Raises:
+            SolveTimeout: If the deadline passes before the layout is solved.
+        """
+        size = game.get_board_size()
+        board = game.get_board()
+        self._size = size
+        squares = size*size
+
+        #Square reached by one step in each direction, or None if a fence or the edge is in the way
+        self._steps = []
+        for y in range(size):
+            for x in range(size):
+                blocked = (board[y][x]['h'], board[y+1][x]['h'], board[y][x]['v'], board[y][x+1]['v'])
+                self._steps.append([None if wall else (y+dy)*size + x+dx
+                                    for wall, (dx, dy) in zip(blocked, DIRECTIONS)])
+
+        #Positions are numbered (player 1 square, player 2 square, player to move)
+        count = squares*squares*2
+        self._results = bytearray(count)
+        self._plies = array('H', bytes(2*count))
+        remaining = array('H', bytes(2*count))
+        parents = [[] for _ in range(count)]
+        queue = deque()
+
+        for first in range(squares):
+            if deadline is not None and time.monotonic() > deadline:
+                raise SolveTimeout()
+            for second in range(squares):
+                if first == second:
+                    continue
+                first_won = first // size == size-1
+                second_won = second // size == 0
+                for turn in (0, 1):
+                    state = (first*squares + second)*2 + turn
+                    #The game ended with the last move, so the player to move has lost
+                    if first_won or second_won:
+                        if (first_won and turn == 1) or (second_won and turn == 0):
+                            self._results[state] = LOSS
+                            queue.append(state)
+                        continue
+                    children = self.children(state)
+                    remaining[state] = len(children)
+                    for child in children:
+                        parents[child].append(state)
+
+        #Positions are solved in order of plies left, so wins are as fast and losses as slow as possible
+        solved = 0
+        while queue:
+            solved += 1
+            if deadline is not None and solved % DEADLINE_CHECK == 0 and time.monotonic() > deadline:
+                raise SolveTimeout()
+            state = queue.popleft()
+            lost = self._results[state] == LOSS
+            for parent in parents[state]:
+                if self._results[parent] != DRAW:
+                    continue
+                if lost:
+                    self._results[parent] = WIN
+                else:
+                    remaining[parent] -= 1
+                    if remaining[parent]:
+                        continue
+                    self._results[parent] = LOSS
+                self._plies[parent] = self._plies[state] + 1
+                queue.append(parent)
+
+    def pawn_moves(self, square, other):
+        """
+        Returns the squares a pawn can move to with the other pawn on a given square.
+
+        Args:
+            square: Integer representing the pawn's square, numbered row*size + column.
+            other: Integer representing the other pawn's square.
+        """
+        moves = []
+        for direction, target in enumerate(self._steps[square]):
+            if target is None:
+                continue
+            if target != other:
+                moves.append(target)
+                continue
+            #Jump the other pawn, or step beside it when a fence or the edge is behind it
+            beyond = self._steps[other][direction]
+            if beyond is not None:
+                moves.append(beyond)
+                continue
+            for side in SIDEWAYS[direction]:
+                if self._steps[other][side] is not None:
+                    moves.append(self._steps[other][side])
+        return moves
+
+    def children(self, state):
+        """
+        Returns the positions reached by the moves of the player to move.
+
+        Args:
+            state: Integer representing the position.
+        """
+        squares = self._size*self._size
+        pair, turn = divmod(state, 2)
+        first, second = divmod(pair, squares)
+        if turn == 0:
+            return [(square*squares + second)*2 + 1 for square in self.pawn_moves(first, second)]
+        return [(first*squares + square)*2 for square in self.pawn_moves(second, first)]
+
+    def state(self, game):
+        """
+        Returns the number of the current position of a game.
+
+        Args:
+            game: QuoridorGame object on the table's fence layout.
+        """
+        (x1, y1), (x2, y2) = game.get_p1_location(), game.get_p2_location()
+        size = self._size
+        return ((y1*size + x1)*size*size + y2*size + x2)*2 + game.get_player_turn()-1
+
+    def result(self, state):
+        """
+        Returns a tuple of the result for the player to move (WIN, LOSS or DRAW) and the plies
+        left with best play, 0 for a draw.
+
+        Args:
+            state: Integer representing the position.
+        """
+        return self._results[state], self._plies[state]
+
+    def best_move(self, state):
+        """
+        Returns the pawn move that keeps the best result: the fastest win, the slowest loss, or
+        a move that keeps a draw. Ties go to the move closest to the pawn's goal.
+
+        Args:
+            state: Integer representing the position.
+
+        Returns:
+            Tuple containing 'p' and the coordinates to move to, or None if the pawn cannot move.
+        """
+        size = self._size
+        squares = size*size
+        turn = state % 2
+        result, plies = self.result(state)
+        choices = []
+        for child in self.children(state):
+            child_result, child_plies = self.result(child)
+            if result == WIN and (child_result != LOSS or child_plies != plies-1):
+                continue
+            if result == DRAW and child_result != DRAW:
+                continue
+            #Square the pawn moved to and its distance from its goal row
+            square = child//2 // squares if turn == 0 else child//2 % squares
+            distance = size-1 - square//size if turn == 0 else square//size
+            choices.append((-child_plies if result == LOSS else 0, distance, square))
+        if not choices:
+            return None
+        square = min(choices)[2]
+        return ('p', (square % size, square // size))
+
+
+class EndgameSolver:
+    """
+    This class solves endgame positions, building an EndgameTable the first time a fence layout
+    is seen. The most recently used tables are kept, so each layout is solved once and every
+    pawn position on it is then a lookup. A solve can be given a time limit. A layout that
+    could not be solved within it is only tried again with a larger limit or none.
+    Main methods available to use are as follows:
+
+    solve: Returns the winner, the best move and the plies left of an endgame position
+    get_stats: Returns the number of cache hits and misses
+    """
+
+    def __init__(self, max_layouts=CACHE_SIZE):
+        """
+        Initializes the solver.
+
+        Args:
+            max_layouts: Integer representing the number of solved layouts to keep.
+        """
+        self._max_layouts = max_layouts
+        self._tables = OrderedDict()
+        #Largest time limit each recent layout failed to be solved in
+        self._timeouts = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def table(self, game, time_limit=None):
+        """
+        Returns the table of a game's fence layout, solving it if it is not cached.
+
+        Args:
+            game: QuoridorGame object of interest.
+            time_limit: Float representing the seconds a new layout may take, or None.
+
+        Returns:
+            EndgameTable object, or None if the layout could not be solved in time. A layout that
+            timed out is not tried again unless the time limit is larger or None.
+        """
+        key = fence_layout(game)
+        if key in self._tables:
+            self._hits += 1
+            self._tables.move_to_end(key)
+            return self._tables[key]
+        failed = self._timeouts.get(key)
+        if failed is not None and time_limit is not None and time_limit <= failed:
+            self._hits += 1
+            self._timeouts.move_to_end(key)
+            return None
+
+        self._misses += 1
+        deadline = time.monotonic() + time_limit if time_limit is not None else None
+        try:
+            table = EndgameTable(game, deadline)
+        except SolveTimeout:
+            self._timeouts[key] = time_limit
+            self._timeouts.move_to_end(key)
+            while len(self._timeouts) > self._max_layouts:
+                self._timeouts.popitem(last=False)
+            return None
+        self._timeouts.pop(key, None)
+        self._tables[key] = table
+        while len(self._tables) > self._max_layouts:
+            self._tables.popitem(last=False)
+        return table
+
+    def solve(self, game, time_limit=None):
+        """
+        Solves a position in which neither player has a fence left.
+
+        Args:
+            game: QuoridorGame object of interest.
+            time_limit: Float representing the seconds a layout that is not cached may take to
+                        solve, or None for no limit.
+
+        Returns:
+            Tuple containing the winner with best play (0 for a draw), the best move for the
+            player to move (None if the game is over or the pawn cannot move) and the plies left,
+            or None if the game is not an endgame or its layout could not be solved in time.
+        """
+        if not is_endgame(game):
+            return None
+        winner = game.get_winner()
+        if winner:
+            return winner, None, 0
+
+        table = self.table(game, time_limit)
+        if table is None:
+            return None
+        state = table.state(game)
+        result, plies = table.result(state)
+        player = game.get_player_turn()
+        if result == WIN:
+            winner = player
+        elif result == LOSS:
+            winner = 3 - player
+        return winner, table.best_move(state), plies
+
+    def get_stats(self):
+        """
+        Returns a tuple of the number of layouts found in the cache, timed out ones included, and
+        the number of solves started.
+        """
+        return self._hits, self._misses
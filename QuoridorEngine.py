@@ -4,15 +4,43 @@
 #             QuoridorGame that handles the majority of the board and game rules. 
 
 import copy
-from pathfinding.core.grid import Grid
-from pathfinding.finder.a_star import AStarFinder
+import hashlib
+import heapq
+from collections import deque
+
+#Default number of squares per side and fences per player
+BOARD_SIZE = 9
+FENCES = 10
+FOUR_PLAYER_FENCES = 5
+
+#Order players take turns in, going clockwise around the board. Player 1 starts at the top,
+#player 2 at the bottom, player 3 on the right and player 4 on the left.
+TURN_ORDER = {2: (1,2), 4: (1,3,2,4)}
+
+#Zobrist keys, created on first use
+ZOBRIST_KEYS = {}
+
+def zobrist_key(*feature):
+    """
+    Returns the 64 bit Zobrist key of a position feature, such as ('pawn', 1, (4,0)). Keys are
+    derived from a hash of the feature itself, so they are the same in every process and run.
+
+    Args:
+        feature: Values describing the feature.
+    """
+    key = ZOBRIST_KEYS.get(feature)
+    if key is None:
+        digest = hashlib.blake2b(repr(feature).encode(), digest_size=8).digest()
+        key = ZOBRIST_KEYS[feature] = int.from_bytes(digest, 'little')
+    return key
+
 
 class Pawn:
     """
     This class represents a pawn object to be used in a Quoridor game.
     """
 
-    def __init__(self,player,starting_coords):
+    def __init__(self,player,starting_coords,fences=FENCES):
         """
         Initializes pawn object. Used by the QuoridorGame class
         to generate pawn objects for game.
@@ -20,10 +48,11 @@ class Pawn:
         Args:
             player: Integer representing the player the pawn belogns to.
             starting_cords: Tuple representing the starting coordinates of the pawn.
+            fences: Integer representing the number of fences the player starts with.
         """
         self._player = player
         self._location = starting_coords
-        self._fences = 10
+        self._fences = fences
     
     def get_player(self):
         """
@@ -58,13 +87,19 @@ class Pawn:
         """
         self._fences -= 1
 
+    def increment_fences(self):
+        """
+        Increases amount of remaining fences by 1. Used when a fence placement is undone.
+        """
+        self._fences += 1
+
 
 
 class QuoridorGame:
     """
     This class represents a Quoridor game board object. Player 1 will start the game. On a player's turn
     they will make one move. They can either move the pawn or place a fence. Uses the Pawn class to generate
-    pawn objects.
+    pawn objects. Two or four players can play, each heading for the opposite edge of the board.
     Main methods available to use are as follows:
     
     print_board: Prints the game board
@@ -72,38 +107,69 @@ class QuoridorGame:
     place_fence: Places a fence at a desired location
     is_winner: Tells the user if a player has won the game
     get_player_turn: Tells the user whose turn it is
+    push: Makes a move for the player whose turn it is
+    pop: Undoes the last move
     """
 
-    def __init__(self):
+    def __init__(self,size=BOARD_SIZE,fences=None,players=2):
         """
-        Initializes the game board with fences (four board edges) and pawns (P1 and P2) placed in the correct
-        positions.
+        Initializes the game board with fences (four board edges) and pawns placed in the correct
+        positions: P1 at the top, P2 at the bottom and, with four players, P3 on the right and P4
+        on the left.
+
+        Args:
+            size: Integer representing the number of squares per side. Must be odd so the pawns
+                  start in the middle of their edge.
+            fences: Integer representing the number of fences each player starts with, or None
+                    for FENCES with two players and FOUR_PLAYER_FENCES with four.
+            players: Integer representing the number of players, 2 or 4.
         """
-        #Create players
-        self._p1 = Pawn(1, (4,0))
-        self._p2 = Pawn(2, (4,8))
+        if size < 3 or size % 2 == 0:
+            raise ValueError(f"board size must be odd and at least 3, not {size}")
+        if players not in TURN_ORDER:
+            raise ValueError(f"a game has 2 or 4 players, not {players}")
+        if fences is None:
+            fences = FENCES if players == 2 else FOUR_PLAYER_FENCES
+        self._starting_fences = fences
+
+        #Create players, each heading for the opposite edge. A goal is an axis (0 for columns,
+        #1 for rows) and the column or row number to reach on it.
+        middle = size//2
+        starts = {1: (middle,0), 2: (middle,size-1), 3: (size-1,middle), 4: (0,middle)}
+        goals = {1: (1,size-1), 2: (1,0), 3: (0,0), 4: (0,size-1)}
+        self._pawns = [Pawn(player, starts[player], fences) for player in range(1, players+1)]
+        self._goals = {player: goals[player] for player in range(1, players+1)}
+        self._next_player = {player: TURN_ORDER[players][(index+1) % players] for index, player in enumerate(TURN_ORDER[players])}
         self._player_turn = 1
 
-        #Create board
+        #Create board, with an extra row and column holding the bottom and right edges
         self._board = []
-        for row in range(10):
-            self._board.append([{'coord': (column,row), 'h': False, 'v': False, 'pawn': False} for column in range(10)])
+        for row in range(size+1):
+            self._board.append([{'coord': (column,row), 'h': False, 'v': False, 'pawn': False} for column in range(size+1)])
         
         #Populate borders with fences
         for row in self._board:
             for column in row:
                 #Left and right edges
-                if (column['coord'][0] == 0 or column['coord'][0] == 9) and column['coord'][1] != 9:
+                if (column['coord'][0] == 0 or column['coord'][0] == size) and column['coord'][1] != size:
                     column['v'] = True
                 #Top and bottom edges
-                if (column['coord'][1] == 0 or column['coord'][1] == 9) and column['coord'][0] != 9:
+                if (column['coord'][1] == 0 or column['coord'][1] == size) and column['coord'][0] != size:
                     column['h'] = True
 
         #Place players on board
-        p1_location = self._p1.get_location()
-        p2_location = self._p2.get_location()
-        self._board[p1_location[1]][p1_location[0]]['pawn'] = True
-        self._board[p2_location[1]][p2_location[0]]['pawn'] = True
+        for pawn in self._pawns:
+            location = pawn.get_location()
+            self._board[location[1]][location[0]]['pawn'] = True
+
+        #Distance to goal from every square, one list per player indexed row*size + column
+        self._distance_fields = {player: self.compute_goal_distances(self.get_goal_squares(player)) for player in self._goals}
+
+        #Zobrist hash of the position, updated with every move
+        self._hash = self.compute_state_hash()
+
+        #Moves made so far with the information needed to undo them
+        self._history = []
 
     
     def get_board(self):
@@ -112,6 +178,18 @@ class QuoridorGame:
         """
         return self._board
 
+    def get_board_size(self):
+        """
+        Returns the number of squares per side of the board.
+        """
+        return len(self._board)-1
+
+    def get_starting_fences(self):
+        """
+        Returns the number of fences each player started the game with.
+        """
+        return self._starting_fences
+
     def get_pawn(self, player):
         """
         Returns the pawn object of a given player. 
@@ -119,23 +197,74 @@ class QuoridorGame:
         Args:
             player: Integer representing the player of interest.
         """
-        if player == 1:
-            return self._p1
-        
-        if player == 2:
-            return self._p2
+        if 1 <= player <= len(self._pawns):
+            return self._pawns[player-1]
+
+    def get_pawns(self):
+        """
+        Returns the list of pawn objects, player 1 first.
+        """
+        return self._pawns
+
+    def get_players(self):
+        """
+        Returns a tuple of the player numbers in the order they take turns.
+        """
+        return TURN_ORDER[len(self._pawns)]
+
+    def get_player_count(self):
+        """
+        Returns the number of players, 2 or 4.
+        """
+        return len(self._pawns)
+
+    def next_player(self,player):
+        """
+        Returns the player whose turn comes after a player's.
+
+        Args:
+            player: Integer representing the player of interest.
+        """
+        return self._next_player[player]
+
+    def has_legal_move(self,player):
+        """
+        Checks if a player could move the pawn or place a fence.
+
+        Args:
+            player: Integer representing the player of interest.
+        """
+        if self.possible_moves(self.get_pawn(player)) - {None}:
+            return True
+        return len(self.legal_fences(player)) > 0
+
+    def end_turn(self,player):
+        """
+        Passes the turn on after a player's move. With four players a pawn can be boxed in by
+        the others, and a player with no legal move is skipped.
+
+        Args:
+            player: Integer representing the player who just moved.
+        """
+        next_player = self.next_player(player)
+        if len(self._pawns) > 2 and not self.get_winner():
+            for _ in range(len(self._pawns)-1):
+                if self.has_legal_move(next_player):
+                    break
+                next_player = self.next_player(next_player)
+        self.set_player_turn(next_player)
 
     def get_p1_location(self):
         """
         Returns coordinates of player 1 location.
         """
-        return self._p1.get_location()
+        return self._pawns[0].get_location()
 
     def get_p2_location(self):
         """
         Returns coordinates of player 2 location.
         """
-        return self._p2.get_location()
+        return self._pawns[1].get_location()
 
     def get_player_turn(self):
         """
@@ -150,7 +279,38 @@ class QuoridorGame:
         Args:
             player: Integer representing the player who's turn it will be.
         """
+        self._hash ^= zobrist_key('turn', self._player_turn) ^ zobrist_key('turn', player)
         self._player_turn = player
+
+    def compute_state_hash(self):
+        """
+        Computes the Zobrist hash of the position from scratch. It covers every pawn location,
+        every placed fence, the remaining fences of every player and the player turn. Fence
+        owners are not part of the position.
+
+        Returns:
+            Integer containing the 64 bit hash.
+        """
+        state_hash = zobrist_key('turn', self._player_turn)
+        for pawn in self._pawns:
+            state_hash ^= zobrist_key('pawn', pawn.get_player(), pawn.get_location())
+            state_hash ^= zobrist_key('fences', pawn.get_player(), pawn.get_remaining_fences())
+
+        #Fence anchors hold the player number, borders hold True
+        for row in self._board:
+            for column in row:
+                for edge in ('h','v'):
+                    value = column[edge]
+                    if value and value is not True and value != "Fence Continued":
+                        state_hash ^= zobrist_key('fence', edge, column['coord'])
+        return state_hash
+
+    def state_hash(self):
+        """
+        Returns the 64 bit Zobrist hash of the current position. Equal positions have equal
+        hashes, whatever order the moves were made in.
+        """
+        return self._hash
     
     def print_board(self):
         """
@@ -174,10 +334,10 @@ class QuoridorGame:
                     vert_edges += "|"
                 
                 #Place player on board
-                if column['coord'] == self._p1.get_location():
-                    vert_edges += 'P1'
-                elif column['coord'] == self._p2.get_location():
-                    vert_edges += 'P2'
+                for pawn in self._pawns:
+                    if column['coord'] == pawn.get_location():
+                        vert_edges += 'P' + str(pawn.get_player())
+                        break
                 else:
                     vert_edges += "  "
            
@@ -211,19 +371,18 @@ class QuoridorGame:
             return {left_cell['coord']}
         
         #Left cell is obstructed by pawn and can jump
-        if left_cell['pawn'] and not left_cell['v']:
+        if left_cell['pawn'] and not left_cell['v'] and not row[location[0]-2]['pawn']:
             return {row[location[0]-2]['coord']}
 
-        #Left cell is blocked by pawn and fence. Calculate diagonal moves
-        if left_cell['pawn'] and left_cell['v']:
-            diagonal_moves = set()
-            #Upper-left cell not blocked by fence
-            if not left_cell['h']:
-                diagonal_moves.add((location[0]-1,location[1]-1))
-            #Lower-left cell not blocked by fence
-            if not self._board[location[1]+1][location[0]-1]['h']:
-                diagonal_moves.add((location[0]-1,location[1]+1))
-            return diagonal_moves
+        #Left cell is blocked by pawn and a fence or another pawn. Calculate diagonal moves
+        diagonal_moves = set()
+        #Upper-left cell not blocked by fence or pawn
+        if not left_cell['h'] and not self._board[location[1]-1][location[0]-1]['pawn']:
+            diagonal_moves.add((location[0]-1,location[1]-1))
+        #Lower-left cell not blocked by fence or pawn
+        if not self._board[location[1]+1][location[0]-1]['h'] and not self._board[location[1]+1][location[0]-1]['pawn']:
+            diagonal_moves.add((location[0]-1,location[1]+1))
+        return diagonal_moves
         
 
     def can_move_right(self,pawn): 
@@ -252,19 +411,18 @@ class QuoridorGame:
             return {right_cell['coord']}
         
         #Right cell is obstructed by pawn and can jump
-        if right_cell['pawn'] and not row[location[0]+2]['v']:
+        if right_cell['pawn'] and not row[location[0]+2]['v'] and not row[location[0]+2]['pawn']:
             return {row[location[0]+2]['coord']}
         
-        #Right cell blocked by a pawn and fence. Calculate diagonal moves
-        if right_cell['pawn'] and row[location[0]+2]['v']:
-            diagonal_moves = set()
-            #Upper-right cell not blocked by fence
-            if not row[location[0]+1]['h']: 
-                diagonal_moves.add((location[0]+1,location[1]-1))
-            #Lower-right cell not blocked by fence
-            if not self._board[location[1]+1][location[0]+1]['h']:
-                diagonal_moves.add((location[0]+1,location[1]+1))
-            return diagonal_moves
+        #Right cell blocked by a pawn and a fence or another pawn. Calculate diagonal moves
+        diagonal_moves = set()
+        #Upper-right cell not blocked by fence or pawn
+        if not row[location[0]+1]['h'] and not self._board[location[1]-1][location[0]+1]['pawn']:
+            diagonal_moves.add((location[0]+1,location[1]-1))
+        #Lower-right cell not blocked by fence or pawn
+        if not self._board[location[1]+1][location[0]+1]['h'] and not self._board[location[1]+1][location[0]+1]['pawn']:
+            diagonal_moves.add((location[0]+1,location[1]+1))
+        return diagonal_moves
     
     def can_move_up(self,pawn):
         """
@@ -288,19 +446,18 @@ class QuoridorGame:
             return {(location[0],location[1]-1)}
         
         #Upper cell is obstructed by pawn and can jump
-        if self._board[location[1]-1][location[0]]['pawn'] and not self._board[location[1]-1][location[0]]['h']:
+        if not self._board[location[1]-1][location[0]]['h'] and not self._board[location[1]-2][location[0]]['pawn']:
             return {(location[0],location[1]-2)}
         
-        #Upper cell is obstructed by pawn and fence. Calculate diagonal moves
-        if self._board[location[1]-1][location[0]]['pawn'] and self._board[location[1]-1][location[0]]['h']:
-            diagonal_moves = set()
-            #Upper-right cell not blocked by fence
-            if not self._board[location[1]-1][location[0]+1]['v']:
-                diagonal_moves.add((location[0]+1,location[1]-1))
-            #Upper-left cell not blocked by fence
-            if not self._board[location[1]-1][location[0]]['v']:
-                diagonal_moves.add((location[0]-1,location[1]-1))
-            return diagonal_moves
+        #Upper cell is obstructed by pawn and a fence or another pawn. Calculate diagonal moves
+        diagonal_moves = set()
+        #Upper-right cell not blocked by fence or pawn
+        if not self._board[location[1]-1][location[0]+1]['v'] and not self._board[location[1]-1][location[0]+1]['pawn']:
+            diagonal_moves.add((location[0]+1,location[1]-1))
+        #Upper-left cell not blocked by fence or pawn
+        if not self._board[location[1]-1][location[0]]['v'] and not self._board[location[1]-1][location[0]-1]['pawn']:
+            diagonal_moves.add((location[0]-1,location[1]-1))
+        return diagonal_moves
     
     def can_move_down(self,pawn):
         """
@@ -324,19 +481,18 @@ class QuoridorGame:
             return {(location[0],location[1]+1)}
         
         #Lower cell is obstructed by pawn and can jump
-        if self._board[location[1]+1][location[0]]['pawn'] and not self._board[location[1]+2][location[0]]['h']:
+        if not self._board[location[1]+2][location[0]]['h'] and not self._board[location[1]+2][location[0]]['pawn']:
             return {(location[0],location[1]+2)}
 
-        #Lower cell is obstructed by pawn and fence. Calculate diagonal moves
-        if self._board[location[1]+1][location[0]]['pawn'] and self._board[location[1]+2][location[0]]['h']:
-            diagonal_moves = set()
-            #Lower-right cell not blocked by fence
-            if not self._board[location[1]+1][location[0]+1]['v']:
-                diagonal_moves.add((location[0]+1,location[1]+1))
-            #Lower-left cell not blocked by fence
-            if not self._board[location[1]+1][location[0]]['v']:
-                diagonal_moves.add((location[0]-1,location[1]+1))
-            return diagonal_moves
+        #Lower cell is obstructed by pawn and a fence or another pawn. Calculate diagonal moves
+        diagonal_moves = set()
+        #Lower-right cell not blocked by fence or pawn
+        if not self._board[location[1]+1][location[0]+1]['v'] and not self._board[location[1]+1][location[0]+1]['pawn']:
+            diagonal_moves.add((location[0]+1,location[1]+1))
+        #Lower-left cell not blocked by fence or pawn
+        if not self._board[location[1]+1][location[0]]['v'] and not self._board[location[1]+1][location[0]-1]['pawn']:
+            diagonal_moves.add((location[0]-1,location[1]+1))
+        return diagonal_moves
 
     def possible_moves(self,pawn):
         """
@@ -365,16 +521,24 @@ class QuoridorGame:
         Returns:
             True if the player has won and False if the player has not won. 
         """
-        #Check player 1 win
-        if player == 1 and self._p1.get_location()[1] == 8:
-            return True
-        
-        #Check player 2 win
-        if player == 2 and self._p2.get_location()[1] == 0:
-            return True
-        
-        #No player has won
+        #Player has reached the goal edge
+        if player in self._goals:
+            axis, goal = self._goals[player]
+            return self._pawns[player-1].get_location()[axis] == goal
+
+        #No such player
         return False
+
+    def get_winner(self):
+        """
+        Returns the player who has won the game, or 0 if no player has won yet. The first
+        player to reach the goal edge wins.
+        """
+        for pawn in self._pawns:
+            axis, goal = self._goals[pawn.get_player()]
+            if pawn.get_location()[axis] == goal:
+                return pawn.get_player()
+        return 0
     
     def move_pawn(self,player,coords):
         """
@@ -390,48 +554,514 @@ class QuoridorGame:
             the game has already been won. 
        
         """
-        #Check if either player has won
-        if self.is_winner(1) or self.is_winner(2):
+        #Check if any player has won
+        if self.get_winner():
             return False
+        previous_hash = self._hash
         
-        #Calculate moves if player 1
-        if player == 1 and self.get_player_turn() == player:
-            moves_available = self.possible_moves(self._p1)
+        #Calculate moves of the player whose turn it is
+        if self.get_player_turn() == player:
+            pawn = self.get_pawn(player)
+            moves_available = self.possible_moves(pawn)
             #Check if move is in possible moves
-            if coords in moves_available:
+            if coords is not None and coords in moves_available:
                 #Clear current location on board
-                location = self._p1.get_location()
+                location = pawn.get_location()
                 self._board[location[1]][location[0]]['pawn'] = False
                 #Make move and set new location on board
-                self._p1.move_pawn(coords)
+                pawn.move_pawn(coords)
                 self._board[coords[1]][coords[0]]['pawn'] = True
+                self._hash ^= zobrist_key('pawn', player, location) ^ zobrist_key('pawn', player, coords)
                 
-                #Update player turn
-                self.set_player_turn(2)
-                return True
-
-        #Calculate moves if player 2
-        if player == 2 and self.get_player_turn() == player:
-            moves_available = self.possible_moves(self._p2)
-            #Check if move is in possible moves
-            if coords in moves_available:
-                #Clear current location on board
-                location = self._p2.get_location()
-                self._board[location[1]][location[0]]['pawn'] = False
-                #Make move and set new location on board
-                self._p2.move_pawn(coords)
-                self._board[coords[1]][coords[0]]['pawn'] = True
-                
-                #Update player turn
-                self.set_player_turn(1)
+                #Update player turn and history
+                self.end_turn(player)
+                self._history.append((('p',coords), player, location, previous_hash))
                 return True
                 
         #Move is invalid
         return False
     
+    def open_neighbors(self,board,square):
+        """
+        Returns the squares next to a square that are not cut off by a fence. Pawns are ignored.
+
+        Args:
+            board: Board list representation to use (see get_board).
+            square: Tuple containing the coordinates of the square of interest.
+
+        Returns:
+            A list of tuples containing the coordinates of the neighboring squares.
+        """
+        x, y = square
+        #Board edges are fenced, so no bounds checks are needed
+        neighbors = []
+        #Left
+        if not board[y][x]['v']:
+            neighbors.append((x-1,y))
+        #Right
+        if not board[y][x+1]['v']:
+            neighbors.append((x+1,y))
+        #Up
+        if not board[y][x]['h']:
+            neighbors.append((x,y-1))
+        #Down
+        if not board[y+1][x]['h']:
+            neighbors.append((x,y+1))
+        return neighbors
+
+    def goal_reachable(self,board,start,goal_row):
+        """
+        Checks if a goal row can be reached from a starting square. Runs a single breadth first
+        search from the start square that stops as soon as any square on the goal row is reached.
+        Pawns are ignored, only fences block movement.
+
+        Args:
+            board: Board list representation to search (see get_board).
+            start: Tuple containing the coordinates of the starting square.
+            goal_row: Integer representing the row that must be reached.
+
+        Returns:
+            True if any square on the goal row can be reached and False otherwise.
+        """
+        return self.shortest_path(board,start,goal_row) is not None
+
+    def shortest_path(self,board,start,goal_row):
+        """
+        Finds a shortest path from a starting square to any square on a goal row with a single
+        breadth first search. Pawns are ignored, only fences block movement.
+
+        Args:
+            board: Board list representation to search (see get_board).
+            start: Tuple containing the coordinates of the starting square.
+            goal_row: Integer representing the row that must be reached.
+
+        Returns:
+            A list of tuples containing the squares of the path, starting square first, or None if
+            the goal row cannot be reached.
+        """
+        size = len(board)-1
+        previous = [[None]*size for _ in range(size)]
+        previous[start[1]][start[0]] = start
+        queue = deque([start])
+
+        while queue:
+            square = queue.popleft()
+            if square[1] == goal_row:
+                #Walk back to the start square
+                path = [square]
+                while square != start:
+                    square = previous[square[1]][square[0]]
+                    path.append(square)
+                path.reverse()
+                return path
+
+            for nx, ny in self.open_neighbors(board,square):
+                if previous[ny][nx] is None:
+                    previous[ny][nx] = square
+                    queue.append((nx,ny))
+
+        return None
+
+    def get_goal_row(self,player):
+        """
+        Returns the row a player must reach to win, or None for players 3 and 4, who head for a
+        column instead (see get_goal_squares).
+
+        Args:
+            player: Integer representing the player of interest.
+        """
+        axis, goal = self._goals[player]
+        if axis == 1:
+            return goal
+        return None
+
+    def get_goal_squares(self,player):
+        """
+        Returns a list of the squares on a player's goal edge.
+
+        Args:
+            player: Integer representing the player of interest.
+        """
+        size = len(self._board)-1
+        axis, goal = self._goals[player]
+        if axis == 1:
+            return [(col,goal) for col in range(size)]
+        return [(goal,row) for row in range(size)]
+
+    def compute_distance_field(self,goal_row):
+        """
+        Computes the distance from every square to a goal row with a breadth first search that
+        starts from all goal squares at once. Pawns are ignored, only fences block movement.
+
+        Args:
+            goal_row: Integer representing the row of interest.
+
+        Returns:
+            A list of distances indexed row*size + column, where size is the number of squares per
+            row. Squares that cannot reach the goal row hold size*size.
+        """
+        size = len(self._board)-1
+        return self.compute_goal_distances([(col,goal_row) for col in range(size)])
+
+    def compute_goal_distances(self,goal_squares):
+        """
+        Computes the distance from every square to the nearest of a list of goal squares, the
+        same way as compute_distance_field.
+
+        Args:
+            goal_squares: List of tuples containing the coordinates of the goal squares.
+
+        Returns:
+            A list of distances indexed row*size + column. Squares that cannot reach a goal
+            square hold size*size.
+        """
+        size = len(self._board)-1
+        field = [size*size]*(size*size)
+        queue = deque()
+        for col, row in goal_squares:
+            field[row*size + col] = 0
+            queue.append((col,row))
+
+        while queue:
+            square = queue.popleft()
+            distance = field[square[1]*size + square[0]] + 1
+            for nx, ny in self.open_neighbors(self._board,square):
+                if field[ny*size + nx] > distance:
+                    field[ny*size + nx] = distance
+                    queue.append((nx,ny))
+        return field
+
+    def get_distance_field(self,player):
+        """
+        Returns the list of distances from every square to a player's goal row, indexed
+        row*size + column. The list is kept up to date by the game and must not be modified.
+
+        Args:
+            player: Integer representing the player of interest.
+        """
+        return self._distance_fields[player]
+
+    def distance_to_goal(self,player):
+        """
+        Returns the number of steps a player's pawn needs to reach its goal edge, ignoring the
+        other pawns. Unreachable goals give size*size.
+
+        Args:
+            player: Integer representing the player of interest.
+        """
+        size = len(self._board)-1
+        location = self.get_pawn(player).get_location()
+        return self._distance_fields[player][location[1]*size + location[0]]
+
+    def raise_distances(self,field,edges,changes):
+        """
+        Updates a distance field after the given steps were blocked by a fence, which is already on
+        the board. Distances can only grow, and only squares that lost every neighbor one step
+        closer to the goal need new values. Those squares are found in order of their old
+        distance and then given new distances with a search seeded from their unchanged neighbors.
+
+        Args:
+            field: Distance field to update in place.
+            edges: Blocked steps, as returned by fence_edges.
+            changes: List that (index, old distance) pairs are appended to so the update can be
+                     undone.
+        """
+        size = len(self._board)-1
+        unreachable = size*size
+
+        #Squares whose step towards the goal was cut
+        heap = []
+        for first, second in edges:
+            first_index = first[1]*size + first[0]
+            second_index = second[1]*size + second[0]
+            if field[first_index] == unreachable or field[second_index] == unreachable:
+                continue
+            if field[first_index] == field[second_index]+1:
+                heap.append((field[first_index],first))
+            elif field[second_index] == field[first_index]+1:
+                heap.append((field[second_index],second))
+        if not heap:
+            return
+        heapq.heapify(heap)
+
+        #Find every square left without support, closest to the goal first
+        lost = set()
+        while heap:
+            distance, square = heapq.heappop(heap)
+            if square in lost or distance == 0:
+                continue
+            neighbors = self.open_neighbors(self._board,square)
+            if any(field[ny*size + nx] == distance-1 and (nx,ny) not in lost for nx, ny in neighbors):
+                continue
+            lost.add(square)
+            for nx, ny in neighbors:
+                if field[ny*size + nx] == distance+1:
+                    heapq.heappush(heap, (distance+1,(nx,ny)))
+
+        #Seed lost squares from neighbors whose distance did not change
+        for x, y in lost:
+            changes.append((y*size + x, field[y*size + x]))
+            field[y*size + x] = unreachable
+        for square in lost:
+            best = unreachable
+            for nx, ny in self.open_neighbors(self._board,square):
+                if (nx,ny) not in lost and field[ny*size + nx]+1 < best:
+                    best = field[ny*size + nx]+1
+            if best < unreachable:
+                field[square[1]*size + square[0]] = best
+                heap.append((best,square))
+        heapq.heapify(heap)
+
+        #Spread the new distances through the lost squares
+        while heap:
+            distance, square = heapq.heappop(heap)
+            if distance > field[square[1]*size + square[0]]:
+                continue
+            for nx, ny in self.open_neighbors(self._board,square):
+                if field[ny*size + nx] > distance+1:
+                    field[ny*size + nx] = distance+1
+                    heapq.heappush(heap, (distance+1,(nx,ny)))
+
+    def tentative_distances(self,fence_type,coords):
+        """
+        Returns the distance to goal of every pawn if a fence were placed. If the fence blocks no
+        step towards any goal the current distances are returned straight away. Otherwise the
+        fence is set on the board, every distance field is updated incrementally and then
+        everything is restored.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates where a fence is to be placed.
+
+        Returns:
+            Tuple containing the distances of every player, player 1 first.
+        """
+        size = len(self._board)-1
+        edges = [edge for edge in self.fence_edges(fence_type,coords)
+                 if all(0 <= value < size for square in edge for value in square)]
+        indices = [location[1]*size + location[0] for location in (pawn.get_location() for pawn in self._pawns)]
+        fields = [self._distance_fields[pawn.get_player()] for pawn in self._pawns]
+
+        #Fence that blocks no step towards any goal changes nothing
+        downhill = False
+        for first, second in edges:
+            for field in fields:
+                difference = field[first[1]*size + first[0]] - field[second[1]*size + second[0]]
+                if difference == 1 or difference == -1:
+                    downhill = True
+        if not downhill:
+            return tuple(field[index] for field, index in zip(fields, indices))
+
+        #Place tentative fence, remembering what was there
+        first, second, edge = self.fence_squares(fence_type,coords)
+        first_cell = self._board[first[1]][first[0]]
+        second_cell = self._board[second[1]][second[0]]
+        first_value = first_cell[edge]
+        second_value = second_cell[edge]
+        first_cell[edge] = True
+        second_cell[edge] = True
+
+        changes = [[] for _ in fields]
+        try:
+            for field, field_changes in zip(fields, changes):
+                self.raise_distances(field, edges, field_changes)
+            return tuple(field[index] for field, index in zip(fields, indices))
+        finally:
+            #Undo field updates and remove tentative fence
+            for field, field_changes in zip(fields, changes):
+                for index, distance in reversed(field_changes):
+                    field[index] = distance
+            first_cell[edge] = first_value
+            second_cell[edge] = second_value
+
+    def downhill_path(self,player):
+        """
+        Returns a shortest path from a player's pawn to its goal row, found by stepping down the
+        distance field one square at a time.
+
+        Args:
+            player: Integer representing the player of interest.
+
+        Returns:
+            A list of tuples containing the squares of the path, pawn square first, or None if the
+            goal row cannot be reached.
+        """
+        size = len(self._board)-1
+        field = self._distance_fields[player]
+        square = self.get_pawn(player).get_location()
+        distance = field[square[1]*size + square[0]]
+        if distance == size*size:
+            return None
+
+        path = [square]
+        while distance > 0:
+            for nx, ny in self.open_neighbors(self._board,square):
+                if field[ny*size + nx] == distance-1:
+                    square = (nx,ny)
+                    break
+            distance -= 1
+            path.append(square)
+        return path
+
+    def fence_changes_distance(self,fence_type,coords):
+        """
+        Checks if placing a fence would change the distance to goal of any pawn.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates where a fence is to be placed.
+
+        Returns:
+            True if any distance would change and False otherwise.
+        """
+        return self.tentative_distances(fence_type,coords) != tuple(self.distance_to_goal(pawn.get_player()) for pawn in self._pawns)
+
+    def fence_squares(self,fence_type,coords):
+        """
+        Returns the two board squares and the edge key ('h' or 'v') that a fence occupies.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates of the fence.
+
+        Returns:
+            Tuple containing the first square, the second square and the edge key.
+        """
+        if fence_type == 'h':
+            return (coords[0],coords[1]), (coords[0]+1,coords[1]), 'h'
+        return (coords[0],coords[1]), (coords[0],coords[1]+1), 'v'
+
+    def fence_fits(self,fence_type,coords):
+        """
+        Checks that a fence is within the board, does not overlap a placed fence and does not
+        cross one. The fair play rule is not checked.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates where a fence is to be placed.
+
+        Returns:
+            True if the fence fits on the board and False otherwise.
+        """
+        size = len(self._board)-1
+        #Horizontal fence
+        if fence_type == 'h':
+            if not (0 <= coords[0] < size-1 and 0 <= coords[1] < size):
+                return False
+            return (not self._board[coords[1]][coords[0]]['h'] and not self._board[coords[1]][coords[0]+1]['h']
+                    and self._board[coords[1]][coords[0]+1]['v'] != "Fence Continued")
+
+        #Vertical fence
+        if fence_type == 'v':
+            if not (0 <= coords[0] < size and 0 <= coords[1] < size-1):
+                return False
+            return (not self._board[coords[1]][coords[0]]['v'] and not self._board[coords[1]+1][coords[0]]['v']
+                    and self._board[coords[1]+1][coords[0]]['h'] != "Fence Continued")
+
+        return False
+
     def fair_play_check(self,fence_type,coords):
         """
-        This method checks if placing a fence will break the fair play rule. 
+        This method checks if placing a fence will break the fair play rule, for every player in
+        one search. A fence blocks two steps, and it can only cut a pawn off if the squares on
+        either side of a blocked step are no longer connected. The tentative fence is set on the
+        board and a breadth first search is grown from all of those squares at once, each
+        square labeled with the search it came from. Once every label has met another, no region
+        was cut off and the check ends, usually after a few squares. If the searches run out
+        first the board was split, every region next to the fence has been labeled, and each
+        pawn in one of them needs a square of its goal edge in the same region. The board is
+        restored afterwards.
+        
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates where a fence is to be placed.
+        
+        Returns:
+            True if there remains a path for every player after the fence is placed and False if 
+            it breaks the fair play rule.
+        """
+        size = len(self._board)-1
+        edges = [edge for edge in self.fence_edges(fence_type,coords)
+                 if all(0 <= value < size for square in edge for value in square)]
+        seeds = list(dict.fromkeys(square for edge in edges for square in edge))
+        if not seeds:
+            return True
+
+        #Place tentative fence, remembering what was there
+        first, second, edge = self.fence_squares(fence_type,coords)
+        first_cell = self._board[first[1]][first[0]]
+        second_cell = self._board[second[1]][second[0]]
+        first_value = first_cell[edge]
+        second_value = second_cell[edge]
+        first_cell[edge] = True
+        second_cell[edge] = True
+
+        try:
+            #Label of every reached square, and the label each label was merged into
+            labels = [None]*(size*size)
+            merged = list(range(len(seeds)))
+            groups = len(seeds)
+            queue = deque()
+            for label, (x, y) in enumerate(seeds):
+                labels[y*size + x] = label
+                queue.append((x,y))
+
+            while queue:
+                square = queue.popleft()
+                label = labels[square[1]*size + square[0]]
+                while merged[label] != label:
+                    label = merged[label]
+                for nx, ny in self.open_neighbors(self._board,square):
+                    other = labels[ny*size + nx]
+                    if other is None:
+                        labels[ny*size + nx] = label
+                        queue.append((nx,ny))
+                        continue
+                    while merged[other] != other:
+                        other = merged[other]
+                    if other != label:
+                        merged[other] = label
+                        groups -= 1
+                        #Both sides of every blocked step are still connected
+                        if groups == 1:
+                            return True
+
+            #Board was split. Pawns away from the fence are in regions the fence did not change.
+            def region(square):
+                label = labels[square[1]*size + square[0]]
+                while label is not None and merged[label] != label:
+                    label = merged[label]
+                return label
+
+            for pawn in self._pawns:
+                pawn_region = region(pawn.get_location())
+                if pawn_region is None:
+                    continue
+                if not any(region(square) == pawn_region for square in self.get_goal_squares(pawn.get_player())):
+                    return False
+            return True
+        finally:
+            first_cell[edge] = first_value
+            second_cell[edge] = second_value
+
+    def try_fence(self,fence_type,coords):
+        """
+        Checks if a fence could be placed, without placing it. The fence must fit on the board
+        and satisfy the fair play rule. The board is left unchanged.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates where a fence is to be placed.
+
+        Returns:
+            True if the fence placement is legal and False otherwise.
+        """
+        return self.fence_fits(fence_type,coords) and self.fair_play_check(fence_type,coords)
+
+    def fair_play_check_astar(self,fence_type,coords):
+        """
+        Reference implementation of fair_play_check that runs one A* search per goal square. Kept
+        for cross-checking the BFS based check and requires the optional pathfinding package.
         
         Args:
             fence_type: String character containing the type of the fence (either 'h' or 'v').
@@ -441,6 +1071,13 @@ class QuoridorGame:
             True if there remains a path for both players after the fence is placed and False if 
             it breaks the fair play rule.
         """
+        #Optional A* backend, imported here so importing the engine does not load it
+        try:
+            from pathfinding.core.grid import Grid
+            from pathfinding.finder.a_star import AStarFinder
+        except ImportError:
+            raise ImportError("fair_play_check_astar requires the pathfinding package")
+
         #Copy board and place fence
         board_copy = copy.deepcopy(self.get_board())
         if fence_type == 'h':
@@ -451,9 +1088,10 @@ class QuoridorGame:
             board_copy[coords[1]+1][coords[0]]['v'] = True
         
         #Create matrix grid representing board copy
-        matrix = [[1 for _ in range(17)] for _ in range(17)]
-        for row in range(len(board_copy)-1):
-            for col in range(len(board_copy)-1):
+        size = len(board_copy)-1
+        matrix = [[1 for _ in range(2*size-1)] for _ in range(2*size-1)]
+        for row in range(size):
+            for col in range(size):
                 #Set vertical fences
                 if col != 0 and board_copy[row][col]['v'] != False:
                     matrix[2*row][2*col-1] = 0
@@ -461,7 +1099,7 @@ class QuoridorGame:
                 if row != 0 and board_copy[row][col]['h'] != False:
                     matrix[2*row-1][2*col] = 0
                 #Restrict diagonal movement
-                if row != 8 and col != 8:
+                if row != size-1 and col != size-1:
                     matrix[2*row+1][2*col+1] = 0    
 
 
@@ -477,7 +1115,7 @@ class QuoridorGame:
         
         #Find path to goal for p1. Starts at left most square and checks for path to all goal squares if neccessary
         while not p1_path_found and endpoint_counter < len(board_copy)-1:
-            end = grid.node(2*endpoint_counter,16)
+            end = grid.node(2*endpoint_counter,2*size-2)
             path, runs = finder.find_path(start,end,grid)
             if len(path) > 0:
                 p1_path_found = True 
@@ -499,10 +1137,77 @@ class QuoridorGame:
             grid.cleanup()
             endpoint_counter += 1
         
+        #Find paths for players 3 and 4 the same way, to any square of their goal column
+        for pawn in self._pawns[2:]:
+            location = pawn.get_location()
+            start = grid.node(2*location[0],2*location[1])
+            path_found = False
+            for goal in self.get_goal_squares(pawn.get_player()):
+                path, runs = finder.find_path(start,grid.node(2*goal[0],2*goal[1]),grid)
+                grid.cleanup()
+                if len(path) > 0:
+                    path_found = True
+                    break
+            if not path_found:
+                return False
+
         #Return True if path found for both players. 
         return p1_path_found and p2_path_found
         
 
+    def fence_edges(self,fence_type,coords):
+        """
+        Returns the two square to square steps that a fence blocks. Each step is a tuple of two
+        squares ordered so the same step always gives the same tuple.
+
+        Args:
+            fence_type: String character containing the type of the fence (either 'h' or 'v').
+            coords: Tuple containing the coordinates of the fence.
+        """
+        x, y = coords
+        if fence_type == 'h':
+            return ((x,y-1),(x,y)), ((x+1,y-1),(x+1,y))
+        return ((x-1,y),(x,y)), ((x-1,y+1),(x,y+1))
+
+    def legal_fences(self,player):
+        """
+        Returns every fence placement that is legal for a player. One shortest path is read off
+        the distance field of each pawn first. A fence that blocks no step of any path leaves
+        every path open and is legal as soon as it fits, so the fair play check only runs for
+        fences on a path.
+
+        Args:
+            player: Integer representing the player placing the fence.
+
+        Returns:
+            A set of (fence_type, coords) tuples.
+        """
+        if self.get_pawn(player).get_remaining_fences() <= 0:
+            return set()
+
+        #Steps used by the current shortest paths
+        size = len(self._board)-1
+        path_edges = set()
+        for path_player in self._goals:
+            path = self.downhill_path(path_player)
+            #A pawn that is already cut off makes every fence fail the fair play rule
+            if path is None:
+                return set()
+            for first, second in zip(path, path[1:]):
+                path_edges.add((min(first,second), max(first,second)))
+
+        fences = set()
+        for fence_type in ('h','v'):
+            for row in range(size):
+                for col in range(size):
+                    coords = (col,row)
+                    if not self.fence_fits(fence_type,coords):
+                        continue
+                    blocks_path = any(edge in path_edges for edge in self.fence_edges(fence_type,coords))
+                    if not blocks_path or self.fair_play_check(fence_type,coords):
+                        fences.add((fence_type,coords))
+        return fences
+
     def place_fence(self,player,fence_type,coords):
         """
         Places a fence for a player. This method checks that the fence placement is valid and if 
@@ -519,41 +1224,98 @@ class QuoridorGame:
         """
 
         #Check if game has already been won, and player turn is correct
-        if self.is_winner(1) or self.is_winner(2) or player != self.get_player_turn():
+        if self.get_winner() or player != self.get_player_turn():
             return False
-        
-        valid_h_coords = (set(range(8)), set(range(9)))
-        valid_v_coords = (set(range(9)), set(range(8)))
 
-        #Placing horizontal fence
-        if fence_type == 'h' and coords[0] in valid_h_coords[0] and coords[1] in valid_h_coords[1]:
-            if not self._board[coords[1]][coords[0]]['h'] and not self._board[coords[1]][coords[0]+1]['h'] and self._board[coords[1]][coords[0]+1]['v'] != "Fence Continued":
-                #Check that placement satisfies fair play rule
-                if not self.fair_play_check('h',coords):
-                    return False
-                self._board[coords[1]][coords[0]]['h'] = player
-                self._board[coords[1]][coords[0]+1]['h'] = "Fence Continued"
-                #Decrement fences and change player turn
-                self.get_pawn(player).decrement_fences()
-                if player == 1:
-                    self.set_player_turn(2)
-                else:
-                    self.set_player_turn(1)
-        
-        #Placing vertical fence
-        if fence_type == 'v' and coords[0] in valid_v_coords[0] and coords[1] in valid_v_coords[1] and self._board[coords[1]+1][coords[0]]['h'] != "Fence Continued":
-            if not self._board[coords[1]][coords[0]]['v'] and not self._board[coords[1]+1][coords[0]]['v']:
-                #Check that placement satisfies fair play rule
-                if not self.fair_play_check('v',coords):
-                    return False
-                self._board[coords[1]][coords[0]]['v'] = player
-                self._board[coords[1]+1][coords[0]]['v'] = "Fence Continued"
-                #Decrement fences and change player turn
-                self.get_pawn(player).decrement_fences()
-                if player == 1:
-                    self.set_player_turn(2)
-                else:
-                    self.set_player_turn(1)
+        #Check player has a fence left and placement is legal
+        if self.get_pawn(player).get_remaining_fences() <= 0 or not self.try_fence(fence_type,coords):
+            return False
+        previous_hash = self._hash
+
+        #Fence anchor holds the player number, the second half is marked as continued
+        first, second, edge = self.fence_squares(fence_type,coords)
+        self._board[first[1]][first[0]][edge] = player
+        self._board[second[1]][second[0]][edge] = "Fence Continued"
+
+        #Update distance fields for the blocked steps, keeping the changes for undo
+        edges = self.fence_edges(fence_type,coords)
+        field_changes = {}
+        for field_player, field in self._distance_fields.items():
+            field_changes[field_player] = []
+            self.raise_distances(field, edges, field_changes[field_player])
+
+        #Decrement fences and change player turn
+        pawn = self.get_pawn(player)
+        self._hash ^= zobrist_key('fence', fence_type, coords) ^ zobrist_key('fences', player, pawn.get_remaining_fences())
+        pawn.decrement_fences()
+        self._hash ^= zobrist_key('fences', player, pawn.get_remaining_fences())
+        self.end_turn(player)
+        self._history.append(((fence_type,coords), player, field_changes, previous_hash))
+        return True
+
+    def legal_moves(self):
+        """
+        Returns every legal move for the player whose turn it is, pawn moves first, in the format
+        used by push. The list is empty once the game has been won.
+        """
+        if self.get_winner():
+            return []
+        player = self._player_turn
+        pawn_moves = [('p',coords) for coords in self.possible_moves(self.get_pawn(player)) if coords is not None]
+        return sorted(pawn_moves) + sorted(self.legal_fences(player))
+
+    def push(self,move):
+        """
+        Makes a move for the player whose turn it is. A move is a tuple of a move type and
+        coordinates: ('p', coords) moves the pawn, ('h', coords) and ('v', coords) place a fence.
+
+        Args:
+            move: Tuple containing the move type and coordinates.
+
+        Returns:
+            True if the move was made and False if it is invalid.
+        """
+        move_type, coords = move
+        if move_type == 'p':
+            return self.move_pawn(self._player_turn, coords)
+        return self.place_fence(self._player_turn, move_type, coords)
+
+    def pop(self):
+        """
+        Undoes the last move, restoring the board including "Fence Continued" markers, pawn
+        locations, remaining fences, distance fields, hash and player turn exactly as they were.
+
+        Returns:
+            The move that was undone, or None if no move has been made.
+        """
+        if not self._history:
+            return None
+        move, player, undo_info, previous_hash = self._history.pop()
+        move_type, coords = move
+
+        if move_type == 'p':
+            #Move pawn back to previous location
+            self._board[coords[1]][coords[0]]['pawn'] = False
+            self._board[undo_info[1]][undo_info[0]]['pawn'] = True
+            self.get_pawn(player).move_pawn(undo_info)
+        else:
+            #Remove fence, restore distance fields and return the fence to the player
+            first, second, edge = self.fence_squares(move_type,coords)
+            self._board[first[1]][first[0]][edge] = False
+            self._board[second[1]][second[0]][edge] = False
+            for field_player, changes in undo_info.items():
+                field = self._distance_fields[field_player]
+                for index, distance in reversed(changes):
+                    field[index] = distance
+            self.get_pawn(player).increment_fences()
+
+        self._player_turn = player
+        self._hash = previous_hash
+        return move
+
+    def get_move_history(self):
+        """
+        Returns a list of the moves made so far, first move first, in the format used by push.
+        """
+        return [entry[0] for entry in self._history]
 
-        #Move is invalid
-        return False
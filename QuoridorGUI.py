@@ -4,10 +4,22 @@
 #               Quoridor board game. This program uses QuoridorEngine.py to handle the game mechanics. 
 
 from QuoridorEngine import *
+from QuoridorAI import AIPlayer
+from QuoridorBook import OpeningBook
+from collections import OrderedDict
+import argparse
+import copy
+import queue
+import threading
+import traceback
 import pygame
 
-#Width and height of window
+#Width and height of board, and height of the status bar below it
 BOARDSIZE = 500
+HUDHEIGHT = 40
+
+#Squares per side, and the size of a square and of the gap between squares. Set by set_board_size.
+BOARD_SQUARES = BOARD_SIZE
 SQUARESIZE = BOARDSIZE/9.8
 FENCEWIDTH = BOARDSIZE/98
 
@@ -21,14 +33,241 @@ BLUE = (50,147,198)
 LIGHTBLUE = (137,214,238)
 LIGHTERBLUE = (197,226,238)
 LIGHTGREEN = (139,231,139)
+PURPLE = (142,92,184)
+LIGHTERPURPLE = (222,205,238)
+ORANGE = (230,150,40)
+LIGHTERORANGE = (250,226,190)
 GRAY = (241,241,241)
 
+#Name, pawn and fence color, and fence highlight color of each player
+PLAYER_NAMES = {1: 'Red', 2: 'Blue', 3: 'Purple', 4: 'Orange'}
+PLAYER_COLORS = {1: RED, 2: BLUE, 3: PURPLE, 4: ORANGE}
+HIGHLIGHT_COLORS = {1: LIGHTERRED, 2: LIGHTERBLUE, 3: LIGHTERPURPLE, 4: LIGHTERORANGE}
+
 #Window refresh rate
 FPS = 60
 
-#Initialize game and window
-WIN = pygame.display.set_mode((BOARDSIZE,BOARDSIZE))
-pygame.display.set_caption("Quoridor")
+#Win messages and where they are shown
+RED_WINS = 'Red wins! Press backspace to play again.'
+BLUE_WINS = 'Blue wins! Press backspace to play again.'
+WIN_MESSAGES = {player: name + ' wins! Press backspace to play again.' for player, name in PLAYER_NAMES.items()}
+BOARD_CENTER = (BOARDSIZE//2, BOARDSIZE//2)
+
+#Font and text sizes
+FONT_FILE = "Roboto-Regular.ttf"
+MESSAGE_TEXT = 24
+HUD_TEXT = 18
+
+#Status bar text centers: whose turn it is, and the remaining fences of each player
+HUD_TURN_CENTER = (BOARDSIZE//6, BOARDSIZE + HUDHEIGHT//2)
+HUD_RED_CENTER = (BOARDSIZE//2, BOARDSIZE + HUDHEIGHT//2)
+HUD_BLUE_CENTER = (5*BOARDSIZE//6, BOARDSIZE + HUDHEIGHT//2)
+
+#Remaining fences of four players are shown side by side in the right two thirds of the bar
+HUD_FOUR_PLAYER_CENTERS = {player: ((2*index+5)*BOARDSIZE//12, BOARDSIZE + HUDHEIGHT//2)
+                           for index, player in enumerate((1, 3, 2, 4))}
+
+#Number of rendered text surfaces kept by the text cache
+TEXT_CACHE_SIZE = 64
+
+#Player controlled by the computer when the AI opponent is on, and its time per move in milliseconds
+AI_PLAYER = 2
+AI_TIME_LIMIT = 1000
+
+#Game window, created on first use
+WIN = None
+
+
+def window():
+    """
+    Returns the game window, opening it the first time. Importing this module does not open a
+    window, so its drawing helpers can be used without one.
+    """
+    global WIN
+    if WIN is None:
+        WIN = pygame.display.set_mode((BOARDSIZE,BOARDSIZE+HUDHEIGHT))
+        pygame.display.set_caption("Quoridor")
+    return WIN
+
+
+def set_board_size(size):
+    """
+    Lays the board out for a number of squares per side. Squares share BOARDSIZE and the gaps
+    for fences are a tenth of a square wide.
+
+    Args:
+        size: Integer representing the number of squares per side.
+    """
+    global BOARD_SQUARES, SQUARESIZE, FENCEWIDTH
+    BOARD_SQUARES = size
+    SQUARESIZE = BOARDSIZE/(size + (size-1)/10)
+    FENCEWIDTH = SQUARESIZE/10
+
+
+def static_board_surface():
+    """
+    Returns a new Surface with the parts of the window that never change: the white background,
+    status bar included, and the grid squares, with the goal rows colored. BOARD_SQUARES, SQUARESIZE,
+    FENCEWIDTH, WHITE, GRAY, LIGHTRED and LIGHTBLUE are globally defined constants.
+    """
+    surface = pygame.Surface((BOARDSIZE,BOARDSIZE+HUDHEIGHT))
+    surface.fill(WHITE)
+    for row in range(BOARD_SQUARES):
+        for col in range(BOARD_SQUARES):
+            board_spot = pygame.Rect((col*(SQUARESIZE+FENCEWIDTH), row*(SQUARESIZE+FENCEWIDTH)), (SQUARESIZE,SQUARESIZE))
+            if row == 0:
+                pygame.draw.rect(surface, LIGHTRED, board_spot)
+            elif row == BOARD_SQUARES-1:
+                pygame.draw.rect(surface, LIGHTBLUE, board_spot)
+            else:
+                pygame.draw.rect(surface, GRAY, board_spot)
+    return surface
+
+
+def fence_shapes(board):
+    """
+    Returns the shapes of the placed fences, colored by the player who placed them. A shape is a
+    tuple of ('rect', color, (x, y, width, height)) or ('circle', color, center, radius), see
+    draw_shape.
+
+    Args:
+        board: Board list representation from QuoridorGame object.
+    """
+    size = len(board)-1
+    shapes = []
+    for row in board:
+        for col in row:
+            #Current grid position
+            coords = col['coord']
+
+            #Horizontal fence, anchors hold the player number and borders hold True
+            if coords[1] != 0 and coords[1] != size and coords[0] != size-1 and col['h'] in PLAYER_COLORS and col['h'] is not True:
+                h_fence_coords = (coords[0]*(SQUARESIZE+FENCEWIDTH), coords[1]*SQUARESIZE+FENCEWIDTH*(coords[1]-1))
+                color = PLAYER_COLORS[col['h']]
+                shapes.append(('rect', color, (h_fence_coords[0], h_fence_coords[1], 2*SQUARESIZE+FENCEWIDTH, FENCEWIDTH)))
+
+            #Vertical fence
+            if coords[0] != 0 and coords[0] != size and coords[1] != size and col['v'] in PLAYER_COLORS and col['v'] is not True:
+                v_fence_coords = (coords[0]*SQUARESIZE+FENCEWIDTH*(coords[0]-1), coords[1]*(SQUARESIZE+FENCEWIDTH))
+                color = PLAYER_COLORS[col['v']]
+                shapes.append(('rect', color, (v_fence_coords[0], v_fence_coords[1], FENCEWIDTH, 2*SQUARESIZE+FENCEWIDTH)))
+    return shapes
+
+
+def pawn_shape(location, color):
+    """
+    Returns the shape of a pawn, or of a pawn move highlight, on a square.
+
+    Args:
+        location: Tuple containing the coordinates of the square.
+        color: Color of the pawn.
+    """
+    coords = (location[0]*(SQUARESIZE+FENCEWIDTH), location[1]*(SQUARESIZE+FENCEWIDTH))
+    center_coords = (coords[0]+SQUARESIZE/2, coords[1]+SQUARESIZE/2)
+    return ('circle', color, center_coords, SQUARESIZE/4)
+
+
+def shape_rect(shape):
+    """
+    Returns the pygame.Rect covering a shape, one pixel larger on every side so rounding never
+    leaves part of the shape outside it.
+
+    Args:
+        shape: Shape tuple, see fence_shapes.
+    """
+    if shape[0] == 'rect':
+        rect = pygame.Rect(shape[2])
+    elif shape[0] == 'circle':
+        center, radius = shape[2], shape[3]
+        rect = pygame.Rect(center[0]-radius, center[1]-radius, 2*radius, 2*radius)
+    else:
+        text = TEXT.render(shape[1], shape[3], shape[4])
+        rect = text.get_rect()
+        rect.center = shape[2]
+    return rect.inflate(2,2)
+
+
+def draw_shape(win, shape):
+    """
+    Draws a shape.
+
+    Args:
+        win: Surface to draw on.
+        shape: Shape tuple, see fence_shapes. ('text', message, center, size, color) shapes
+               draw a message centered on a point.
+    """
+    if shape[0] == 'rect':
+        pygame.draw.rect(win, shape[1], pygame.Rect(shape[2]))
+    elif shape[0] == 'circle':
+        pygame.draw.circle(win, shape[1], shape[2], shape[3])
+    else:
+        text = TEXT.render(shape[1], shape[3], shape[4])
+        textRect = text.get_rect()
+        textRect.center = shape[2]
+        win.blit(text, textRect)
+
+
+class BoardRenderer:
+    """
+    This class draws frames onto the window using dirty rectangles. The static board is drawn
+    once onto a cached Surface. Each frame is described as a list of shapes and compared with the
+    previous frame. Only the areas of shapes that appeared or disappeared are restored from the
+    cached board and redrawn, and only those areas are passed to pygame.display.update.
+    """
+
+    def __init__(self, win):
+        """
+        Initializes the renderer.
+
+        Args:
+            win: Window surface to draw on.
+        """
+        self._win = win
+        self._background = static_board_surface()
+        self._shapes = None
+
+    def invalidate(self):
+        """
+        Forces the next frame to redraw the whole window.
+        """
+        self._shapes = None
+
+    def render(self, shapes):
+        """
+        Draws a frame.
+
+        Args:
+            shapes: List of shape tuples in drawing order, see fence_shapes.
+
+        Returns:
+            List of pygame.Rect objects that were updated on screen.
+        """
+        #First frame draws everything
+        if self._shapes is None:
+            self._win.blit(self._background, (0,0))
+            for shape in shapes:
+                draw_shape(self._win, shape)
+            pygame.display.update()
+            self._shapes = shapes
+            return [self._win.get_rect()]
+
+        changed = set(self._shapes).symmetric_difference(shapes)
+        dirty_rects = [shape_rect(shape) for shape in changed]
+        self._shapes = shapes
+        if not dirty_rects:
+            return []
+
+        #Restore each dirty area from the cached board and redraw what overlaps it
+        shape_rects = [(shape, shape_rect(shape)) for shape in shapes]
+        for dirty_rect in dirty_rects:
+            self._win.set_clip(dirty_rect)
+            self._win.blit(self._background, dirty_rect, dirty_rect)
+            for shape, rect in shape_rects:
+                if rect.colliderect(dirty_rect):
+                    draw_shape(self._win, shape)
+        self._win.set_clip(None)
+        pygame.display.update(dirty_rects)
+        return dirty_rects
 
 
 def draw_board(win, board):
@@ -40,46 +279,9 @@ def draw_board(win, board):
         win: Surface to draw rectangles/board on.
         board: Board list representation from QuoridorGame object. 
     """
-    win.fill(WHITE)
-    
-    #Draw board
-    for row in board:
-        for col in row:
-            #Current grid position
-            coords = col['coord']
-
-            #coords
-            h_fence_coords = (coords[0]*(SQUARESIZE+FENCEWIDTH), coords[1]*SQUARESIZE+FENCEWIDTH*(coords[1]-1))
-            v_fence_coords = (coords[0]*SQUARESIZE+FENCEWIDTH*(coords[0]-1), coords[1]*(SQUARESIZE+FENCEWIDTH))
-            board_spotcoords = (coords[0]*(SQUARESIZE+FENCEWIDTH), coords[1]*(SQUARESIZE+FENCEWIDTH))
-            
-            #Rect objects
-            h_fence = pygame.Rect(h_fence_coords, ((2*SQUARESIZE+FENCEWIDTH),FENCEWIDTH))
-            v_fence = pygame.Rect(v_fence_coords, (FENCEWIDTH,2*SQUARESIZE+FENCEWIDTH))
-            board_spot = pygame.Rect(board_spotcoords, (SQUARESIZE,SQUARESIZE))
-            
-            #Draw horizontal fence           
-            if coords[1] != 0 and coords[1] != 9 and coords[0] != 8:
-                if col['h'] == 1:
-                    pygame.draw.rect(win, RED, h_fence)
-                elif col['h'] == 2:
-                    pygame.draw.rect(win, BLUE, h_fence)
-
-            #Draw vertical fence
-            if coords[0] != 0 and coords[0] != 9 and coords[1] != 9:
-                if col['v'] == 1:
-                    pygame.draw.rect(win, RED, v_fence)
-                elif col['v'] == 2:
-                    pygame.draw.rect(win, BLUE, v_fence)
-            
-            #Draw grid square
-            if coords[1] != 9 and coords[0] != 9:
-                if coords[1] == 0:
-                    pygame.draw.rect(win, LIGHTRED, board_spot)
-                elif coords[1] == 8:
-                    pygame.draw.rect(win, LIGHTBLUE, board_spot)
-                else:
-                    pygame.draw.rect(win, GRAY, board_spot)
+    win.blit(static_board_surface(), (0,0))
+    for shape in fence_shapes(board):
+        draw_shape(win, shape)
 
 
 def draw_players(win, p1_location, p2_location):
@@ -91,17 +293,8 @@ def draw_players(win, p1_location, p2_location):
         p1_location: Tuple representing the current location of player 1's pawn.
         p2_location: Tuple representing the current location of player 2's pawn.
     """
-    #Get P1 coords
-    p1_coords = (p1_location[0]*(SQUARESIZE+FENCEWIDTH), p1_location[1]*(SQUARESIZE+FENCEWIDTH))
-    p1_center_coords = (p1_coords[0]+SQUARESIZE/2, p1_coords[1]+SQUARESIZE/2)
-    
-    #Get P2 coords
-    p2_coords = (p2_location[0]*(SQUARESIZE+FENCEWIDTH), p2_location[1]*(SQUARESIZE+FENCEWIDTH))
-    p2_center_coords = (p2_coords[0]+SQUARESIZE/2, p2_coords[1]+SQUARESIZE/2)
-
-    #Draw P1 and P2
-    pygame.draw.circle(win, RED, p1_center_coords, SQUARESIZE/4)
-    pygame.draw.circle(win, BLUE, p2_center_coords, SQUARESIZE/4)
+    draw_shape(win, pawn_shape(p1_location, RED))
+    draw_shape(win, pawn_shape(p2_location, BLUE))
 
 
 def move_pawn(pos, game):
@@ -169,6 +362,75 @@ def place_vertical_fence(pos,game):
     game.place_fence(game.get_player_turn(), 'v', (col,row))
 
 
+class TextRenderer:
+    """
+    This class renders text with fonts that are loaded once and keeps the rendered Surfaces in a
+    least recently used cache, so drawing the same text again needs no disk access or glyph
+    rasterization. Fonts are only loaded when text is first rendered.
+    """
+
+    def __init__(self, font_file=FONT_FILE, max_surfaces=TEXT_CACHE_SIZE):
+        """
+        Initializes the text renderer.
+
+        Args:
+            font_file: Path of the TTF file to use.
+            max_surfaces: Integer representing the number of rendered Surfaces to keep.
+        """
+        self._font_file = font_file
+        self._max_surfaces = max_surfaces
+        self._fonts = {}
+        self._surfaces = OrderedDict()
+
+    def font(self, size):
+        """
+        Returns the font at a size, loading it the first time.
+
+        Args:
+            size: Integer representing the font size.
+        """
+        font = self._fonts.get(size)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self._fonts[size] = pygame.font.Font(self._font_file, size)
+        return font
+
+    def render(self, message, size=MESSAGE_TEXT, color=BLACK):
+        """
+        Returns a Surface with a message rendered on white, from the cache when possible.
+
+        Args:
+            message: String containing the message.
+            size: Integer representing the font size.
+            color: Color of the text.
+        """
+        key = (message, size, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+
+        surface = self._surfaces[key] = self.font(size).render(message, True, color, WHITE)
+        if len(self._surfaces) > self._max_surfaces:
+            self._surfaces.popitem(last=False)
+        return surface
+
+
+#Shared text renderer
+TEXT = TextRenderer()
+
+
+def message_surface(message):
+    """
+    Returns a Surface with a message rendered in black on white.
+
+    Args:
+        message: String containing the message.
+    """
+    return TEXT.render(message)
+
+
 def player_one_won(win):
     """
     Display a message that player one has won the game. 
@@ -176,12 +438,7 @@ def player_one_won(win):
     Args:
         win: Surface to display message on.
     """
-    pygame.font.init()
-    font = pygame.font.Font("Roboto-Regular.ttf", 24)
-    text = font.render('Red wins! Press backspace to play again.', True, BLACK, WHITE)
-    textRect = text.get_rect()
-    textRect.center = (BOARDSIZE//2, BOARDSIZE//2)
-    win.blit(text, textRect)
+    draw_shape(win, ('text', RED_WINS, BOARD_CENTER, MESSAGE_TEXT, BLACK))
 
 
 def player_two_won(win):
@@ -191,12 +448,46 @@ def player_two_won(win):
     Args:
         win: Surface to display message on.
     """
-    pygame.font.init()
-    font = pygame.font.Font("Roboto-Regular.ttf", 24)
-    text = font.render('Blue wins! Press backspace to play again.', True, BLACK, WHITE)
-    textRect = text.get_rect()
-    textRect.center = (BOARDSIZE//2, BOARDSIZE//2)
-    win.blit(text, textRect)
+    draw_shape(win, ('text', BLUE_WINS, BOARD_CENTER, MESSAGE_TEXT, BLACK))
+
+
+def move_highlight_shapes(game):
+    """
+    Returns the shapes highlighting available moves for pawn movement.
+
+    Args:
+        game: QuoridorGame object that represents current game state. 
+    """
+    player_turn = game.get_player_turn()
+    moves_available = game.possible_moves(game.get_pawn(player_turn))
+    return [pawn_shape(move, LIGHTGREEN) for move in sorted(moves_available - {None})]
+
+
+def fence_highlight_shapes(game, fence_type, legal_fences=None):
+    """
+    Returns the shapes highlighting the fences of one type the player whose turn it is can place.
+
+    Args:
+        game: QuoridorGame object that represents current game state. 
+        fence_type: String character containing the type of fence (either 'h' or 'v').
+        legal_fences: Set of legal fences from game.legal_fences if already computed.
+    """
+    #Set highlight color
+    player_turn = game.get_player_turn()
+    color = HIGHLIGHT_COLORS[player_turn]
+
+    if legal_fences is None:
+        legal_fences = game.legal_fences(player_turn)
+
+    shapes = []
+    for legal_type, coords in sorted(legal_fences):
+        if legal_type == 'h' and fence_type == 'h':
+            h_fence_coords = (coords[0]*(SQUARESIZE+FENCEWIDTH), coords[1]*SQUARESIZE+FENCEWIDTH*(coords[1]-1))
+            shapes.append(('rect', color, (h_fence_coords[0], h_fence_coords[1], SQUARESIZE, FENCEWIDTH)))
+        if legal_type == 'v' and fence_type == 'v':
+            v_fence_coords = (coords[0]*SQUARESIZE+FENCEWIDTH*(coords[0]-1), coords[1]*(SQUARESIZE+FENCEWIDTH))
+            shapes.append(('rect', color, (v_fence_coords[0], v_fence_coords[1], FENCEWIDTH, SQUARESIZE)))
+    return shapes
 
 
 def highlight_moves(win, game):
@@ -207,17 +498,8 @@ def highlight_moves(win, game):
         win: Surface to draw on.
         game: QuoridorGame object that represents current game state. 
     """
-    #Get available moves
-    player_turn = game.get_player_turn()
-    moves_available = game.possible_moves(game.get_pawn(player_turn))
-    if None in moves_available:
-        moves_available.remove(None)
-    
-    #Highlight moves
-    for move in moves_available:
-        move_coords = (move[0]*(SQUARESIZE+FENCEWIDTH), move[1]*(SQUARESIZE+FENCEWIDTH))
-        move_center_coords = (move_coords[0]+SQUARESIZE/2, move_coords[1]+SQUARESIZE/2)
-        pygame.draw.circle(win, LIGHTGREEN, move_center_coords, SQUARESIZE/4)
+    for shape in move_highlight_shapes(game):
+        draw_shape(win, shape)
 
 
 def highlight_available_h_fences(win, game):
@@ -228,27 +510,8 @@ def highlight_available_h_fences(win, game):
         win: Surface to draw on.
         game: QuoridorGame object that represents current game state. 
     """
-    #Check if player has remaining fences
-    player_turn = game.get_player_turn()
-    if game.get_pawn(player_turn).get_remaining_fences() == 0:
-        return
-
-    board = game.get_board()
-    
-    #Set highlight color
-    if player_turn == 1:
-        color = LIGHTERRED
-    else:
-        color = LIGHTERBLUE
-   
-    for row in range(len(board)-1):
-        for col in range(len(board)-2):
-            #Highlight fence if no fence placed and does not intersect a vertical fence
-            if not board[row][col]['h'] and not board[row][col+1]['h'] and board[row][col+1]['v'] != "Fence Continued" and game.fair_play_check('h',(col,row)):
-                coords = board[row][col]['coord']
-                h_fence_coords = (coords[0]*(SQUARESIZE+FENCEWIDTH), coords[1]*SQUARESIZE+FENCEWIDTH*(coords[1]-1))
-                h_fence = pygame.Rect(h_fence_coords, (SQUARESIZE,FENCEWIDTH))
-                pygame.draw.rect(win, color, h_fence)
+    for shape in fence_highlight_shapes(game, 'h'):
+        draw_shape(win, shape)
             
 
 def highlight_available_v_fences(win, game):
@@ -259,63 +522,253 @@ def highlight_available_v_fences(win, game):
         win: Surface to draw on.
         game: QuoridorGame object that represents current game state. 
     """
-    #Check if player has remaining fences
-    player_turn = game.get_player_turn()
-    if game.get_pawn(player_turn).get_remaining_fences() == 0:
-        return
+    for shape in fence_highlight_shapes(game, 'v'):
+        draw_shape(win, shape)
 
-    board = game.get_board()
 
-    #Set highlight color
-    if player_turn == 1:
-        color = LIGHTERRED
+def highlight_overlays(game):
+    """
+    Computes the highlight shapes of every move type for a position.
+
+    Args:
+        game: QuoridorGame object that represents current game state. 
+
+    Returns:
+        Dictionary mapping 'p', 'h' and 'v' to lists of shapes.
+    """
+    legal_fences = game.legal_fences(game.get_player_turn())
+    return {'p': move_highlight_shapes(game),
+            'h': fence_highlight_shapes(game, 'h', legal_fences),
+            'v': fence_highlight_shapes(game, 'v', legal_fences)}
+
+
+class EngineWorker:
+    """
+    This class runs engine work on a background thread so the event loop keeps its frame rate.
+    Jobs go in through a request queue with a copy of the game and the state hash it was taken
+    at. Results come back through a response queue tagged with that hash, so the main thread can
+    apply them only if the game is still in the same state. A job that raises an exception is
+    printed to stderr and returns None, and the thread keeps running.
+    """
+
+    def __init__(self):
+        """
+        Initializes the worker and starts its thread.
+        """
+        self._requests = queue.Queue()
+        self._responses = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, game, function):
+        """
+        Queues a job. The function is called with a copy of the game on the worker thread.
+
+        Args:
+            kind: String naming the job, returned with its result.
+            game: QuoridorGame object that represents current game state. 
+            function: Function taking a QuoridorGame and returning the result.
+        """
+        self._requests.put((kind, game.state_hash(), function, copy.deepcopy(game)))
+
+    def _run(self):
+        """
+        Worker thread loop, runs jobs until a None job arrives.
+        """
+        while True:
+            job = self._requests.get()
+            if job is None:
+                return
+            kind, key, function, game = job
+            try:
+                result = function(game)
+            except Exception:
+                traceback.print_exc()
+                result = None
+            self._responses.put((kind, key, result))
+
+    def results(self):
+        """
+        Returns the list of (kind, state hash, result) tuples finished since the last call.
+        Never blocks.
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self._responses.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def stop(self):
+        """
+        Stops the worker thread after the jobs already queued.
+        """
+        self._requests.put(None)
+
+
+class HighlightCache:
+    """
+    This class keeps the highlight overlays of recent positions, keyed on the game's state hash,
+    so they are computed once per position instead of on every frame. Missing overlays are
+    computed by an EngineWorker while the window keeps drawing.
+    """
+
+    def __init__(self, max_states=8):
+        """
+        Initializes the cache.
+
+        Args:
+            max_states: Integer representing the number of positions to keep.
+        """
+        self._max_states = max_states
+        self._overlays = OrderedDict()
+        self._pending = set()
+
+    def request(self, game, worker):
+        """
+        Queues the overlays of a position on a worker unless they are cached or queued.
+
+        Args:
+            game: QuoridorGame object that represents current game state. 
+            worker: EngineWorker object to compute on.
+        """
+        key = game.state_hash()
+        if key in self._overlays or key in self._pending:
+            return
+        self._pending.add(key)
+        worker.submit('highlights', game, highlight_overlays)
+
+    def store(self, key, overlays):
+        """
+        Stores the overlays computed for a position.
+
+        Args:
+            key: State hash of the position.
+            overlays: Dictionary returned by highlight_overlays, or None if it failed.
+        """
+        self._overlays[key] = overlays
+        while len(self._overlays) > self._max_states:
+            self._overlays.popitem(last=False)
+        self._pending.discard(key)
+
+    def get(self, game):
+        """
+        Returns the overlays of a position, or None if they are not ready yet or failed.
+
+        Args:
+            game: QuoridorGame object that represents current game state. 
+        """
+        key = game.state_hash()
+        overlays = self._overlays.get(key)
+        if overlays is not None:
+            self._overlays.move_to_end(key)
+        return overlays
+
+
+def hud_shapes(game, thinking=False):
+    """
+    Returns the shapes of the status bar: whose turn it is, or that the computer is thinking, and
+    the remaining fences of each player.
+
+    Args:
+        game: QuoridorGame object that represents current game state. 
+        thinking: True while the computer is choosing a move.
+    """
+    player_turn = game.get_player_turn()
+    name, color = PLAYER_NAMES[player_turn], PLAYER_COLORS[player_turn]
+    if game.get_winner():
+        turn_text = 'Game over'
+        color = BLACK
+    elif thinking:
+        turn_text = name + ' is thinking...'
     else:
-        color = LIGHTERBLUE
-    
-    for row in range(len(board)-2):
-        for col in range(len(board)-1):
-            #Highlight fence if no fence placed and does not interesect a horizontal fence. 
-            if not board[row][col]['v'] and not board[row+1][col]['v'] and board[row+1][col]['h'] != "Fence Continued" and game.fair_play_check('v',(col,row)):
-                coords = board[row][col]['coord']
-                v_fence_coords = (coords[0]*SQUARESIZE+FENCEWIDTH*(coords[0]-1), coords[1]*(SQUARESIZE+FENCEWIDTH))
-                v_fence = pygame.Rect(v_fence_coords, (FENCEWIDTH,SQUARESIZE))
-                pygame.draw.rect(win, color, v_fence)
+        turn_text = name + ' to move'
+
+    shapes = [('text', turn_text, HUD_TURN_CENTER, HUD_TEXT, color)]
+    if game.get_player_count() == 2:
+        red_fences = 'Red fences: ' + str(game.get_pawn(1).get_remaining_fences())
+        blue_fences = 'Blue fences: ' + str(game.get_pawn(2).get_remaining_fences())
+        shapes += [('text', red_fences, HUD_RED_CENTER, HUD_TEXT, RED),
+                   ('text', blue_fences, HUD_BLUE_CENTER, HUD_TEXT, BLUE)]
+    else:
+        #Only the counts fit with four players
+        for player in game.get_players():
+            fences = PLAYER_NAMES[player] + ': ' + str(game.get_pawn(player).get_remaining_fences())
+            shapes.append(('text', fences, HUD_FOUR_PLAYER_CENTERS[player], HUD_TEXT, PLAYER_COLORS[player]))
+    return shapes
 
 
-def main():
+def frame_shapes(game, move_type, overlays=None, thinking=False):
+    """
+    Returns every shape of a frame in drawing order: fences, pawns, highlights for the selected
+    move type, the status bar and the win message if the game is over.
+
+    Args:
+        game: QuoridorGame object that represents current game state. 
+        move_type: String character of the selected move type ('p', 'h' or 'v') or None.
+        overlays: Highlight overlays of the position from highlight_overlays, or None to leave
+                  highlights out until they are ready.
+        thinking: True while the computer is choosing a move, shown in the status bar.
     """
-    Main function, generates GUI. 
+    shapes = fence_shapes(game.get_board())
+    for pawn in game.get_pawns():
+        shapes.append(pawn_shape(pawn.get_location(), PLAYER_COLORS[pawn.get_player()]))
+    if overlays is not None and move_type in overlays:
+        shapes += overlays[move_type]
+    shapes += hud_shapes(game, thinking)
+
+    #Display message if a user has won the game. 
+    winner = game.get_winner()
+    if winner:
+        shapes.append(('text', WIN_MESSAGES[winner], BOARD_CENTER, MESSAGE_TEXT, BLACK))
+    return shapes
+
+
+def main(size=BOARD_SIZE, fences=None, players=2, book=None):
+    """
+    Main function, generates GUI. A frame is only drawn when an event arrived or engine work
+    finished, and then only the parts of the window that changed are redrawn. Highlights and
+    computer moves are computed on an EngineWorker thread.
+
+    Args:
+        size: Integer representing the number of squares per side.
+        fences: Integer representing the number of fences each player starts with, or None for
+                the default of the number of players.
+        players: Integer representing the number of players, 2 or 4. The computer opponent
+                 only plays two player games.
+        book: Path of an opening book for the computer opponent, or None.
     """
     #Initialize game
-    game = QuoridorGame()
+    set_board_size(size)
+    game = QuoridorGame(size, fences, players)
     run = True
     clock = pygame.time.Clock()
+    renderer = BoardRenderer(window())
+    worker = EngineWorker()
+    highlights = HighlightCache()
     move_type = None
+    ai_player = None
+    #State hash the computer is thinking about, or None
+    ai_pending = None
+    #State hash the computer failed to find a move for, so it is not asked again
+    ai_failed = None
+    opening_book = OpeningBook(book) if book else None
 
     #Run loop
     while run:
         clock.tick(FPS)
+        redraw = False
 
         for event in pygame.event.get():
+            redraw = True
             #Quit if user exits window
             if event.type == pygame.QUIT:
                 run = False
 
-            #Get board list representation and player turn
-            board_list = game.get_board()
+            #Get player turn
             player_turn = game.get_player_turn()
-
-            #Draw board and player pawns
-            draw_board(WIN, board_list)
-            draw_players(WIN, game.get_p1_location(), game.get_p2_location())
-            if move_type == 'p':
-                highlight_moves(WIN, game)
-            if move_type == 'h':
-                highlight_available_h_fences(WIN, game)
-            if move_type == 'v':
-                highlight_available_v_fences(WIN, game)
            
-           #Get user move type 
+            #Get user move type 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_p:
                     move_type = 'p'
@@ -323,7 +776,15 @@ def main():
                     move_type = 'h'
                 if event.key == pygame.K_v:
                     move_type = 'v'
+                #Toggle computer opponent
+                if event.key == pygame.K_a and players == 2:
+                    ai_player = None if ai_player else AIPlayer(AI_TIME_LIMIT, book=opening_book)
             
+            #Ignore clicks on the status bar or while it is the computer's turn
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if pygame.mouse.get_pos()[1] >= BOARDSIZE or (ai_player and game.get_player_turn() == AI_PLAYER):
+                    continue
+
             #Make move based on mouse input and move type
             if event.type == pygame.MOUSEBUTTONDOWN and move_type == 'p':
                 pos = pygame.mouse.get_pos()
@@ -338,23 +799,57 @@ def main():
             #Reset move type after player makes a valid move
             if player_turn != game.get_player_turn():
                 move_type = None
-            
-            #Display message if either user has won the game. 
-            if game.is_winner(1):
-                player_one_won(WIN)
-            if game.is_winner(2):
-                player_two_won(WIN)
 
             #Reset game if backspace is pressed. 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_BACKSPACE:
-                    game = QuoridorGame()
-
-            #Update display window
-            pygame.display.update()
-
+                    game = QuoridorGame(size, fences, players)
+
+            #Redraw everything when the window comes back into view
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+
+        #Apply finished engine work, dropping computer moves for a position that has changed
+        for kind, key, result in worker.results():
+            if kind == 'highlights':
+                highlights.store(key, result)
+            if kind == 'ai' and key == ai_pending:
+                ai_pending = None
+                if result is None:
+                    ai_failed = key
+                elif ai_player and key == game.state_hash():
+                    game.push(result)
+                    move_type = None
+            redraw = True
+
+        #Ask the computer for a move on its turn
+        if ai_pending is not None and (not ai_player or ai_pending != game.state_hash()):
+            ai_pending = None
+            redraw = True
+        if (ai_player and ai_pending is None and game.get_player_turn() == AI_PLAYER and not game.get_winner()
+                and game.state_hash() != ai_failed):
+            ai_pending = game.state_hash()
+            worker.submit('ai', game, ai_player.choose_move)
+            redraw = True
+
+        #Compute highlights once per position
+        highlights.request(game, worker)
+
+        #Draw only the parts of the window that changed
+        if redraw and run:
+            renderer.render(frame_shapes(game, move_type, highlights.get(game), ai_pending is not None))
+
+    worker.stop()
+    if opening_book:
+        opening_book.close()
     pygame.quit()
 
-main()
-
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quoridor")
+    parser.add_argument('--size', type=int, default=BOARD_SIZE, help="squares per side, an odd number")
+    parser.add_argument('--fences', type=int, help="fences per player, 10 or 5 with four players by default")
+    parser.add_argument('--players', type=int, default=2, choices=(2, 4), help="number of players")
+    parser.add_argument('--book', help="opening book file for the computer opponent")
+    args = parser.parse_args()
+    main(args.size, args.fences, args.players, args.book)
@@ -0,0 +1,350 @@
+#Description: This program generates load against a QuoridorServer. Simulated clients play random legal
+#             games in pairs while the number of clients follows a ramp profile, and the moves per
+#             second, move latency percentiles and server memory per active game are written to a JSON file.
+#             Example: python QuoridorLoadTest.py --profile 10:5,50:10,100:10 --output load.json
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import time
+from QuoridorEngine import QuoridorGame
+from QuoridorServer import QuoridorClient
+
+#Default ramp: (concurrent clients, seconds) per stage
+PROFILE = "10:5,50:5,100:10"
+
+#Games longer than this are abandoned, and the players reconnect to start a new game
+MAX_PLIES = 200
+
+#Probability that a simulated player tries a fence instead of a pawn move
+FENCE_RATE = 0.3
+
+#Random fence slots a simulated player tries before moving its pawn instead
+FENCE_TRIES = 10
+
+#Seconds between samples of the server's memory and active games
+MEMORY_INTERVAL = 0.25
+
+
+def parse_profile(text):
+    """
+    Returns the stages of a ramp profile written as "clients:seconds" pairs separated by commas.
+
+    Args:
+        text: String containing the profile, e.g. "10:5,50:10".
+
+    Returns:
+        A list of (clients, seconds) tuples.
+    """
+    stages = []
+    for stage in text.split(','):
+        clients, _, seconds = stage.partition(':')
+        stages.append((int(clients), float(seconds)))
+    return stages
+
+
+def percentile(values, fraction):
+    """
+    Returns a percentile of a list of numbers by the nearest rank method.
+
+    Args:
+        values: Sorted list of numbers.
+        fraction: Float between 0 and 1, e.g. 0.95 for the 95th percentile.
+    """
+    if not values:
+        return None
+    return values[min(len(values)-1, max(0, int(round(fraction*len(values)))-1))]
+
+
+def random_move(game, rng):
+    """
+    Returns a random legal move for the player whose turn it is, using the game's own checks.
+    Fences are tried at random slots with try_fence, so no full list of legal fences is built.
+
+    Args:
+        game: QuoridorGame object of interest.
+        rng: Random object used for the choice.
+
+    Returns:
+        A move in the format used by QuoridorGame.push, or None if the player has no legal move.
+    """
+    player = game.get_player_turn()
+    pawn = game.get_pawn(player)
+    if pawn.get_remaining_fences() > 0 and rng.random() < FENCE_RATE:
+        size = len(game.get_board())-1
+        for _ in range(FENCE_TRIES):
+            if rng.random() < 0.5:
+                fence = ('h', (rng.randrange(size-1), rng.randrange(1, size)))
+            else:
+                fence = ('v', (rng.randrange(1, size), rng.randrange(size-1)))
+            if game.try_fence(*fence):
+                return fence
+    destinations = sorted(coords for coords in game.possible_moves(pawn) if coords is not None)
+    if destinations:
+        return ('p', rng.choice(destinations))
+    #A pawn that cannot move can still place a fence
+    fences = sorted(game.legal_fences(player))
+    return rng.choice(fences) if fences else None
+
+
+def process_memory(pid):
+    """
+    Returns the resident memory of a process in bytes, or None where /proc is not available.
+
+    Args:
+        pid: Integer process id.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])*1024
+    except OSError:
+        pass
+    return None
+
+
+class LoadTest:
+    """
+    This class represents a load test against one server. Clients play games in pairs, each
+    pair starting a new game as soon as the last one ends, and every move's round trip time is
+    recorded against the stage it was made in.
+    Main methods available to use are as follows:
+
+    run: Runs every stage of a ramp profile and returns the results
+    """
+
+    def __init__(self, host, port, server_pid=None, seed=0):
+        """
+        Initializes the load test.
+
+        Args:
+            host: String containing the server address.
+            port: Integer representing the server port.
+            server_pid: Integer process id of the server for memory readings, or None.
+            seed: Integer base seed for the simulated players.
+        """
+        self._host = host
+        self._port = port
+        self._server_pid = server_pid
+        self._seed = seed
+        self._latencies = []
+        self._rejected = 0
+        self._games = 0
+
+    async def play_games(self, pair, deadline):
+        """
+        Plays random games between two clients until the deadline.
+
+        Args:
+            pair: Integer numbering the client pair, used for its seed.
+            deadline: Float, time.perf_counter() value to stop at.
+        """
+        rng = random.Random(self._seed*100003 + pair)
+        clients = {}
+        try:
+            while time.perf_counter() < deadline:
+                if not clients:
+                    clients = {1: await QuoridorClient.connect(self._host, self._port),
+                               2: await QuoridorClient.connect(self._host, self._port)}
+                game_id = (await clients[1].create_game())['game']
+                await clients[2].join_game(game_id)
+                game = QuoridorGame()
+                self._games += 1
+                for _ in range(MAX_PLIES):
+                    if game.is_winner(1) or game.is_winner(2) or time.perf_counter() >= deadline:
+                        break
+                    move = random_move(game, rng)
+                    if move is None:
+                        break
+                    start = time.perf_counter()
+                    response = await clients[game.get_player_turn()].move(game_id, move)
+                    self._latencies.append(time.perf_counter() - start)
+                    if not response['ok']:
+                        self._rejected += 1
+                        break
+                    game.push(move)
+                #Leave an unfinished game the way players do, so the server counts it as over
+                if not (game.is_winner(1) or game.is_winner(2)):
+                    for client in clients.values():
+                        await client.close()
+                    clients = {}
+        finally:
+            for client in clients.values():
+                await client.close()
+
+    async def sample_memory(self, client, samples):
+        """
+        Appends the server's memory and its number of active games to a list every
+        MEMORY_INTERVAL seconds until cancelled.
+
+        Args:
+            client: QuoridorClient object used for stats requests.
+            samples: List the (memory in bytes, active games) tuples are appended to.
+        """
+        while True:
+            memory = process_memory(self._server_pid)
+            active_games = (await client.get_stats())['active_games']
+            if memory is not None:
+                samples.append((memory, active_games))
+            await asyncio.sleep(MEMORY_INTERVAL)
+
+    async def run_stage(self, clients, seconds):
+        """
+        Runs one stage of the profile.
+
+        Args:
+            clients: Integer representing the number of concurrent clients, two per game.
+            seconds: Float representing the length of the stage.
+
+        Returns:
+            Dictionary with the stage's clients, games, moves, moves per second, latency
+            percentiles in milliseconds, rejected moves and server memory per active game in
+            bytes. Memory per active game is the growth of the server's memory since the start of
+            the stage at its highest sample, divided by the games not over at that sample.
+        """
+        self._latencies = []
+        self._rejected = 0
+        self._games = 0
+        pairs = max(1, clients//2)
+        samples = []
+        sampler = None
+        stats_client = await QuoridorClient.connect(self._host, self._port)
+        start_memory = process_memory(self._server_pid) if self._server_pid else None
+        if start_memory is not None:
+            sampler = asyncio.create_task(self.sample_memory(stats_client, samples))
+        start = time.perf_counter()
+        deadline = start + seconds
+        await asyncio.gather(*(self.play_games(pair, deadline) for pair in range(pairs)))
+        elapsed = time.perf_counter() - start
+        if sampler is not None:
+            sampler.cancel()
+            await asyncio.gather(sampler, return_exceptions=True)
+        hosted_games = (await stats_client.get_stats())['games']
+        await stats_client.close()
+
+        latencies = sorted(self._latencies)
+        memory_per_active_game = None
+        server_active_games = None
+        if samples:
+            memory, server_active_games = max(samples)
+            if server_active_games:
+                memory_per_active_game = max(0, memory - start_memory)/server_active_games
+        return {
+            'clients': 2*pairs,
+            'active_games': pairs,
+            'games_started': self._games,
+            'server_active_games': server_active_games,
+            'hosted_games': hosted_games,
+            'moves': len(latencies),
+            'seconds': elapsed,
+            'moves_per_second': len(latencies)/elapsed if elapsed > 0 else 0,
+            'p50_ms': percentile(latencies, 0.50)*1000 if latencies else None,
+            'p95_ms': percentile(latencies, 0.95)*1000 if latencies else None,
+            'p99_ms': percentile(latencies, 0.99)*1000 if latencies else None,
+            'rejected_moves': self._rejected,
+            'memory_per_active_game_bytes': memory_per_active_game,
+        }
+
+    async def run(self, stages):
+        """
+        Runs every stage of a ramp profile in order.
+
+        Args:
+            stages: List of (clients, seconds) tuples.
+
+        Returns:
+            A list of stage result dictionaries, see run_stage.
+        """
+        results = []
+        for clients, seconds in stages:
+            results.append(await self.run_stage(clients, seconds))
+        return results
+
+
+def free_port():
+    """
+    Returns a TCP port that is free on the local machine.
+    """
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def run_load_test(stages, host=None, port=None, seed=0):
+    """
+    Runs a load test. Without a host, a server is started in a separate process for the length
+    of the test so its memory can be measured.
+
+    Args:
+        stages: List of (clients, seconds) tuples.
+        host: String containing the address of a running server, or None.
+        port: Integer representing the port of the running server.
+        seed: Integer base seed for the simulated players.
+
+    Returns:
+        A list of stage result dictionaries.
+    """
+    server = None
+    if host is None:
+        host, port = "127.0.0.1", free_port()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        server = await asyncio.create_subprocess_exec(sys.executable, "-u", os.path.join(directory, "QuoridorServer.py"),
+                                                      "--host", host, "--port", str(port),
+                                                      stdout=asyncio.subprocess.PIPE)
+        #The server prints a line once it is listening
+        await server.stdout.readline()
+    try:
+        return await LoadTest(host, port, server.pid if server else None, seed).run(stages)
+    finally:
+        if server is not None:
+            server.terminate()
+            await server.wait()
+
+
+def main():
+    """
+    Parses the command line, runs the load test, prints a summary per stage and writes the
+    results to a JSON file.
+    """
+    parser = argparse.ArgumentParser(description="Load test for the Quoridor game server")
+    parser.add_argument('--profile', default=PROFILE, help="ramp stages as clients:seconds separated by commas")
+    parser.add_argument('--connect', help="host:port of a running server, otherwise one is started")
+    parser.add_argument('--output', default="loadtest.json", help="JSON file the results are written to")
+    parser.add_argument('--seed', type=int, default=0, help="base random seed")
+    args = parser.parse_args()
+
+    try:
+        stages = parse_profile(args.profile)
+    except ValueError:
+        parser.error(f"invalid profile {args.profile!r}")
+    host, port = None, None
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        port = int(port)
+
+    results = asyncio.run(run_load_test(stages, host, port, args.seed))
+    for stage in results:
+        memory = stage['memory_per_active_game_bytes']
+        memory_text = f"{memory/1024:8.1f} KiB/active game" if memory is not None else "memory n/a"
+        print(f"{stage['clients']:5d} clients: {stage['moves_per_second']:8.1f} moves/s, "
+              f"p50 {stage['p50_ms'] or 0:6.2f} ms, p95 {stage['p95_ms'] or 0:6.2f} ms, "
+              f"p99 {stage['p99_ms'] or 0:6.2f} ms, {memory_text}")
+
+    report = {
+        'profile': args.profile,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'stages': results,
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+#Description: This program contains a Monte Carlo tree search player for the Quoridor board game. It uses a
+#             class called MCTSPlayer that runs independent searches in a pool of worker processes
+#             and merges their root statistics.
+
+import math
+import multiprocessing
+import random
+import time
+from QuoridorAI import path_fences
+from QuoridorEndgame import SOLVE_SHARE, EndgameSolver
+
+#Probability that a rollout move steps the pawn along its shortest path
+ROLLOUT_PATH_STEP = 0.8
+
+#Probability that a rollout move tries a fence when it does not step along the path
+ROLLOUT_FENCE = 0.5
+
+
+class Node:
+    """
+    This class represents a node of a search tree. A node stands for the position reached by its
+    move and counts how often playouts through it were won by the player who made that move.
+    """
+
+    __slots__ = ('move', 'parent', 'player', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, parent, player):
+        """
+        Initializes a tree node.
+
+        Args:
+            move: Move leading to the node, in the format used by QuoridorGame.push.
+            parent: Parent Node object, None for the root.
+            player: Integer representing the player who made the move.
+        """
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children = []
+        #Moves not expanded yet, filled in the first time the node is reached
+        self.untried = None
+        self.visits = 0
+        self.wins = 0
+
+    def select_child(self, exploration):
+        """
+        Returns the child with the highest UCT score.
+
+        Args:
+            exploration: Float representing the UCT exploration constant.
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins/child.visits + exploration*math.sqrt(log_visits/child.visits))
+
+
+def tree_moves(game):
+    """
+    Returns the moves to expand in the tree: every pawn move plus the legal fences on the
+    opponent's shortest path.
+
+    Args:
+        game: QuoridorGame object of interest.
+    """
+    player = game.get_player_turn()
+    pawn = game.get_pawn(player)
+    moves = [('p',coords) for coords in game.possible_moves(pawn) if coords is not None]
+    if pawn.get_remaining_fences() > 0:
+        moves += [fence for fence in path_fences(game, 3-player) if game.try_fence(*fence)]
+    return moves
+
+
+def winner(game):
+    """
+    Returns the player who has won a game, or None if the game is still going.
+
+    Args:
+        game: QuoridorGame object of interest.
+    """
+    for player in (1, 2):
+        if game.is_winner(player):
+            return player
+    return None
+
+
+def rollout(game, rng, max_plies):
+    """
+    Plays a game forward with a light random policy and undoes the moves afterwards. Pawns
+    mostly step along their shortest path, with the odd random pawn move or fence on the
+    opponent's path. If nobody has won after max_plies, the player to move wins ties on distance.
+
+    Args:
+        game: QuoridorGame object to play from.
+        rng: Random object used for the policy.
+        max_plies: Integer representing the longest rollout.
+
+    Returns:
+        Integer representing the winning player.
+    """
+    size = len(game.get_board())-1
+    plies = 0
+    result = winner(game)
+    while result is None and plies < max_plies:
+        player = game.get_player_turn()
+        pawn = game.get_pawn(player)
+        move = None
+        choice = rng.random()
+
+        if choice >= ROLLOUT_PATH_STEP and pawn.get_remaining_fences() > 0 and rng.random() < ROLLOUT_FENCE:
+            fences = path_fences(game, 3-player)
+            rng.shuffle(fences)
+            move = next((fence for fence in fences if game.try_fence(*fence)), None)
+
+        if move is None:
+            destinations = [coords for coords in game.possible_moves(pawn) if coords is not None]
+            #A pawn boxed in by the other pawn can only place a fence, or the rollout ends
+            if not destinations:
+                fences = sorted(game.legal_fences(player))
+                if not fences:
+                    break
+                move = rng.choice(fences)
+        if move is None:
+            if choice < ROLLOUT_PATH_STEP:
+                field = game.get_distance_field(player)
+                coords = min(destinations, key=lambda coords: field[coords[1]*size + coords[0]])
+            else:
+                coords = rng.choice(destinations)
+            move = ('p',coords)
+
+        game.push(move)
+        plies += 1
+        result = winner(game)
+
+    if result is None:
+        player = game.get_player_turn()
+        result = player if game.distance_to_goal(player) <= game.distance_to_goal(3-player) else 3-player
+
+    for _ in range(plies):
+        game.pop()
+    return result
+
+
+def search(game, deadline, max_playouts, seed, exploration, max_plies):
+    """
+    Runs one Monte Carlo tree search from a position. Used on its own or in a worker process.
+    At least one playout is run, even if the deadline has passed when the search starts.
+
+    Args:
+        game: QuoridorGame object to search. Moves are undone, so it is returned unchanged.
+        deadline: Float, time.monotonic() value to stop at, or None.
+        max_playouts: Integer representing the most playouts to run, or None.
+        seed: Integer seed for the rollout policy.
+        exploration: Float representing the UCT exploration constant.
+        max_plies: Integer representing the longest rollout.
+
+    Returns:
+        Tuple containing a dictionary of root move to (visits, wins) and the number of playouts.
+    """
+    rng = random.Random(seed)
+    root = Node(None, None, 3-game.get_player_turn())
+    playouts = 0
+
+    while playouts == 0 or ((max_playouts is None or playouts < max_playouts) and
+                            (deadline is None or time.monotonic() < deadline)):
+        node = root
+        depth = 0
+
+        #Selection
+        while node.untried == [] and node.children:
+            node = node.select_child(exploration)
+            game.push(node.move)
+            depth += 1
+
+        #Expansion
+        if node.untried is None:
+            node.untried = tree_moves(game) if winner(game) is None else []
+            rng.shuffle(node.untried)
+        if node.untried:
+            move = node.untried.pop()
+            player = game.get_player_turn()
+            game.push(move)
+            depth += 1
+            child = Node(move, node, player)
+            node.children.append(child)
+            node = child
+
+        #Simulation and backpropagation
+        result = rollout(game, rng, max_plies)
+        while node is not None:
+            node.visits += 1
+            if node.player == result:
+                node.wins += 1
+            node = node.parent
+
+        for _ in range(depth):
+            game.pop()
+        playouts += 1
+
+    return {child.move: (child.visits, child.wins) for child in root.children}, playouts
+
+
+def search_worker(arguments):
+    """
+    Unpacks a tuple of search arguments for use with Pool.map.
+    """
+    return search(*arguments)
+
+
+class MCTSPlayer:
+    """
+    This class represents a Monte Carlo tree search player for a QuoridorGame. With more than one
+    worker, each worker process searches its own tree from the same position (root
+    parallelization) and the visit counts of the root moves are added up. A search is limited by
+    a time budget in milliseconds, a number of playouts, or both. With an opening book,
+    positions in the book are played from it without a search, and once neither player has a
+    fence left the move is read from an EndgameSolver instead.
+    Main methods available to use are as follows:
+
+    choose_move: Returns the most visited move for the player whose turn it is
+    get_last_search: Returns playouts, time taken and playouts per second of the last search
+    close: Shuts down the worker pool
+    """
+
+    def __init__(self, time_limit=1000, playouts=None, workers=None, exploration=1.4, max_plies=60, book=None,
+                 endgame=None):
+        """
+        Initializes the MCTS player.
+
+        Args:
+            time_limit: Integer representing the time budget per move in milliseconds, or None.
+            playouts: Integer representing the playout budget per move over all workers, or None.
+            workers: Integer representing the number of worker processes. Defaults to the number
+                     of CPUs, and 1 searches in the calling process.
+            exploration: Float representing the UCT exploration constant.
+            max_plies: Integer representing the longest rollout.
+            book: OpeningBook object consulted before searching, or None.
+            endgame: EndgameSolver object to share with other players, or None for a new one.
+        """
+        if time_limit is None and playouts is None:
+            raise ValueError("MCTSPlayer needs a time limit or a playout budget")
+        self._time_limit = time_limit
+        self._playouts = playouts
+        self._workers = workers or multiprocessing.cpu_count()
+        self._exploration = exploration
+        self._max_plies = max_plies
+        self._book = book
+        self._endgame = endgame or EndgameSolver()
+        self._pool = None
+        self._searches = 0
+        self._last_search = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Shuts down the worker pool, if one was started.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def get_last_search(self):
+        """
+        Returns a dictionary describing the last search, with the number of playouts, the
+        seconds taken, the playouts per second, the number of workers, and whether the move came
+        from the opening book or the endgame solver.
+        """
+        return self._last_search
+
+    def choose_move(self, game):
+        """
+        Returns the most visited root move after searching the position within the budget.
+
+        Args:
+            game: QuoridorGame object of interest. It is returned unchanged.
+
+        Returns:
+            A move in the format used by QuoridorGame.push, or None if the game is over.
+        """
+        if winner(game) is not None:
+            return None
+
+        #Start the pool before the clock, so its start up is not counted against the budget or in
+        #the search statistics
+        if self._workers > 1 and self._pool is None:
+            self._pool = multiprocessing.Pool(self._workers)
+        start = time.monotonic()
+
+        #Play book moves without searching
+        if self._book is not None:
+            book_move = self._book.best_move(game)
+            if book_move is not None:
+                self._last_search = {'playouts': 0, 'seconds': time.monotonic() - start, 'playouts_per_second': 0,
+                                     'workers': self._workers, 'book': True, 'endgame': False}
+                return book_move
+
+        #Read solved endgames off the table. Solving a new layout may take part of the budget,
+        #and the search gets the rest.
+        time_limit = self._time_limit/1000 if self._time_limit is not None else None
+        solution = self._endgame.solve(game, SOLVE_SHARE*time_limit if time_limit is not None else None)
+        if solution is not None and solution[1] is not None:
+            self._last_search = {'playouts': 0, 'seconds': time.monotonic() - start, 'playouts_per_second': 0,
+                                 'workers': self._workers, 'book': False, 'endgame': True}
+            return solution[1]
+
+        #The book and endgame lookups come out of the budget
+        deadline = None
+        if time_limit is not None:
+            deadline = start + time_limit
+        self._searches += 1
+
+        #Split the playout budget and give every worker its own seed
+        jobs = []
+        for worker in range(self._workers):
+            playouts = None
+            if self._playouts is not None:
+                playouts = self._playouts//self._workers + (worker < self._playouts % self._workers)
+            seed = self._searches*self._workers + worker
+            jobs.append((game, deadline, playouts, seed, self._exploration, self._max_plies))
+
+        if self._workers == 1:
+            results = [search(*jobs[0])]
+        else:
+            results = self._pool.map(search_worker, jobs)
+
+        #Merge root statistics
+        totals = {}
+        total_playouts = 0
+        for root_stats, playouts in results:
+            total_playouts += playouts
+            for move, (visits, wins) in root_stats.items():
+                merged = totals.get(move, (0, 0))
+                totals[move] = (merged[0] + visits, merged[1] + wins)
+
+        seconds = time.monotonic() - start
+        self._last_search = {
+            'playouts': total_playouts,
+            'seconds': seconds,
+            'playouts_per_second': total_playouts/seconds if seconds > 0 else 0,
+            'workers': self._workers,
+            'book': False,
+            'endgame': False,
+        }
+        #Every search runs a playout, but fall back on a legal move rather than passing
+        if not totals:
+            moves = game.legal_moves()
+            return moves[0] if moves else None
+        return max(sorted(totals), key=lambda move: totals[move][0])
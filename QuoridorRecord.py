@@ -0,0 +1,366 @@
+#Description: This program saves and loads Quoridor game records. Moves are written either in algebraic
+#             notation (e.g. "e2", "e3h") or in a binary format of one byte per move (two on boards
+#             larger than 9x9), and binary record files are read back one game at a time without
+#             loading the whole file.
+
+import struct
+import sys
+from array import array
+from QuoridorEngine import BOARD_SIZE, FENCES, QuoridorGame
+
+#Columns are lettered from the left and rows numbered from player 1's side
+COLUMNS = "abcdefghijklmnopqrstuvwxyz"
+
+#First bytes of every binary record file, followed by the format version. Version 1 files hold
+#9x9 games with 10 fences, version 2 files name their board size and fences in two more bytes.
+MAGIC = b"QREC"
+
+#Move codes read from a record file at a time
+CHUNK_SIZE = 1 << 16
+
+
+def move_to_notation(move):
+    """
+    Returns the algebraic notation of a move. A pawn move is the square it moves to, e.g. "e2".
+    A fence is the square to the top left of its center, as drawn by the GUI, followed by its
+    type, e.g. "e3h".
+
+    Args:
+        move: Tuple containing the move type and coordinates, as used by QuoridorGame.push.
+    """
+    move_type, (x, y) = move
+    if move_type == 'p':
+        return COLUMNS[x] + str(y+1)
+    if move_type == 'h':
+        return COLUMNS[x] + str(y) + 'h'
+    return COLUMNS[x-1] + str(y+1) + 'v'
+
+
+def notation_to_move(text):
+    """
+    Returns the move written in algebraic notation.
+
+    Args:
+        text: String containing the move, e.g. "e2" or "e3h".
+
+    Returns:
+        Tuple containing the move type and coordinates, as used by QuoridorGame.push.
+    """
+    if len(text) < 2:
+        raise ValueError(f"invalid move {text!r}")
+    move_type = text[-1] if text[-1] in 'hv' else 'p'
+    square = text[:-1] if move_type != 'p' else text
+    if len(square) < 2 or square[0] not in COLUMNS or not square[1:].isdigit():
+        raise ValueError(f"invalid move {text!r}")
+    x, row = COLUMNS.index(square[0]), int(square[1:])
+    if move_type == 'p':
+        return ('p', (x, row-1))
+    if move_type == 'h':
+        return ('h', (x, row))
+    return ('v', (x+1, row-1))
+
+
+def format_game(moves):
+    """
+    Returns the moves of a game in algebraic notation separated by spaces.
+
+    Args:
+        moves: Iterable of moves, as returned by QuoridorGame.get_move_history.
+    """
+    return " ".join(move_to_notation(move) for move in moves)
+
+
+def parse_game(text):
+    """
+    Returns the list of moves of a game written by format_game.
+
+    Args:
+        text: String containing the moves in algebraic notation.
+    """
+    return [notation_to_move(word) for word in text.split()]
+
+
+def move_codes(size):
+    """
+    Returns the number of move codes of a board size: one per square, then one per horizontal
+    and one per vertical fence.
+
+    Args:
+        size: Integer representing the number of squares per side.
+    """
+    return size*size + 2*(size-1)*(size-1)
+
+
+def code_width(size):
+    """
+    Returns the number of bytes per move code of a board size. The largest value of the width
+    marks the end of a game.
+
+    Args:
+        size: Integer representing the number of squares per side.
+    """
+    return 1 if move_codes(size) < 255 else 2
+
+
+def encode_move(move, size=BOARD_SIZE):
+    """
+    Returns the code of a move. Pawn moves are numbered by square first, then horizontal and
+    vertical fences by the square to the top left of their center. On a 9x9 board pawn moves
+    take codes 0 to 80, horizontal fences 81 to 144 and vertical fences 145 to 208.
+
+    Args:
+        move: Tuple containing the move type and coordinates, as used by QuoridorGame.push.
+        size: Integer representing the number of squares per side.
+    """
+    move_type, (x, y) = move
+    if move_type == 'p':
+        return y*size + x
+    if move_type == 'h':
+        return size*size + (y-1)*(size-1) + x
+    return size*size + (size-1)*(size-1) + y*(size-1) + x-1
+
+
+def decode_move(code, size=BOARD_SIZE):
+    """
+    Returns the move of a code made by encode_move.
+
+    Args:
+        code: Integer representing the move code.
+        size: Integer representing the number of squares per side.
+    """
+    h_codes = size*size
+    v_codes = h_codes + (size-1)*(size-1)
+    if 0 <= code < h_codes:
+        return ('p', (code % size, code // size))
+    if h_codes <= code < v_codes:
+        y, x = divmod(code - h_codes, size-1)
+        return ('h', (x, y+1))
+    if v_codes <= code < move_codes(size):
+        y, x = divmod(code - v_codes, size-1)
+        return ('v', (x+1, y))
+    raise ValueError(f"invalid move code {code}")
+
+
+#Move of every code per board size, so reading a record needs one lookup per move
+DECODED_MOVES = {}
+
+
+def decoded_moves(size):
+    """
+    Returns a tuple holding the move of every code of a board size.
+
+    Args:
+        size: Integer representing the number of squares per side.
+    """
+    moves = DECODED_MOVES.get(size)
+    if moves is None:
+        moves = DECODED_MOVES[size] = tuple(decode_move(code, size) for code in range(move_codes(size)))
+    return moves
+
+
+def encode_game(moves, size=BOARD_SIZE):
+    """
+    Returns the binary record of one game: a code per move followed by the end of game code.
+
+    Args:
+        moves: Iterable of moves, as returned by QuoridorGame.get_move_history.
+        size: Integer representing the number of squares per side.
+    """
+    codes = [encode_move(move, size) for move in moves]
+    if code_width(size) == 1:
+        return bytes(codes + [255])
+    return struct.pack(f"<{len(codes)+1}H", *codes, 0xFFFF)
+
+
+def file_header(size, fences):
+    """
+    Returns the header of a record file for games of a board size and fence count.
+
+    Args:
+        size: Integer representing the number of squares per side.
+        fences: Integer representing the number of fences each player starts with.
+    """
+    if (size, fences) == (9, 10):
+        return MAGIC + b"\x01"
+    return MAGIC + bytes([2, size, fences])
+
+
+def read_header(record_file):
+    """
+    Reads the header of an open record file.
+
+    Args:
+        record_file: Binary file object positioned at the start of the file.
+
+    Returns:
+        Tuple containing the board size and the number of fences each player starts with.
+    """
+    start = record_file.read(len(MAGIC)+1)
+    if start == MAGIC + b"\x01":
+        return 9, 10
+    if start == MAGIC + b"\x02":
+        size, fences = record_file.read(2)
+        return size, fences
+    raise ValueError(f"{record_file.name} is not a Quoridor record file")
+
+
+def record_settings(path):
+    """
+    Returns the board size and the number of fences per player of the games in a record file.
+
+    Args:
+        path: Path of the record file.
+    """
+    with open(path, 'rb') as record_file:
+        return read_header(record_file)
+
+
+class RecordWriter:
+    """
+    This class appends games to a binary record file. Writes are buffered by the file object,
+    so games can be written as fast as they are played. The header is written when the file is
+    new. Use it as a context manager, or call close, to flush the last games.
+    Main methods available to use are as follows:
+
+    write_game: Appends the moves of one game
+    write_history: Appends the moves made so far in a QuoridorGame
+    close: Flushes and closes the file
+    """
+
+    def __init__(self, path, size=BOARD_SIZE, fences=FENCES):
+        """
+        Opens a record file for appending. Games already in the file must use the same board
+        size and fences.
+
+        Args:
+            path: Path of the record file.
+            size: Integer representing the number of squares per side.
+            fences: Integer representing the number of fences each player starts with.
+        """
+        self._file = open(path, 'a+b')
+        self._size = size
+        if self._file.tell() == 0:
+            self._file.write(file_header(size, fences))
+        else:
+            self._file.seek(0)
+            settings = read_header(self._file)
+            self._file.seek(0, 2)
+            if settings != (size, fences):
+                self._file.close()
+                raise ValueError(f"{path} holds games with board size {settings[0]} and {settings[1]} fences")
+        self._games = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_game(self, moves):
+        """
+        Appends the moves of one game to the file.
+
+        Args:
+            moves: Iterable of moves, as returned by QuoridorGame.get_move_history.
+        """
+        self._file.write(encode_game(moves, self._size))
+        self._games += 1
+
+    def write_history(self, game):
+        """
+        Appends the moves made so far in a game to the file.
+
+        Args:
+            game: QuoridorGame object of interest.
+        """
+        self.write_game(game.get_move_history())
+
+    def get_games_written(self):
+        """
+        Returns the number of games written since the file was opened.
+        """
+        return self._games
+
+    def close(self):
+        """
+        Flushes and closes the file.
+        """
+        self._file.close()
+
+
+def read_games(path, chunk_size=CHUNK_SIZE):
+    """
+    Generator over the games of a binary record file. The file is read in chunks, so only the
+    game being returned is held in memory.
+
+    Args:
+        path: Path of the record file.
+        chunk_size: Integer representing the number of move codes read at a time.
+
+    Yields:
+        A list of moves per game, in the format used by QuoridorGame.push.
+    """
+    with open(path, 'rb') as record_file:
+        size = read_header(record_file)[0]
+        width = code_width(size)
+        end_of_game = 255 if width == 1 else 0xFFFF
+        decoded = decoded_moves(size)
+        moves = []
+        while True:
+            chunk = record_file.read(chunk_size*width)
+            if not chunk:
+                break
+            if width == 2:
+                if len(chunk) % 2:
+                    raise ValueError(f"{path} ends in the middle of a move")
+                #Two byte codes are stored little endian
+                chunk = array('H', chunk)
+                if sys.byteorder == 'big':
+                    chunk.byteswap()
+            for code in chunk:
+                if code < len(decoded):
+                    moves.append(decoded[code])
+                elif code == end_of_game:
+                    yield moves
+                    moves = []
+                else:
+                    raise ValueError(f"invalid move code {code} in {path}")
+        if moves:
+            raise ValueError(f"{path} ends in the middle of a game")
+
+
+def replay(moves, game=None):
+    """
+    Generator that plays the moves of a game one at a time with QuoridorGame.push.
+
+    Args:
+        moves: Iterable of moves in the format used by QuoridorGame.push.
+        game: QuoridorGame object to play on, a new game if None.
+
+    Yields:
+        The game after each move. The same object is returned every time.
+    """
+    if game is None:
+        game = QuoridorGame()
+    for move in moves:
+        if not game.push(move):
+            raise ValueError(f"illegal move {move_to_notation(move)} after {len(game.get_move_history())} moves")
+        yield game
+
+
+def replay_games(path):
+    """
+    Generator over the final positions of the games of a binary record file.
+
+    Args:
+        path: Path of the record file.
+
+    Yields:
+        A QuoridorGame object per game, with every move of the game made.
+    """
+    size, fences = record_settings(path)
+    for moves in read_games(path):
+        game = QuoridorGame(size, fences)
+        for _ in replay(moves, game):
+            pass
+        yield game
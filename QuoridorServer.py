@@ -0,0 +1,523 @@
+#Description: This program hosts many Quoridor games at once over TCP. Clients send one JSON request per line
+#             and receive one JSON response per line, and players and spectators get state updates
+#             pushed to them. It also contains QuoridorClient, a client for scripts and tests.
+#             Example: python QuoridorServer.py --port 8765
+
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import time
+from QuoridorEngine import BOARD_SIZE, FENCES, QuoridorGame
+from QuoridorRecord import format_game, move_to_notation, notation_to_move
+
+#Seconds without a move after which a game is removed
+IDLE_TIMEOUT = 600
+
+#Seconds updates to one game are collected for before they are sent to its watchers
+BROADCAST_INTERVAL = 0.05
+
+#Bytes a connection may have waiting to be sent before it is dropped as too slow
+MAX_WRITE_BUFFER = 1 << 20
+
+#Threads that validate fence placements
+EXECUTOR_WORKERS = 4
+
+#Largest board a client may ask for, so every column has a letter in algebraic notation
+MAX_BOARD_SIZE = 25
+
+
+class Connection:
+    """
+    This class represents a client connection to the server.
+    """
+
+    def __init__(self, writer):
+        """
+        Initializes the connection.
+
+        Args:
+            writer: asyncio.StreamWriter of the connection.
+        """
+        self.writer = writer
+        #Game ids this connection plays or watches
+        self.games = set()
+
+    def send(self, message):
+        """
+        Queues a message for the client without waiting for it to be sent. A client that lets
+        more than MAX_WRITE_BUFFER bytes pile up is disconnected so it cannot hold up others.
+
+        Args:
+            message: Dictionary to send as a JSON line.
+        """
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.writer.close()
+            return
+        self.writer.write(json.dumps(message).encode() + b"\n")
+
+
+class GameSession:
+    """
+    This class represents one hosted game: the QuoridorGame, its players and spectators, and a
+    lock so that only one move is validated at a time.
+    """
+
+    def __init__(self, game_id, size=BOARD_SIZE, fences=FENCES):
+        """
+        Initializes a new game.
+
+        Args:
+            game_id: Integer identifying the game.
+            size: Integer representing the number of squares per side of the board.
+            fences: Integer representing the number of fences each player starts with.
+        """
+        self.game_id = game_id
+        self.game = QuoridorGame(size, fences)
+        self.lock = asyncio.Lock()
+        self.players = {}
+        self.spectators = set()
+        self.last_active = time.monotonic()
+        self.update_pending = False
+
+    def watchers(self):
+        """
+        Returns every connection that receives updates of the game.
+        """
+        return set(self.players.values()) | self.spectators
+
+    def winner(self):
+        """
+        Returns the player who has won, or 0 if the game is still going.
+        """
+        for player in (1, 2):
+            if self.game.is_winner(player):
+                return player
+        return 0
+
+    def is_over(self):
+        """
+        Checks if the game has ended: a player has won, or a player has disconnected and can no
+        longer move.
+        """
+        return self.winner() != 0 or any(player.writer.is_closing() for player in self.players.values())
+
+    def state(self):
+        """
+        Returns a dictionary describing the game for clients.
+        """
+        game = self.game
+        return {
+            'game': self.game_id,
+            'size': game.get_board_size(),
+            'turn': game.get_player_turn(),
+            'pawns': [list(game.get_p1_location()), list(game.get_p2_location())],
+            'fences': [game.get_pawn(1).get_remaining_fences(), game.get_pawn(2).get_remaining_fences()],
+            'winner': self.winner(),
+            'moves': format_game(game.get_move_history()),
+        }
+
+
+class QuoridorServer:
+    """
+    This class represents a server hosting any number of games. Requests are JSON objects with an
+    "op" field and an optional "id" that is copied into the response:
+
+    create: Starts a game and joins it as player 1, with optional "size" and "fences" fields
+    join: Joins a game as player 2
+    watch: Receives updates of a game as a spectator
+    move: Makes a move in algebraic notation, e.g. {"op": "move", "game": 1, "move": "e2"}
+    state: Returns the state of a game
+    stats: Returns the number of hosted games, games not over yet and open connections
+
+    Fence placements are validated on a thread pool so an expensive check does not hold up other
+    games. Updates are sent to players and spectators at most once per BROADCAST_INTERVAL per
+    game, and games with no moves for IDLE_TIMEOUT seconds are removed.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, broadcast_interval=BROADCAST_INTERVAL, executor_workers=EXECUTOR_WORKERS):
+        """
+        Initializes the server.
+
+        Args:
+            idle_timeout: Seconds without a move after which a game is removed.
+            broadcast_interval: Seconds updates are collected for before they are sent.
+            executor_workers: Integer representing the number of fence validation threads.
+        """
+        self._idle_timeout = idle_timeout
+        self._broadcast_interval = broadcast_interval
+        self._executor = concurrent.futures.ThreadPoolExecutor(executor_workers)
+        self._sessions = {}
+        self._game_ids = itertools.count(1)
+        self._connections = set()
+        self._handlers = set()
+        self._server = None
+        self._evictor = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Starts listening for connections.
+
+        Args:
+            host: String containing the address to listen on.
+            port: Integer representing the port, 0 to pick a free one.
+
+        Returns:
+            Integer representing the port the server listens on.
+        """
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._evictor = asyncio.create_task(self._evict_idle())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Serves connections until the task is cancelled.
+        """
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops the server and closes every connection.
+        """
+        if self._evictor is not None:
+            self._evictor.cancel()
+        if self._server is not None:
+            self._server.close()
+        for connection in list(self._connections):
+            connection.writer.close()
+        #Let every connection handler see its connection close and finish
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self):
+        """
+        Returns a dictionary with the number of hosted games, the number of those that are not
+        over and the number of open connections. Finished games are hosted until they are evicted.
+        """
+        active_games = sum(not session.is_over() for session in self._sessions.values())
+        return {'games': len(self._sessions), 'active_games': active_games, 'connections': len(self._connections)}
+
+    async def _handle(self, reader, writer):
+        """
+        Serves one connection, answering its requests in order.
+        """
+        connection = Connection(writer)
+        self._connections.add(connection)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    response = await self._dispatch(connection, request)
+                    response['ok'] = True
+                except (ValueError, KeyError, TypeError, AttributeError, IndexError) as error:
+                    response = {'ok': False, 'error': str(error)}
+                if isinstance(request, dict) and 'id' in request:
+                    response['id'] = request['id']
+                connection.send(response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(connection)
+            self._handlers.discard(asyncio.current_task())
+            for game_id in connection.games:
+                session = self._sessions.get(game_id)
+                if session is not None:
+                    session.spectators.discard(connection)
+            writer.close()
+
+    def _session(self, request):
+        """
+        Returns the session named by a request.
+        """
+        session = self._sessions.get(request.get('game'))
+        if session is None:
+            raise ValueError(f"no game {request.get('game')}")
+        return session
+
+    async def _dispatch(self, connection, request):
+        """
+        Carries out a request and returns the response.
+
+        Args:
+            connection: Connection object the request came from.
+            request: Dictionary decoded from the request line.
+        """
+        op = request.get('op')
+        if op == 'create':
+            size = request.get('size', BOARD_SIZE)
+            fences = request.get('fences', FENCES)
+            if type(size) is not int or not 3 <= size <= MAX_BOARD_SIZE or size % 2 == 0:
+                raise ValueError(f"board size must be an odd number from 3 to {MAX_BOARD_SIZE}")
+            if type(fences) is not int or not 0 <= fences <= size*size:
+                raise ValueError(f"invalid number of fences {fences}")
+            session = GameSession(next(self._game_ids), size, fences)
+            self._sessions[session.game_id] = session
+            session.players[1] = connection
+            connection.games.add(session.game_id)
+            return {'game': session.game_id, 'player': 1}
+        if op == 'stats':
+            return self.get_stats()
+
+        session = self._session(request)
+        if op == 'join':
+            if 2 in session.players:
+                raise ValueError(f"game {session.game_id} is full")
+            session.players[2] = connection
+            connection.games.add(session.game_id)
+            self._changed(session)
+            return {'game': session.game_id, 'player': 2}
+        if op == 'watch':
+            session.spectators.add(connection)
+            connection.games.add(session.game_id)
+            async with session.lock:
+                return {'state': session.state()}
+        if op == 'state':
+            async with session.lock:
+                return {'state': session.state()}
+        if op == 'move':
+            return await self._move(connection, session, str(request.get('move')))
+        raise ValueError(f"unknown op {op!r}")
+
+    async def _move(self, connection, session, notation):
+        """
+        Validates and makes a move for the connection's player.
+
+        Args:
+            connection: Connection object making the move.
+            session: GameSession object of the game.
+            notation: String containing the move in algebraic notation.
+        """
+        move_type, coords = notation_to_move(notation)
+        async with session.lock:
+            game = session.game
+            player = game.get_player_turn()
+            if session.players.get(player) is not connection:
+                raise ValueError("not your turn")
+            if move_type == 'p':
+                made = game.move_pawn(player, coords)
+            else:
+                loop = asyncio.get_running_loop()
+                made = await loop.run_in_executor(self._executor, game.place_fence, player, move_type, coords)
+            if not made:
+                raise ValueError(f"illegal move {notation}")
+            state = session.state()
+        self._changed(session)
+        return {'state': state}
+
+    def _changed(self, session):
+        """
+        Marks a game as changed and schedules one update for its watchers.
+        """
+        session.last_active = time.monotonic()
+        if not session.update_pending:
+            session.update_pending = True
+            asyncio.get_running_loop().call_later(self._broadcast_interval, self._broadcast, session)
+
+    def _broadcast(self, session):
+        """
+        Sends the current state of a game to its watchers. Everything that changed since the
+        last update goes out in one message.
+        """
+        if self._sessions.get(session.game_id) is not session:
+            return
+        #A fence is being placed on another thread, try again once it is done
+        if session.lock.locked():
+            asyncio.get_running_loop().call_later(self._broadcast_interval, self._broadcast, session)
+            return
+        session.update_pending = False
+        message = {'event': 'update', 'state': session.state()}
+        for connection in session.watchers():
+            connection.send(message)
+
+    async def _evict_idle(self):
+        """
+        Removes games that have not had a move for the idle timeout.
+        """
+        while True:
+            await asyncio.sleep(min(self._idle_timeout/4, 5))
+            now = time.monotonic()
+            for game_id, session in list(self._sessions.items()):
+                if now - session.last_active > self._idle_timeout and not session.lock.locked():
+                    del self._sessions[game_id]
+                    for connection in session.watchers():
+                        connection.games.discard(game_id)
+                        connection.send({'event': 'evicted', 'game': game_id})
+
+
+class QuoridorClient:
+    """
+    This class represents a client of a QuoridorServer. Requests wait for their response, and
+    updates pushed by the server are queued for next_event.
+    Main methods available to use are as follows:
+
+    connect: Opens a connection to a server
+    request: Sends a request and returns the response
+    create_game, join_game, watch_game, move, get_state, get_stats: Shortcuts for the requests
+    next_event: Returns the next update pushed by the server
+    close: Closes the connection
+    """
+
+    def __init__(self, reader, writer):
+        """
+        Initializes the client on an open connection. Use connect to create one.
+        """
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._events = asyncio.Queue()
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765):
+        """
+        Returns a client connected to a server.
+
+        Args:
+            host: String containing the server address.
+            port: Integer representing the server port.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _receive(self):
+        """
+        Reads messages from the server and hands them to the waiting request or event queue.
+        """
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                future = self._pending.pop(message.get('id'), None)
+                if future is not None:
+                    future.set_result(message)
+                else:
+                    self._events.put_nowait(message)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection closed"))
+
+    async def request(self, op, **fields):
+        """
+        Sends a request and returns the response.
+
+        Args:
+            op: String naming the request.
+            fields: Other fields of the request.
+
+        Returns:
+            Dictionary decoded from the response. Its "ok" field is False for a rejected request.
+        """
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(json.dumps(dict(fields, op=op, id=request_id)).encode() + b"\n")
+        await self._writer.drain()
+        return await future
+
+    async def create_game(self, size=None, fences=None):
+        """
+        Starts a game as player 1. The response holds the game id.
+
+        Args:
+            size: Integer representing the number of squares per side, or None for the default.
+            fences: Integer representing the fences per player, or None for the default.
+        """
+        fields = {key: value for key, value in (('size', size), ('fences', fences)) if value is not None}
+        return await self.request('create', **fields)
+
+    async def join_game(self, game_id):
+        """
+        Joins a game as player 2.
+        """
+        return await self.request('join', game=game_id)
+
+    async def watch_game(self, game_id):
+        """
+        Watches a game as a spectator. The response holds its current state.
+        """
+        return await self.request('watch', game=game_id)
+
+    async def move(self, game_id, move):
+        """
+        Makes a move, given in algebraic notation or in the format used by QuoridorGame.push.
+        """
+        if not isinstance(move, str):
+            move = move_to_notation(move)
+        return await self.request('move', game=game_id, move=move)
+
+    async def get_state(self, game_id):
+        """
+        Returns the response to a state request for a game.
+        """
+        return await self.request('state', game=game_id)
+
+    async def get_stats(self):
+        """
+        Returns the response to a stats request, with the number of hosted games, games not over
+        yet and open connections.
+        """
+        return await self.request('stats')
+
+    async def next_event(self, timeout=None):
+        """
+        Returns the next message pushed by the server.
+
+        Args:
+            timeout: Seconds to wait, or None to wait for ever.
+        """
+        return await asyncio.wait_for(self._events.get(), timeout)
+
+    async def close(self):
+        """
+        Closes the connection.
+        """
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._receiver.cancel()
+
+
+def main():
+    """
+    Parses the command line and runs the server.
+    """
+    parser = argparse.ArgumentParser(description="Quoridor game server")
+    parser.add_argument('--host', default="127.0.0.1", help="address to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on")
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT, help="seconds before an idle game is removed")
+    args = parser.parse_args()
+
+    async def serve():
+        server = QuoridorServer(args.idle_timeout)
+        port = await server.start(args.host, args.port)
+        print(f"Serving Quoridor on {args.host}:{port}")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#Description: This program maps two player Quoridor positions onto their symmetric images. The board can be
+#             mirrored left to right, and flipped top to bottom if the two players swap sides, which
+#             turns a position with player 1 to move into one with player 2 to move. A position and
+#             its images play the same way, so caches and books can store one canonical form for all
+#             of them and map moves back to the actual position.
+
+from QuoridorEngine import QuoridorGame, zobrist_key
+
+#A transform is a pair: mirror left to right, then flip top to bottom and swap the players.
+#Each transform is its own inverse, so the same transform maps moves to and from the canonical
+#form.
+IDENTITY = (False, False)
+MIRROR = (True, False)
+FLIP = (False, True)
+MIRROR_FLIP = (True, True)
+TRANSFORMS = (IDENTITY, MIRROR, FLIP, MIRROR_FLIP)
+
+
+def transform_player(player, transform):
+    """
+    Returns the player who takes a player's place under a transform.
+
+    Args:
+        player: Integer representing the player, 1 or 2.
+        transform: Tuple of the mirror and flip flags.
+    """
+    return 3 - player if transform[1] else player
+
+
+def transform_square(coords, transform, size):
+    """
+    Returns the square a square is mapped to.
+
+    Args:
+        coords: Tuple containing the coordinates of the square.
+        transform: Tuple of the mirror and flip flags.
+        size: Integer representing the number of squares per side.
+    """
+    x, y = coords
+    mirror, flip = transform
+    return (size-1-x if mirror else x, size-1-y if flip else y)
+
+
+def transform_move(move, transform, size):
+    """
+    Returns the image of a move under a transform. A horizontal fence is anchored on the top
+    edge of its left square and a vertical fence on the left edge of its top square, as in
+    QuoridorGame.fence_squares, so mirroring or flipping along a fence moves the anchor to its
+    other end and onto the neighbouring row or column.
+
+    Args:
+        move: Tuple containing the move type and coordinates, as used by QuoridorGame.push.
+        transform: Tuple of the mirror and flip flags.
+        size: Integer representing the number of squares per side.
+    """
+    move_type, (x, y) = move
+    mirror, flip = transform
+    if move_type == 'p':
+        return ('p', transform_square((x, y), transform, size))
+    if move_type == 'h':
+        return ('h', (size-2-x if mirror else x, size-y if flip else y))
+    return ('v', (size-x if mirror else x, size-2-y if flip else y))
+
+
+def transformed_hash(game, transform):
+    """
+    Returns the state hash the image of a game's position would have, built from the same
+    Zobrist keys as QuoridorGame.compute_state_hash without making the image.
+
+    Args:
+        game: QuoridorGame object of a two player game.
+        transform: Tuple of the mirror and flip flags.
+    """
+    if transform == IDENTITY:
+        return game.state_hash()
+    size = game.get_board_size()
+    state_hash = zobrist_key('turn', transform_player(game.get_player_turn(), transform))
+    for pawn in game.get_pawns():
+        player = transform_player(pawn.get_player(), transform)
+        state_hash ^= zobrist_key('pawn', player, transform_square(pawn.get_location(), transform, size))
+        state_hash ^= zobrist_key('fences', player, pawn.get_remaining_fences())
+
+    #Every fence on the board was placed by a move in the history
+    for move in game.get_move_history():
+        if move[0] != 'p':
+            state_hash ^= zobrist_key('fence', *transform_move(move, transform, size))
+    return state_hash
+
+
+def canonical_transforms(game):
+    """
+    Returns the canonical key of a position, the smallest state hash of the position and its
+    images, with every transform that maps the position onto it. More than one transform means
+    the position is symmetric, and moves that map onto each other are the same move. Games with
+    four players have no images.
+
+    Args:
+        game: QuoridorGame object of interest.
+
+    Returns:
+        Tuple containing the key and a list of transforms, IDENTITY first if it is one of them.
+    """
+    if game.get_player_count() != 2:
+        return game.state_hash(), [IDENTITY]
+    hashes = [(transformed_hash(game, transform), transform) for transform in TRANSFORMS]
+    key = min(hashes)[0]
+    return key, [transform for state_hash, transform in hashes if state_hash == key]
+
+
+def canonical_key(game):
+    """
+    Returns the canonical key of a position and the transform that maps it onto its
+    canonical form.
+
+    Args:
+        game: QuoridorGame object of interest.
+    """
+    key, transforms = canonical_transforms(game)
+    return key, transforms[0]
+
+
+def canonical_move(move, transforms, size):
+    """
+    Returns a move of the actual position as a move of the canonical form. A symmetric position
+    has several transforms, and the move is the smallest of their images.
+
+    Args:
+        move: Tuple containing the move type and coordinates.
+        transforms: List of transforms from canonical_transforms.
+        size: Integer representing the number of squares per side.
+    """
+    return min(transform_move(move, transform, size) for transform in transforms)
+
+
+def transform_game(game, transform):
+    """
+    Returns a new game holding the image of a position. The transformed moves of the game are
+    replayed with the players swapped if the board is flipped, so the board, including the
+    "Fence Continued" half of every fence, the pawns, the remaining fences, the player turn, the
+    distance fields and the hash are those of a game played that way, and moves can be undone.
+
+    Args:
+        game: QuoridorGame object of a two player game.
+        transform: Tuple of the mirror and flip flags.
+    """
+    if game.get_player_count() != 2:
+        raise ValueError("only two player games have symmetric images")
+    size = game.get_board_size()
+    image = QuoridorGame(size, game.get_starting_fences())
+    moves = game.get_move_history()
+    #Players alternate, so the first move was made by the player to move after an even number of
+    #moves. Images of flipped games start with player 2. The image of the first move is made by
+    #the player who takes that player's place.
+    turn = game.get_player_turn()
+    first_player = turn if len(moves) % 2 == 0 else 3 - turn
+    image.set_player_turn(transform_player(first_player, transform))
+    for move in moves:
+        if not image.push(transform_move(move, transform, size)):
+            raise ValueError(f"move {move} has no legal image")
+    return image
+
+
+def canonical_game(game):
+    """
+    Returns the canonical form of a position as a new game, with the transform that maps moves
+    between the two. Play a move of the canonical game in the actual game with
+    transform_move(move, transform, size).
+
+    Args:
+        game: QuoridorGame object of interest.
+
+    Returns:
+        Tuple containing the canonical QuoridorGame and the transform.
+    """
+    transform = canonical_key(game)[1]
+    return transform_game(game, transform), transform
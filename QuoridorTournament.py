@@ -0,0 +1,243 @@
+#Description: This program plays Quoridor games between computer agents without a window. Games are shared
+#             out to a pool of worker processes and each result is written to a JSONL file as soon as
+#             the game ends. Example: python QuoridorTournament.py --games 200 greedy alphabeta:100
+#             Results can be turned into an opening book with QuoridorBook.py.
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from QuoridorEngine import BOARD_SIZE, FENCES, QuoridorGame
+from QuoridorAI import AIPlayer
+from QuoridorBook import OpeningBook
+from QuoridorMCTS import MCTSPlayer
+
+#Games longer than this are stopped and counted as draws
+MAX_PLIES = 400
+
+
+class RandomAgent:
+    """
+    This class represents an agent that plays a uniformly random legal move.
+    """
+
+    def __init__(self, seed):
+        """
+        Initializes the agent.
+
+        Args:
+            seed: Integer seed for the move choice.
+        """
+        self._rng = random.Random(seed)
+
+    def choose_move(self, game):
+        """
+        Returns a random legal move for the player whose turn it is.
+
+        Args:
+            game: QuoridorGame object of interest.
+        """
+        moves = game.legal_moves()
+        return self._rng.choice(moves) if moves else None
+
+
+class GreedyAgent:
+    """
+    This class represents an agent that always steps its pawn along a shortest path to its goal
+    and never places fences.
+    """
+
+    def choose_move(self, game):
+        """
+        Returns the pawn move that leaves the shortest distance to goal.
+
+        Args:
+            game: QuoridorGame object of interest.
+        """
+        player = game.get_player_turn()
+        size = len(game.get_board())-1
+        field = game.get_distance_field(player)
+        destinations = [coords for coords in game.possible_moves(game.get_pawn(player)) if coords is not None]
+        if not destinations:
+            return None
+        return ('p', min(sorted(destinations), key=lambda coords: field[coords[1]*size + coords[0]]))
+
+
+def make_agent(spec, seed, book=None):
+    """
+    Builds an agent from its name. Search agents take a time limit in milliseconds after a
+    colon, e.g. "alphabeta:200" or "mcts:500".
+
+    Args:
+        spec: String naming the agent: random, greedy, alphabeta or mcts.
+        seed: Integer seed for agents that use randomness.
+        book: OpeningBook object for search agents, or None.
+
+    Returns:
+        Object with a choose_move(game) method.
+    """
+    name, _, limit = spec.partition(':')
+    if name == 'random':
+        return RandomAgent(seed)
+    if name == 'greedy':
+        return GreedyAgent()
+    if name == 'alphabeta':
+        return AIPlayer(int(limit or 200), book=book)
+    if name == 'mcts':
+        #Games already run in worker processes, so each search stays in its process
+        return MCTSPlayer(int(limit or 200), workers=1, book=book)
+    raise ValueError(f"unknown agent {spec!r}")
+
+
+def play_game(job):
+    """
+    Plays one game between two agents.
+
+    Args:
+        job: Tuple containing the game number, the agent spec of player 1, the agent spec of
+             player 2, whether the tournament agents swapped colors, a seed, the board size,
+             the number of fences per player and the path of an opening book or None.
+
+    Returns:
+        Dictionary describing the game: number, agents, swapped, board size, fences, winner
+        (0 for a draw), plies, seconds and moves.
+    """
+    number, p1_spec, p2_spec, swapped, seed, size, fences, book_path = job
+    #Memory maps cannot be sent to workers, so each game opens the book itself
+    book = OpeningBook(book_path) if book_path else None
+    agents = {1: make_agent(p1_spec, seed, book), 2: make_agent(p2_spec, seed+1, book)}
+    game = QuoridorGame(size, fences)
+    start = time.perf_counter()
+
+    winner = 0
+    plies = 0
+    while plies < MAX_PLIES:
+        move = agents[game.get_player_turn()].choose_move(game)
+        if move is None or not game.push(move):
+            break
+        plies += 1
+        if game.is_winner(1) or game.is_winner(2):
+            winner = 1 if game.is_winner(1) else 2
+            break
+    if book:
+        book.close()
+
+    return {
+        'game': number,
+        'p1': p1_spec,
+        'p2': p2_spec,
+        'swapped': swapped,
+        'size': size,
+        'fences': fences,
+        'winner': winner,
+        'plies': plies,
+        'seconds': time.perf_counter() - start,
+        'moves': [[move_type, list(coords)] for move_type, coords in game.get_move_history()],
+    }
+
+
+def run_tournament(agent_specs, games, workers, output, seed=0, size=BOARD_SIZE, fences=FENCES, book=None):
+    """
+    Plays a number of games between two agents across a process pool. Agents swap colors every
+    game and may share a spec for self-play. Results are appended to the output file one JSON
+    line per game as games finish.
+
+    Args:
+        agent_specs: Tuple containing the two agent specs.
+        games: Integer representing the number of games.
+        workers: Integer representing the number of worker processes.
+        output: Path of the JSONL file to write, or None.
+        seed: Integer base seed.
+        size: Integer representing the number of squares per side of the board.
+        fences: Integer representing the number of fences each player starts with.
+        book: Path of an opening book for the search agents, or None.
+
+    Returns:
+        Dictionary summarising the tournament. Win rates are listed per agent, in the order the
+        agents were given.
+    """
+    jobs = []
+    for number in range(games):
+        swapped = number % 2 == 1
+        first, second = agent_specs[::-1] if swapped else agent_specs
+        jobs.append((number, first, second, swapped, seed + 2*number, size, fences, book))
+
+    wins = [0, 0]
+    draws = 0
+    total_plies = 0
+    start = time.perf_counter()
+    output_file = open(output, 'a') if output else None
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap_unordered(play_game, jobs):
+                if output_file:
+                    output_file.write(json.dumps(result) + "\n")
+                    output_file.flush()
+                total_plies += result['plies']
+                if result['winner']:
+                    #Agent index of the winner, taking the color swap into account
+                    wins[(result['winner'] == 2) != result['swapped']] += 1
+                else:
+                    draws += 1
+    finally:
+        if output_file:
+            output_file.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        'games': games,
+        'size': size,
+        'fences': fences,
+        'workers': workers,
+        'seconds': seconds,
+        'games_per_second': games/seconds if seconds > 0 else 0,
+        'win_rates': [(spec, wins[index]/games) for index, spec in enumerate(agent_specs)],
+        'draw_rate': draws/games,
+        'average_plies': total_plies/games,
+    }
+
+
+def main():
+    """
+    Parses the command line, runs the tournament and prints a summary.
+    """
+    parser = argparse.ArgumentParser(description="Headless Quoridor self-play tournament")
+    parser.add_argument('agents', nargs=2, help="agent specs: random, greedy, alphabeta[:ms], mcts[:ms]")
+    parser.add_argument('--games', type=int, default=100, help="number of games to play")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help="worker processes")
+    parser.add_argument('--output', default="tournament.jsonl", help="JSONL file results are appended to")
+    parser.add_argument('--seed', type=int, default=0, help="base random seed")
+    parser.add_argument('--size', type=int, default=BOARD_SIZE, help="squares per side of the board, odd")
+    parser.add_argument('--fences', type=int, default=FENCES, help="fences each player starts with")
+    parser.add_argument('--book', help="opening book file for the search agents")
+    args = parser.parse_args()
+    if args.size < 3 or args.size % 2 == 0:
+        parser.error("board size must be an odd number of at least 3")
+    if args.games < 1:
+        parser.error("at least one game must be played")
+
+    #Fail on a bad agent spec before starting workers
+    for spec in args.agents:
+        try:
+            make_agent(spec, 0)
+        except ValueError as error:
+            parser.error(str(error))
+    if args.book:
+        try:
+            OpeningBook(args.book).close()
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+
+    summary = run_tournament(tuple(args.agents), args.games, args.workers, args.output, args.seed,
+                             args.size, args.fences, args.book)
+    print(f"{summary['games']} games on {summary['size']}x{summary['size']} in {summary['seconds']:.1f} s with {summary['workers']} workers "
+          f"({summary['games_per_second']:.2f} games/s)")
+    for index, (spec, rate) in enumerate(summary['win_rates']):
+        print(f"{'agent ' + str(index+1) + ' ' + spec:>24}: {rate:6.1%} wins")
+    print(f"{'draws':>24}: {summary['draw_rate']:6.1%}")
+    print(f"average game length: {summary['average_plies']:.1f} plies")
+
+
+if __name__ == "__main__":
+    main()
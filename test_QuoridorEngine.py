@@ -0,0 +1,48 @@
+#Description: Tests for QuoridorEngine.py. The fair play check is compared with the A* reference
+#             implementation on random fence layouts. Run with "python -m pytest".
+
+import random
+import pytest
+from QuoridorEngine import QuoridorGame
+
+
+def fence_slots(size):
+    """
+    Returns a list of every (type, coords) fence slot on a board.
+
+    Args:
+        size: Integer representing the number of squares per side.
+    """
+    slots = [('h',(col,row)) for row in range(1,size) for col in range(size-1)]
+    slots += [('v',(col,row)) for row in range(size-1) for col in range(1,size)]
+    return slots
+
+
+def random_layout(rng, size, players, fences):
+    """
+    Returns a game with up to a number of random legal fences on the board, placed in turn.
+
+    Args:
+        rng: random.Random object.
+        size: Integer representing the number of squares per side.
+        players: Integer representing the number of players.
+        fences: Integer representing the number of fences to try to place.
+    """
+    game = QuoridorGame(size, None, players)
+    for _ in range(fences):
+        legal = sorted(game.legal_fences(game.get_player_turn()))
+        if not legal:
+            break
+        game.push(rng.choice(legal))
+    return game
+
+
+@pytest.mark.parametrize("size,players", [(5, 2), (7, 2), (9, 2), (5, 4), (7, 4), (9, 4)])
+def test_fair_play_check_matches_astar(size, players):
+    pytest.importorskip("pathfinding")
+    rng = random.Random(size*10 + players)
+    for layout in range(4):
+        game = random_layout(rng, size, players, rng.randrange(2, 2*size))
+        for fence_type, coords in fence_slots(size):
+            assert game.fair_play_check(fence_type, coords) == game.fair_play_check_astar(fence_type, coords), \
+                (layout, fence_type, coords, game.get_move_history())
@@ -0,0 +1,82 @@
+#Description: Tests for QuoridorSymmetry.py. Random games are played and every position is compared with
+#             its image under each transform: hashes, legal moves, distance fields and winners must
+#             map onto each other. Run with "python -m pytest".
+
+import random
+import pytest
+from QuoridorEngine import QuoridorGame
+from QuoridorSymmetry import (TRANSFORMS, canonical_key, transform_game, transform_move, transform_player,
+                              transform_square, transformed_hash)
+
+
+def random_positions(seed, size, plies=40):
+    """
+    Generator over the positions of a random game, pawn moves favoured. The same game object
+    is yielded after every move.
+
+    Args:
+        seed: Integer seed for the moves.
+        size: Integer representing the number of squares per side.
+        plies: Integer representing the most moves played.
+    """
+    rng = random.Random(seed)
+    game = QuoridorGame(size, (size*size+4)//8)
+    yield game
+    for _ in range(plies):
+        if game.get_winner():
+            return
+        moves = sorted(game.legal_moves())
+        if rng.random() < 0.6:
+            moves = [move for move in moves if move[0] == 'p'] or moves
+        game.push(rng.choice(moves))
+        yield game
+
+
+def positions():
+    """
+    Returns a list of (size, seed) pairs for the games tested.
+    """
+    return [(size, seed) for size in (5, 7, 9) for seed in range(3)]
+
+
+@pytest.mark.parametrize("size,seed", positions())
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_rules_map_under_transform(size, seed, transform):
+    for game in random_positions(seed, size):
+        image = transform_game(game, transform)
+        assert transformed_hash(game, transform) == image.state_hash() == image.compute_state_hash()
+
+        #Pawn moves and fences of the image are the images of the position's
+        assert set(image.legal_moves()) == {transform_move(move, transform, size) for move in game.legal_moves()}
+        assert image.get_player_turn() == transform_player(game.get_player_turn(), transform)
+        assert image.get_winner() == (transform_player(game.get_winner(), transform) if game.get_winner() else 0)
+
+        for player in (1, 2):
+            other = transform_player(player, transform)
+            pawn, image_pawn = game.get_pawn(player), image.get_pawn(other)
+            assert image_pawn.get_location() == transform_square(pawn.get_location(), transform, size)
+            assert image_pawn.get_remaining_fences() == pawn.get_remaining_fences()
+            field, image_field = game.get_distance_field(player), image.get_distance_field(other)
+            for y in range(size):
+                for x in range(size):
+                    image_x, image_y = transform_square((x, y), transform, size)
+                    assert image_field[image_y*size + image_x] == field[y*size + x]
+
+
+@pytest.mark.parametrize("size,seed", positions())
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_transform_twice_is_identity(size, seed, transform):
+    for game in random_positions(seed, size):
+        twice = transform_game(transform_game(game, transform), transform)
+        assert twice.state_hash() == game.state_hash()
+        assert twice.get_move_history() == game.get_move_history()
+        assert [[dict(square) for square in row] for row in twice.get_board()] == \
+               [[dict(square) for square in row] for row in game.get_board()]
+
+
+@pytest.mark.parametrize("size,seed", positions())
+def test_canonical_key_is_shared_by_images(size, seed):
+    for game in random_positions(seed, size):
+        key = canonical_key(game)[0]
+        for transform in TRANSFORMS:
+            assert canonical_key(transform_game(game, transform))[0] == key